@@ -204,7 +204,7 @@ SML tags available:
     headless_optional_group.add_argument(cli_options[14], type=str, default=None, help=f'''(Optional) Path to the custom model zip file cntaining mandatory model files. 
     Please refer to ./lib/models.py''')
     headless_optional_group.add_argument(cli_options[15], type=str, default=default_fine_tuned, help='''(Optional) Fine tuned model path. Default is builtin model.''')
-    headless_optional_group.add_argument(cli_options[16], type=str, default=default_output_format, help=f'''(Optional) Output audio format. Default is {default_output_format} set in ./lib/conf.py''')
+    headless_optional_group.add_argument(cli_options[16], type=str, default=default_output_format, help=f'''(Optional) Output audio format, or a comma separated list (m4b,mp3,webm) encoded from a single decode. Default is {default_output_format} set in ./lib/conf.py''')
     headless_optional_group.add_argument(cli_options[17], type=str, default=default_output_channel, help=f'''(Optional) Output audio channel. Default is {default_output_channel} set in ./lib/conf.py''')
     headless_optional_group.add_argument(cli_options[18], type=float, default=default_engine_settings[TTS_ENGINES['XTTS']]['temperature'], help=f"""(xtts only, optional) Temperature for the model. 
     Default to config.json model. Higher temperatures lead to more creative outputs.""")
@@ -236,6 +236,8 @@ SML tags available:
     headless_optional_group.add_argument(cli_options[35], type=str, default='', help='''(Optional) Audiobookshelf API token.''')
     headless_optional_group.add_argument(cli_options[36], type=str, default='', help='''(Optional) Audiobookshelf library ID.''')
     headless_optional_group.add_argument(cli_options[37], action='store_true', help='''(Optional) Auto-upload to Audiobookshelf after processing.''')
+    headless_optional_group.add_argument(cli_options[38], action='store_true', help='''(Optional, --text or --ebook only) Play while synthesizing: raw 32-bit float mono PCM goes to stdout instead of an audiobook file,
+    e.g. | ffplay -f f32le -ar 24000 -ch_layout mono -nodisp -autoexit - (the samplerate of the engine is printed on stderr).''')
 
     for arg in sys.argv:
         if arg.startswith('--') and arg not in cli_options:
@@ -366,9 +368,19 @@ SML tags available:
                 args.get(k, None) is not None
                 for k in ('ebook', 'ebooks_dir', 'text')
             )
+            unsupported_formats = [f for f in (f.strip().lower() for f in str(args['output_format']).split(',')) if f and f not in output_formats]
             if specified_input > 1:
                 error = 'Error: You can only specify one of --ebook, --ebooks_dir, or --text in headless mode.'
+            elif args['stream'] and args.get('ebooks_dir') is not None:
+                error = 'Error: --stream only works with --text or --ebook.'
+            elif unsupported_formats:
+                error = f"Error: --output_format {', '.join(unsupported_formats)} not supported. Available formats are: {', '.join(output_formats)}."
             else:
+                if args['stream']:
+                    # stdout carries the audio, every message of the conversion goes to stderr instead
+                    sys.stdout.flush()
+                    args['stream_fd'] = os.dup(sys.stdout.fileno())
+                    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
                 if args.get('voice'):
                     if os.path.exists(args['voice']):
                         args['voice'] = os.path.abspath(args['voice'])
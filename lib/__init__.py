@@ -10,7 +10,9 @@ from .conf import (
     requirements_file, components_dir, root_dir, tmp_dir, run_dir, gradio_cache_dir, tmp_expire, max_ebook_textarea_length,
     tts_dir, voice_formats, voices_dir, default_output_split, default_output_split_hours,
     default_abs_enabled, default_abs_server_url, default_abs_api_token, default_abs_library_id,
-    default_abs_auto_upload
+    default_abs_auto_upload, default_tts_batch_size, default_tts_cpu_workers,
+    cache_dir, sentence_cache_dir, xtts_latents_dir, default_sentence_cache_size, default_session_backend,
+    default_chapter_stream, default_export_workers, default_chapter_loudnorm, default_chapter_loudness_target
 )
 
 from .conf_lang import (
@@ -57,5 +59,7 @@ __all__ = [
     "loaded_tts", "xtts_builtin_speakers_list", "max_custom_model",
     "max_custom_voices", "voices_dir",
     "default_abs_enabled", "default_abs_server_url", "default_abs_api_token", "default_abs_library_id",
-    "default_abs_auto_upload"
+    "default_abs_auto_upload", "default_tts_batch_size", "default_tts_cpu_workers",
+    "cache_dir", "sentence_cache_dir", "xtts_latents_dir", "default_sentence_cache_size", "default_session_backend",
+    "default_chapter_stream", "default_export_workers", "default_chapter_loudnorm", "default_chapter_loudness_target"
 ]
@@ -0,0 +1,162 @@
+import io, os, zlib, queue, shutil, threading
+
+from typing import Any
+
+audio_subtypes = {"wav": "FLOAT", "flac": "PCM_24", "ogg": "VORBIS"}
+# ffmpeg encoder writing the same container as audio_subtypes
+audio_codecs = {"wav": "pcm_f32le", "flac": "flac", "ogg": "libvorbis"}
+
+def write_audio_file(path:str, audio_np:Any, samplerate:int)->tuple:
+    # returns (samples, samplerate, checksum) for the sentence manifest
+    import soundfile as sf
+    fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in audio_subtypes:
+        raise ValueError(f'write_audio_file: format {fmt!r} not in {tuple(audio_subtypes)}')
+    # encode into a temp file next to the target then rename, a crash never leaves a truncated sentence file
+    tmp_path = f'{path}.part'
+    try:
+        buffer = io.BytesIO()
+        sf.write(buffer, audio_np, samplerate, format=fmt.upper(), subtype=audio_subtypes[fmt])
+        data = buffer.getvalue()
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return len(audio_np), samplerate, f'{zlib.crc32(data):08x}'
+    except Exception:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        raise
+
+def audio_file_info(path:str)->tuple:
+    # same (samples, samplerate, checksum) as write_audio_file() returns, read back from a file on disk
+    import soundfile as sf
+    info = sf.info(path)
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            crc = zlib.crc32(chunk, crc)
+    return info.frames, info.samplerate, f'{crc:08x}'
+
+def link_audio_file(src:str, dst:str)->None:
+    # audio files are only ever renamed into place, so a hard link never exposes a half written file
+    tmp = f'{dst}.part'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+def concat_audio_files(paths:list, out_path:str, cancel_event:threading.Event|None=None, blocksize:int=65536)->bool:
+    # streams the inputs block by block into one encoder, memory stays at one block whatever the chapter length.
+    # returns False when the inputs do not share samplerate and channels, the caller falls back to ffmpeg.
+    import soundfile as sf
+    out_path = os.fspath(out_path)
+    fmt = os.path.splitext(out_path)[1].lstrip('.').lower()
+    if fmt not in audio_subtypes or not paths:
+        return False
+    subtype = audio_subtypes[fmt]
+    # integer samples keep pcm sources bit exact, float sources stay float
+    dtype = 'float32' if subtype in ('FLOAT', 'VORBIS') else 'int32'
+    tmp_path = f'{out_path}.part'
+    out = None
+    try:
+        for path in paths:
+            with sf.SoundFile(os.fspath(path)) as src:
+                if out is None:
+                    samplerate, channels = src.samplerate, src.channels
+                    out = sf.SoundFile(tmp_path, 'w', samplerate=samplerate, channels=channels, format=fmt.upper(), subtype=subtype)
+                elif (src.samplerate, src.channels) != (samplerate, channels):
+                    out.close()
+                    out = None
+                    os.remove(tmp_path)
+                    return False
+                for block in src.blocks(blocksize=blocksize, dtype=dtype, always_2d=True):
+                    out.write(block)
+            if cancel_event is not None and cancel_event.is_set():
+                out.close()
+                out = None
+                os.remove(tmp_path)
+                return False
+        out.close()
+        out = None
+        with open(tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, out_path)
+        return True
+    except Exception:
+        if out is not None:
+            out.close()
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        raise
+
+class AudioWriter:
+
+    def __init__(self, maxsize:int=16)->None:
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.pending = set()
+        self.written = {}
+        self.error = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='AudioWriter', daemon=True)
+        self._thread.start()
+
+    def submit(self, path:str, audio_np:Any, samplerate:int)->bool:
+        # blocks while the queue is full so inference never runs more than maxsize sentences ahead of the disk
+        if self.error is not None:
+            return False
+        path = os.fspath(path)
+        with self._lock:
+            self.pending.add(path)
+        self.queue.put((path, audio_np, samplerate))
+        return True
+
+    def is_pending(self, path:str)->bool:
+        with self._lock:
+            return os.fspath(path) in self.pending
+
+    def pop_written(self, path:str)->tuple|None:
+        # (samples, samplerate, checksum) of a file this writer saved, None if it did not
+        with self._lock:
+            return self.written.pop(os.fspath(path), None)
+
+    def drain(self)->tuple:
+        self.queue.join()
+        return self.error is None, self.error
+
+    def close(self)->tuple:
+        result = self.drain()
+        self.queue.put(None)
+        self._thread.join()
+        return result
+
+    def _run(self)->None:
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                path, audio_np, samplerate = job
+                try:
+                    if self.error is None:
+                        info = write_audio_file(path, audio_np, samplerate)
+                        with self._lock:
+                            self.written[path] = info
+                except Exception as e:
+                    self.error = f'AudioWriter: cannot save {path}: {e}'
+                    print(self.error)
+                finally:
+                    with self._lock:
+                        self.pending.discard(path)
+            finally:
+                self.queue.task_done()
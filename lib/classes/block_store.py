@@ -0,0 +1,376 @@
+import os, json, time, hashlib, sqlite3, threading
+
+from collections import OrderedDict
+from typing import Generator
+from lib.classes.audio_writer import audio_file_info
+
+schema_sql = '''
+    CREATE TABLE IF NOT EXISTS stamp (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        page INTEGER,
+        block_resume INTEGER,
+        sentence_resume INTEGER,
+        voice TEXT,
+        tts_engine TEXT,
+        fine_tuned TEXT
+    );
+    CREATE TABLE IF NOT EXISTS blocks (
+        id TEXT PRIMARY KEY,
+        idx INTEGER NOT NULL,
+        expand INTEGER NOT NULL,
+        keep INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        voice TEXT,
+        tts_engine TEXT,
+        fine_tuned TEXT
+    );
+    CREATE TABLE IF NOT EXISTS sentences (
+        block_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (block_id, idx),
+        FOREIGN KEY (block_id) REFERENCES blocks(id) ON DELETE CASCADE
+    );
+    CREATE TABLE IF NOT EXISTS sentence_audio (
+        block_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        samples INTEGER NOT NULL,
+        samplerate INTEGER NOT NULL,
+        checksum TEXT NOT NULL,
+        PRIMARY KEY (block_id, idx)
+    );
+    CREATE INDEX IF NOT EXISTS idx_blocks_idx ON blocks(idx);
+    INSERT OR IGNORE INTO stamp (id, page, block_resume, sentence_resume, voice, tts_engine, fine_tuned)
+    VALUES (1, 0, 0, 0, NULL, NULL, NULL);
+'''
+
+# sqlite3 keeps a per-connection cache of compiled statements, reusing these exact strings hits it
+update_stamp_sql = 'UPDATE stamp SET page=?, block_resume=?, sentence_resume=?, voice=?, tts_engine=?, fine_tuned=? WHERE id=1'
+select_stamp_sql = 'SELECT page, block_resume, sentence_resume, voice, tts_engine, fine_tuned FROM stamp WHERE id=1'
+select_sentences_sql = 'SELECT block_id, text FROM sentences ORDER BY block_id, idx'
+select_blocks_sql = 'SELECT id, expand, keep, text, voice, tts_engine, fine_tuned FROM blocks ORDER BY idx'
+select_block_sql = 'SELECT id, expand, keep, text, voice, tts_engine, fine_tuned FROM blocks WHERE id=?'
+select_block_sentences_sql = 'SELECT text FROM sentences WHERE block_id=? ORDER BY idx'
+select_block_ids_sql = 'SELECT id FROM blocks ORDER BY idx'
+select_page_ids_sql = 'SELECT id FROM blocks ORDER BY idx LIMIT ? OFFSET ?'
+count_blocks_sql = 'SELECT COUNT(*) FROM blocks'
+delete_block_sql = 'DELETE FROM blocks WHERE id=?'
+update_block_idx_sql = 'UPDATE blocks SET idx=? WHERE id=?'
+upsert_block_sql = (
+    'INSERT INTO blocks (id, idx, expand, keep, text, voice, tts_engine, fine_tuned) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT(id) DO UPDATE SET '
+    'idx=excluded.idx, expand=excluded.expand, keep=excluded.keep, text=excluded.text, '
+    'voice=excluded.voice, tts_engine=excluded.tts_engine, fine_tuned=excluded.fine_tuned'
+)
+delete_sentences_sql = 'DELETE FROM sentences WHERE block_id=?'
+insert_sentence_sql = 'INSERT INTO sentences (block_id, idx, text) VALUES (?, ?, ?)'
+upsert_sentence_audio_sql = 'INSERT OR REPLACE INTO sentence_audio (block_id, idx, samples, samplerate, checksum) VALUES (?, ?, ?, ?, ?)'
+select_sentence_audio_sql = 'SELECT idx, samples, samplerate, checksum FROM sentence_audio WHERE block_id=?'
+delete_sentence_audio_sql = 'DELETE FROM sentence_audio WHERE block_id=?'
+
+class BlockStore:
+
+    stores = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, db_path:str, flush_interval:float=5.0, window_size:int=64)->None:
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        # lru window of fully loaded blocks, paged readers never hold more than this many in memory
+        self.window = OrderedDict()
+        self.window_size = window_size
+        self.pending_stamp = None
+        self.pending_audio = []
+        self.last_flush = time.monotonic()
+        self._timer = None
+        self.closed = False
+        # block id -> (idx, row hash, sentences hash) of what the db holds, None until first load or save
+        self.block_hashes = None
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(schema_sql)
+        self.conn.commit()
+        self.inode = os.stat(db_path).st_ino
+
+    @classmethod
+    def get(cls, db_path:str)->'BlockStore':
+        with cls._registry_lock:
+            store = cls.stores.get(db_path)
+            if store is not None and not store.is_current():
+                # the file was removed or replaced under the open connection (session reset, new parse)
+                store.close(flush=False)
+                store = None
+            if store is None:
+                store = cls(db_path)
+                cls.stores[db_path] = store
+            return store
+
+    @classmethod
+    def release(cls, db_path:str)->None:
+        with cls._registry_lock:
+            store = cls.stores.pop(db_path, None)
+        if store is not None:
+            store.close()
+
+    def is_current(self)->bool:
+        try:
+            return os.stat(self.db_path).st_ino == self.inode
+        except OSError:
+            return False
+
+    def load(self)->dict:
+        with self._lock:
+            data = self.load_stamp()
+            if not data:
+                return {}
+            sentences_by_block = {}
+            for block_id, text in self.conn.execute(select_sentences_sql):
+                sentences_by_block.setdefault(block_id, []).append(text)
+            blocks = []
+            block_hashes = {}
+            for idx, row in enumerate(self.conn.execute(select_blocks_sql)):
+                bid, expand, keep, text, b_voice, b_tts_engine, b_fine_tuned = row
+                blocks.append({
+                    'id': bid,
+                    'expand': bool(expand),
+                    'keep': bool(keep),
+                    'text': text,
+                    'voice': b_voice,
+                    'tts_engine': b_tts_engine,
+                    'fine_tuned': b_fine_tuned,
+                    'sentences': sentences_by_block.get(bid, []),
+                })
+                block_hashes[bid] = (idx, *self._block_hash(blocks[-1]))
+            self.block_hashes = block_hashes
+            data['blocks'] = blocks
+            return data
+
+    def load_stamp(self)->dict:
+        # the scalars of blocks_current without any block
+        with self._lock:
+            self._flush_locked()
+            stamp_row = self.conn.execute(select_stamp_sql).fetchone()
+            if stamp_row is None:
+                return {}
+            page, block_resume, sentence_resume, voice, tts_engine, fine_tuned = stamp_row
+            return {
+                'page': page,
+                'block_resume': block_resume,
+                'sentence_resume': sentence_resume,
+                'voice': voice,
+                'tts_engine': tts_engine,
+                'fine_tuned': fine_tuned,
+            }
+
+    def count(self)->int:
+        with self._lock:
+            return self.conn.execute(count_blocks_sql).fetchone()[0]
+
+    def block_ids(self)->list[str]:
+        with self._lock:
+            return [row[0] for row in self.conn.execute(select_block_ids_sql)]
+
+    def get_block(self, block_id:str)->dict|None:
+        with self._lock:
+            block = self.window.get(block_id)
+            if block is None:
+                row = self.conn.execute(select_block_sql, (block_id,)).fetchone()
+                if row is None:
+                    return None
+                bid, expand, keep, text, voice, tts_engine, fine_tuned = row
+                block = {
+                    'id': bid,
+                    'expand': bool(expand),
+                    'keep': bool(keep),
+                    'text': text,
+                    'voice': voice,
+                    'tts_engine': tts_engine,
+                    'fine_tuned': fine_tuned,
+                    'sentences': [r[0] for r in self.conn.execute(select_block_sentences_sql, (bid,))],
+                }
+                self.window[block_id] = block
+                if len(self.window) > self.window_size:
+                    self.window.popitem(last=False)
+            else:
+                self.window.move_to_end(block_id)
+            # callers may edit the copy, the window only changes through save_blocks() or update_blocks()
+            return dict(block, sentences=list(block['sentences']))
+
+    def get_page(self, page:int, page_size:int)->list[dict]:
+        with self._lock:
+            ids = [row[0] for row in self.conn.execute(select_page_ids_sql, (page_size, page * page_size))]
+            return [self.get_block(block_id) for block_id in ids]
+
+    def iter_blocks(self)->Generator[dict, None, None]:
+        for block_id in self.block_ids():
+            block = self.get_block(block_id)
+            if block is not None:
+                yield block
+
+    def update_blocks(self, blocks:list)->None:
+        # writes back edited blocks that already exist in the db, their position is left unchanged
+        with self._lock:
+            if self.block_hashes is None:
+                self.load()
+            try:
+                for block in blocks:
+                    old = self.block_hashes.get(block['id'])
+                    if old is not None:
+                        self.block_hashes[block['id']] = self._write_block(block, old[0], old)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                self.block_hashes = None
+                self.window.clear()
+                raise
+
+    def save_stamp(self, data:dict, flush:bool=False)->None:
+        # stamps only land in memory, the db sees the latest one per flush interval or at an explicit flush
+        stamp = (
+            data.get('page'),
+            data.get('block_resume'),
+            data.get('sentence_resume'),
+            data.get('voice'),
+            data.get('tts_engine'),
+            data.get('fine_tuned'),
+        )
+        with self._lock:
+            self.pending_stamp = stamp
+            if flush or time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def save_blocks(self, data:dict)->None:
+        # only blocks whose content hash changed are written, an edit touches one or two rows instead of the whole book
+        with self._lock:
+            if self.block_hashes is None:
+                self.load()
+            self.save_stamp(data)
+            self._flush_locked(commit=False)
+            new_blocks = data.get('blocks', [])
+            new_hashes = {}
+            try:
+                for idx, block in enumerate(new_blocks):
+                    new_hashes[block['id']] = self._write_block(block, idx, self.block_hashes.get(block['id']))
+                removed = self.block_hashes.keys() - new_hashes.keys()
+                if removed:
+                    self.conn.executemany(delete_block_sql, [(rid,) for rid in removed])
+                    for rid in removed:
+                        self.window.pop(rid, None)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                self.block_hashes = None
+                self.window.clear()
+                raise
+            self.block_hashes = new_hashes
+
+    def record_sentence_audio(self, block_id:str, idx:int, samples:int, samplerate:int, checksum:str)->None:
+        # manifest rows ride along with the next stamp flush, same transaction as the sentence_resume they back
+        with self._lock:
+            self.pending_audio.append((block_id, idx, samples, samplerate, checksum))
+            if self._timer is None and not self.closed:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def sentence_audio(self, block_id:str, block_dir:str|None=None, ext:str|None=None)->dict:
+        # idx -> (samples, samplerate, checksum) of every sentence file of the block.
+        # a block without rows but with a sentence folder predates the manifest, it is indexed once from disk.
+        with self._lock:
+            self._flush_locked()
+            entries = {idx: (samples, samplerate, checksum) for idx, samples, samplerate, checksum in self.conn.execute(select_sentence_audio_sql, (block_id,))}
+            if entries or block_dir is None or not os.path.isdir(block_dir):
+                return entries
+            for entry in os.scandir(block_dir):
+                stem, dot, suffix = entry.name.partition('.')
+                if stem.isdigit() and dot and suffix == ext:
+                    try:
+                        entries[int(stem)] = audio_file_info(entry.path)
+                    except Exception as e:
+                        error = f'BlockStore.sentence_audio() cannot index {entry.path}: {e}'
+                        print(error)
+            if entries:
+                self.conn.executemany(upsert_sentence_audio_sql, [(block_id, idx, *info) for idx, info in entries.items()])
+                self.conn.commit()
+            return entries
+
+    def drop_sentence_audio(self, block_id:str)->None:
+        with self._lock:
+            self.pending_audio = [row for row in self.pending_audio if row[0] != block_id]
+            self.conn.execute(delete_sentence_audio_sql, (block_id,))
+            self.conn.commit()
+
+    def flush(self)->None:
+        with self._lock:
+            if not self.closed:
+                self._flush_locked()
+
+    def close(self, flush:bool=True)->None:
+        with self._lock:
+            if self.closed:
+                return
+            if flush:
+                self._flush_locked()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.conn.close()
+            self.closed = True
+
+    def _write_block(self, block:dict, idx:int, old:tuple|None)->tuple:
+        block_id = block['id']
+        row_hash, sentences_hash = self._block_hash(block)
+        if old is None or old[1] != row_hash:
+            self.conn.execute(
+                upsert_block_sql,
+                (
+                    block_id,
+                    idx,
+                    1 if block.get('expand') else 0,
+                    1 if block.get('keep') else 0,
+                    block.get('text', ''),
+                    block.get('voice'),
+                    block.get('tts_engine'),
+                    block.get('fine_tuned'),
+                )
+            )
+        elif old[0] != idx:
+            self.conn.execute(update_block_idx_sql, (idx, block_id))
+        if old is None or old[2] != sentences_hash:
+            self.conn.execute(delete_sentences_sql, (block_id,))
+            sentences = block.get('sentences', [])
+            if sentences:
+                self.conn.executemany(insert_sentence_sql, [(block_id, i, s) for i, s in enumerate(sentences)])
+        if old is None or old[1:] != (row_hash, sentences_hash):
+            self.window.pop(block_id, None)
+        return (idx, row_hash, sentences_hash)
+
+    def _block_hash(self, block:dict)->tuple:
+        row = json.dumps([bool(block.get('expand')), bool(block.get('keep')), block.get('text', ''), block.get('voice'), block.get('tts_engine'), block.get('fine_tuned')], ensure_ascii=False)
+        sentences = json.dumps(list(block.get('sentences', [])), ensure_ascii=False)
+        return hashlib.blake2b(row.encode('utf-8'), digest_size=16).digest(), hashlib.blake2b(sentences.encode('utf-8'), digest_size=16).digest()
+
+    def _flush_locked(self, commit:bool=True)->None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.pending_audio:
+            self.conn.executemany(upsert_sentence_audio_sql, self.pending_audio)
+            self.pending_audio = []
+            if self.pending_stamp is None and commit:
+                self.conn.commit()
+        if self.pending_stamp is not None:
+            self.conn.execute(update_stamp_sql, self.pending_stamp)
+            self.pending_stamp = None
+            if commit:
+                self.conn.commit()
+        self.last_flush = time.monotonic()
@@ -0,0 +1,70 @@
+import queue, threading
+
+from typing import Any, Callable
+
+class ChapterFinalizer:
+
+    def __init__(self, cancel_event:threading.Event|None=None, maxsize:int=8)->None:
+        # one worker so chapters are assembled in book order and share the process dir scratch files safely
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.cancel_event = cancel_event
+        self.pending = set()
+        self.error = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, name='ChapterFinalizer', daemon=True)
+        self._thread.start()
+
+    def submit(self, block_id:str, func:Callable[..., tuple], *args:Any)->bool:
+        # func returns (ok, error), it runs on the worker while the caller moves on to the next block
+        if self.error is not None:
+            return False
+        with self._lock:
+            self.pending.add(block_id)
+        self.queue.put((block_id, func, args))
+        return True
+
+    def is_pending(self, block_id:str)->bool:
+        with self._lock:
+            return block_id in self.pending
+
+    def wait(self, timeout:float)->int:
+        # blocks still queued or running once one of them finishes or timeout runs out,
+        # lets the caller report progress from its own thread while the worker catches up
+        with self._changed:
+            if self.pending:
+                self._changed.wait(timeout)
+            return len(self.pending)
+
+    def drain(self)->tuple:
+        self.queue.join()
+        return self.error is None, self.error
+
+    def close(self)->tuple:
+        result = self.drain()
+        self.queue.put(None)
+        self._thread.join()
+        return result
+
+    def _run(self)->None:
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                block_id, func, args = job
+                try:
+                    if self.error is None and not (self.cancel_event is not None and self.cancel_event.is_set()):
+                        ok, error = func(*args)
+                        if not ok:
+                            self.error = error or f'ChapterFinalizer: block {block_id} failed'
+                            print(self.error)
+                except Exception as e:
+                    self.error = f'ChapterFinalizer: block {block_id} failed: {e}'
+                    print(self.error)
+                finally:
+                    with self._changed:
+                        self.pending.discard(block_id)
+                        self._changed.notify_all()
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,95 @@
+import os, json
+
+from lib.classes.audio_writer import audio_subtypes
+
+class ChapterStream:
+
+    def __init__(self, chapters_dir:str, block_id:str)->None:
+        # raw little-endian int32 frames, a crash can only leave a tail past the last indexed sentence
+        self.stream_path = os.path.join(chapters_dir, f'{block_id}.stream.pcm')
+        self.index_path = os.path.join(chapters_dir, f'{block_id}.stream.json')
+        self.samplerate = None
+        self.channels = None
+        self.entries = []
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                self.samplerate = index['samplerate']
+                self.channels = index['channels']
+                self.entries = [tuple(entry) for entry in index['entries']]
+            except (OSError, ValueError, KeyError):
+                self.entries = []
+
+    @property
+    def frames(self)->int:
+        if not self.entries:
+            return 0
+        _, offset, frames = self.entries[-1]
+        return offset + frames
+
+    def resume(self, upto:int)->set[int]:
+        # keeps the indexed sentences below upto, cuts the stream right after the last one and returns their indexes
+        self.entries = [entry for entry in self.entries if entry[0] < upto]
+        if not self.entries:
+            self.reset()
+            return set()
+        with open(self.stream_path, 'ab') as f:
+            f.truncate(self.frames * self.channels * 4)
+        self._write_index()
+        return {entry[0] for entry in self.entries}
+
+    def append_file(self, idx:int, path:str)->None:
+        import soundfile as sf
+        audio, samplerate = sf.read(path, dtype='int32', always_2d=True)
+        if self.samplerate is None:
+            self.samplerate, self.channels = samplerate, audio.shape[1]
+        elif (samplerate, audio.shape[1]) != (self.samplerate, self.channels):
+            raise ValueError(f'ChapterStream: {path} is {samplerate} Hz / {audio.shape[1]} ch, stream is {self.samplerate} Hz / {self.channels} ch')
+        offset = self.frames
+        with open(self.stream_path, 'ab') as f:
+            f.truncate(offset * self.channels * 4)
+            f.write(audio.astype('<i4', copy=False).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries.append((idx, offset, len(audio)))
+        self._write_index()
+
+    def finalize(self, out_path:str, blocksize:int=65536)->None:
+        # encodes the stream into the chapter file then drops it, no sentence file is read again
+        import numpy as np
+        import soundfile as sf
+        fmt = os.path.splitext(out_path)[1].lstrip('.').lower()
+        tmp_path = f'{out_path}.part'
+        frame_bytes = self.channels * 4
+        remaining = self.frames * frame_bytes
+        try:
+            with open(self.stream_path, 'rb') as src, sf.SoundFile(tmp_path, 'w', samplerate=self.samplerate, channels=self.channels, format=fmt.upper(), subtype=audio_subtypes[fmt]) as out:
+                while remaining > 0:
+                    chunk = src.read(min(blocksize * frame_bytes, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    out.write(np.frombuffer(chunk, dtype='<i4').reshape(-1, self.channels))
+            with open(tmp_path, 'rb+') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, out_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.reset()
+
+    def reset(self)->None:
+        self.entries = []
+        self.samplerate = None
+        self.channels = None
+        for path in (self.stream_path, self.index_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _write_index(self)->None:
+        tmp_path = f'{self.index_path}.part'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'samplerate': self.samplerate, 'channels': self.channels, 'entries': self.entries}, f)
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,229 @@
+import os, sys, json, time, threading, functools, psutil
+
+from typing import Any, Callable
+
+class PerfRecorder:
+
+    recorders = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, session_id:str)->None:
+        self.session_id = session_id
+        self.started = time.time()
+        self.stages = {}
+        self.sentences = []
+        self.counters = {}
+        self.states = {}
+        # stages currently running, on any thread
+        self.open_stages = set()
+        self.process = psutil.Process()
+        self.process_cpu = self._process_cpu_time()
+        self.rss_interval = 0.05
+        self._sampler = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, session_id:str)->'PerfRecorder':
+        with cls._registry_lock:
+            if session_id not in cls.recorders:
+                cls.recorders[session_id] = cls(session_id)
+            return cls.recorders[session_id]
+
+    @classmethod
+    def release(cls, session_id:str)->None:
+        with cls._registry_lock:
+            cls.recorders.pop(session_id, None)
+
+    def stage(self, name:str)->'PerfStage':
+        return PerfStage(self, name)
+
+    def sample(self)->'PerfStage':
+        # same measurements as a stage, left out of the stage totals
+        return PerfStage(self, None)
+
+    def sentence(self, block_id:str, idx:int, chars:int, sample:'PerfStage', reused:bool)->None:
+        with self._lock:
+            self.sentences.append({
+                'block_id': block_id,
+                'idx': idx,
+                'chars': chars,
+                'wall_s': round(sample.wall_s, 4),
+                'thread_cpu_s': round(sample.thread_cpu_s, 4),
+                'rss_mb': round(sample.rss / 1024 ** 2, 1),
+                'peak_rss_mb': round(sample.peak_rss / 1024 ** 2, 1),
+                'peak_accel_mb': round(sample.peak_accel / 1024 ** 2, 1) if sample.peak_accel is not None else None,
+                'reused': reused
+            })
+
+    def count(self, name:str, n:int=1)->None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def state(self, name:str, value:dict)->None:
+        # last known snapshot of a component, e.g. the sentence scheduler
+        with self._lock:
+            self.states[name] = value
+
+    def open_stage(self, stage:'PerfStage')->None:
+        # ru_maxrss is the lifetime peak of the process, so rss is sampled while stages run
+        # and each stage keeps the highest value seen between its enter and exit
+        with self._lock:
+            rss = self.process.memory_info().rss
+            self._fold_rss(rss)
+            stage.peak_rss = rss
+            if stage.accel is not None:
+                # the device peak is shared by every thread and cleared on reset, so open stages
+                # take their share of the current peak before a new stage clears it
+                self._fold_accel(stage.accel)
+                stage.accel.reset_peak_memory_stats()
+                stage.peak_accel = 0
+            self.open_stages.add(stage)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_rss, name='PerfRecorderRSS', daemon=True)
+                self._sampler.start()
+
+    def close_stage(self, stage:'PerfStage')->None:
+        with self._lock:
+            self._fold_rss(self.process.memory_info().rss)
+            if stage.accel is not None:
+                self._fold_accel(stage.accel)
+            self.open_stages.discard(stage)
+
+    def _sample_rss(self)->None:
+        # spikes shorter than rss_interval can be missed, the thread ends with the last open stage
+        while True:
+            time.sleep(self.rss_interval)
+            with self._lock:
+                if not self.open_stages:
+                    self._sampler = None
+                    return
+                self._fold_rss(self.process.memory_info().rss)
+
+    def _fold_rss(self, rss:int)->None:
+        for stage in self.open_stages:
+            stage.peak_rss = max(stage.peak_rss, rss)
+
+    def _fold_accel(self, accel:Any)->None:
+        peak = accel.max_memory_allocated()
+        for stage in self.open_stages:
+            if stage.peak_accel is not None:
+                stage.peak_accel = max(stage.peak_accel, peak)
+
+    def _process_cpu_time(self)->float:
+        # children covers ffmpeg and other waited-for subprocesses
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system
+
+    def _process_peak_rss(self)->int:
+        if sys.platform != 'win32':
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # linux reports kilobytes, macos bytes
+            return peak if sys.platform == 'darwin' else peak * 1024
+        return getattr(self.process.memory_info(), 'peak_wset', self.process.memory_info().rss)
+
+    def add_stage(self, name:str, wall:float, thread_cpu:float, peak_rss:int, peak_accel:int|None)->None:
+        with self._lock:
+            stage = self.stages.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'thread_cpu_s': 0.0, 'peak_rss_mb': 0.0, 'peak_accel_mb': None})
+            stage['calls'] += 1
+            stage['wall_s'] = round(stage['wall_s'] + wall, 4)
+            stage['thread_cpu_s'] = round(stage['thread_cpu_s'] + thread_cpu, 4)
+            stage['peak_rss_mb'] = max(stage['peak_rss_mb'], round(peak_rss / 1024 ** 2, 1))
+            if peak_accel is not None:
+                stage['peak_accel_mb'] = max(stage['peak_accel_mb'] or 0.0, round(peak_accel / 1024 ** 2, 1))
+
+    def write_report(self, report_path:str, session:Any, sentence_audio:Callable[[str], dict]|None=None)->bool:
+        # sentence_audio(block_id) returns the block's sentence manifest, idx -> (samples, samplerate, checksum).
+        # sentence files may be gone by now (stream mode), the manifest still has their length.
+        try:
+            engines = {}
+            manifests = {}
+            for s in self.sentences:
+                s['audio_s'] = None
+                if sentence_audio is not None:
+                    if s['block_id'] not in manifests:
+                        manifests[s['block_id']] = sentence_audio(s['block_id'])
+                    entry = manifests[s['block_id']].get(s['idx'])
+                    if entry is not None and entry[1]:
+                        s['audio_s'] = round(entry[0] / entry[1], 4)
+                if s['reused'] or not s['audio_s']:
+                    continue
+                engine = engines.setdefault(session['tts_engine'], {'sentences': 0, 'wall_s': 0.0, 'audio_s': 0.0})
+                engine['sentences'] += 1
+                engine['wall_s'] += s['wall_s']
+                engine['audio_s'] += s['audio_s']
+            for engine in engines.values():
+                # real-time factor: seconds of compute per second of audio, below 1.0 is faster than real time
+                engine['rtf'] = round(engine['wall_s'] / engine['audio_s'], 4) if engine['audio_s'] else None
+                engine['wall_s'] = round(engine['wall_s'], 4)
+                engine['audio_s'] = round(engine['audio_s'], 4)
+            report = {
+                'session_id': self.session_id,
+                'ebook': os.path.basename(session['ebook']) if session['ebook'] else None,
+                'tts_engine': session['tts_engine'],
+                'fine_tuned': session['fine_tuned'],
+                'device': session['device'],
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'total_wall_s': round(time.time() - self.started, 4),
+                # whole process since the recorder started, worker threads and subprocesses included
+                'process_cpu_s': round(self._process_cpu_time() - self.process_cpu, 4),
+                'process_peak_rss_mb': round(self._process_peak_rss() / 1024 ** 2, 1),
+                'stages': self.stages,
+                'engines': engines,
+                'counters': self.counters,
+                'states': self.states,
+                'sentences': self.sentences
+            }
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            msg = f'Performance report saved in {report_path}'
+            print(msg)
+            return True
+        except Exception as e:
+            error = f'PerfRecorder.write_report() error: {e}'
+            print(error)
+            return False
+
+class PerfStage:
+
+    def __init__(self, recorder:PerfRecorder, name:str|None)->None:
+        self.recorder = recorder
+        self.name = name
+        self.peak_rss = 0
+        self.peak_accel = None
+
+    def __enter__(self)->'PerfStage':
+        self.accel = self._accel_module()
+        self.recorder.open_stage(self)
+        self.wall = time.perf_counter()
+        # cpu of the calling thread only, pool processes and ffmpeg show up in the report's process_cpu_s
+        self.thread_cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc:Any)->None:
+        self.wall_s = time.perf_counter() - self.wall
+        self.thread_cpu_s = time.thread_time() - self.thread_cpu
+        self.recorder.close_stage(self)
+        self.rss = self.recorder.process.memory_info().rss
+        if self.name is not None:
+            self.recorder.add_stage(self.name, self.wall_s, self.thread_cpu_s, self.peak_rss, self.peak_accel)
+
+    def _accel_module(self)->Any:
+        # only when torch is already loaded, instrumentation never pulls it in
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            return torch.cuda
+        return None
+
+def perf_stage(name:str)->Callable:
+    # times every call of the decorated function under `name`, session_id is its first argument
+    def decorator(func:Callable)->Callable:
+        @functools.wraps(func)
+        def wrapper(*args:Any, **kwargs:Any)->Any:
+            session_id = kwargs.get('session_id', args[0] if args else None)
+            if not isinstance(session_id, str):
+                return func(*args, **kwargs)
+            with PerfRecorder.get(session_id).stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,157 @@
+import os, time, hashlib, json, sqlite3, threading, unicodedata, regex as re
+
+from typing import Any
+from lib.classes.audio_writer import link_audio_file
+
+schema_sql = '''
+    CREATE TABLE IF NOT EXISTS entries (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_entries_used ON entries(used);
+'''
+
+upsert_entry_sql = 'INSERT OR REPLACE INTO entries (path, size, used) VALUES (?, ?, ?)'
+touch_entry_sql = 'UPDATE entries SET used=? WHERE path=?'
+delete_entry_sql = 'DELETE FROM entries WHERE path=?'
+total_size_sql = 'SELECT COALESCE(SUM(size), 0) FROM entries'
+count_entries_sql = 'SELECT COUNT(*) FROM entries'
+oldest_entries_sql = 'SELECT path, size FROM entries ORDER BY used LIMIT ?'
+
+def path_stamp(path:str|None)->str|None:
+    # size and mtime of a file, or of every file under a directory: a retrained custom model
+    # under the same name gets a new stamp without hashing gigabytes of checkpoint
+    if path is None or not os.path.exists(path):
+        return path
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return f'{stat.st_size}-{stat.st_mtime_ns}'
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for f in sorted(files):
+            file = os.path.join(root, f)
+            stat = os.stat(file)
+            h.update(f'{os.path.relpath(file, path)}:{stat.st_size}:{stat.st_mtime_ns};'.encode('utf-8'))
+    return h.hexdigest()
+
+class SentenceCache:
+
+    def __init__(self, cache_dir:str, max_size_gb:float)->None:
+        self.cache_dir = cache_dir
+        self.max_size = int(max_size_gb * 1024 ** 3)
+        self.voice_hashes = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # size and lru order live in an index, the cache tree is only walked to build a missing one
+        index_path = os.path.join(self.cache_dir, 'index.db')
+        is_new = not os.path.exists(index_path)
+        self.conn = sqlite3.connect(index_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(schema_sql)
+        if is_new:
+            self._rebuild_index()
+        self.conn.commit()
+        self.size = self.conn.execute(total_size_sql).fetchone()[0]
+
+    def make_key(self, sentence:str, voice:str|None, params:dict[str, Any])->str:
+        text = re.sub(r'\s+', ' ', unicodedata.normalize('NFC', sentence)).strip()
+        payload = json.dumps({'text': text, 'voice': self._voice_hash(voice), 'params': params}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def fetch(self, key:str, dst:str)->bool:
+        src = self._path(key, dst)
+        if not os.path.isfile(src):
+            return False
+        try:
+            link_audio_file(src, dst)
+        except OSError:
+            return False
+        # a hit moves the entry to the young end of the lru order
+        with self._lock:
+            if self.conn.execute(touch_entry_sql, (time.time(), self._rel(src))).rowcount == 0:
+                size = os.path.getsize(src)
+                self.conn.execute(upsert_entry_sql, (self._rel(src), size, time.time()))
+                self.size += size
+            self.conn.commit()
+        return True
+
+    def store(self, key:str, src:str)->bool:
+        dst = self._path(key, src)
+        if os.path.isfile(dst) or not os.path.isfile(src):
+            return False
+        try:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            link_audio_file(src, dst)
+        except OSError as e:
+            error = f'SentenceCache.store() error: {e}'
+            print(error)
+            return False
+        size = os.path.getsize(dst)
+        with self._lock:
+            self.conn.execute(upsert_entry_sql, (self._rel(dst), size, time.time()))
+            self.size += size
+            if self.size > self.max_size:
+                self._evict()
+            self.conn.commit()
+        return True
+
+    def count(self)->int:
+        with self._lock:
+            return self.conn.execute(count_entries_sql).fetchone()[0]
+
+    def close(self)->None:
+        with self._lock:
+            self.conn.close()
+
+    def _path(self, key:str, file:str)->str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}{os.path.splitext(file)[1]}')
+
+    def _rel(self, path:str)->str:
+        return os.path.relpath(path, self.cache_dir)
+
+    def _voice_hash(self, voice:str|None)->str|None:
+        if voice is None or not os.path.isfile(voice):
+            return voice
+        stat = os.stat(voice)
+        stamp = (voice, stat.st_size, stat.st_mtime_ns)
+        if stamp not in self.voice_hashes:
+            h = hashlib.sha256()
+            with open(voice, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    h.update(chunk)
+            self.voice_hashes[stamp] = h.hexdigest()
+        return self.voice_hashes[stamp]
+
+    def _rebuild_index(self)->None:
+        # caches written before the index existed, their mtime stands in for the last use
+        for root, _, files in os.walk(self.cache_dir):
+            for f in files:
+                path = os.path.join(root, f)
+                if os.path.dirname(path) == self.cache_dir or f.endswith('.part'):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                self.conn.execute(upsert_entry_sql, (self._rel(path), stat.st_size, stat.st_mtime))
+
+    def _evict(self)->None:
+        # drop least recently used entries down to 90% of the cap to avoid evicting on every store
+        target = int(self.max_size * 0.9)
+        while self.size > target:
+            rows = self.conn.execute(oldest_entries_sql, (256,)).fetchall()
+            if not rows:
+                self.size = 0
+                break
+            for rel, size in rows:
+                if self.size <= target:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, rel))
+                except OSError:
+                    pass
+                self.conn.execute(delete_entry_sql, (rel,))
+                self.size -= size
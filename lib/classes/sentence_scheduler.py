@@ -0,0 +1,99 @@
+import threading, regex as re
+
+from typing import Any, Callable, Generator
+
+token_pattern = re.compile(r'\w+|[^\w\s]', re.UNICODE)
+
+def count_tokens(sentence:str)->int:
+    return len(token_pattern.findall(sentence))
+
+class SentenceScheduler:
+
+    def __init__(self, run_batch:Callable[[list], list], batch_size:int, engine:str, window_size:int|None=None, token_count:Callable[[str], int]=count_tokens)->None:
+        # run_batch takes [(sentence_file, sentence, voice), ...] and returns one (run, error) per item
+        self.run_batch = run_batch
+        self.batch_size = max(1, int(batch_size))
+        self.engine = engine
+        self.window_size = window_size or self.batch_size * 4
+        self.token_count = token_count
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket_key(self, voice:str|None, sentence:str)->tuple:
+        # power of two token buckets: sentences in one batch differ by at most 2x in length
+        return (self.engine, voice, self.token_count(sentence).bit_length())
+
+    def run(self, items:list, cancelled:Callable[[], bool]|None=None)->Generator[tuple, None, None]:
+        # items: [(j, sentence_file, sentence, voice), ...] in document order.
+        # yields (j, run, error) in document order, one lookahead window at a time.
+        with self._lock:
+            self.queued += len(items)
+        # what a cancel, an error or an early close leaves behind is taken back off the counters
+        remaining = len(items)
+        unstarted = {}
+        try:
+            for w in range(0, len(items), self.window_size):
+                if cancelled is not None and cancelled():
+                    return
+                window = items[w:w + self.window_size]
+                results = {}
+                batches = self._plan(window)
+                for key, batch in batches:
+                    unstarted[key] = unstarted.get(key, 0) + len(batch)
+                for key, batch in batches:
+                    with self._lock:
+                        self.in_flight = len(batch)
+                        self._release_bucket(key, len(batch))
+                    unstarted[key] -= len(batch)
+                    for (j, *_), result in zip(batch, self.run_batch([item[1:] for item in batch])):
+                        results[j] = result
+                    with self._lock:
+                        self.in_flight = 0
+                        self.queued -= len(batch)
+                        self.completed += len(batch)
+                    remaining -= len(batch)
+                for j, *_ in window:
+                    run, error = results[j]
+                    yield j, run, error
+        finally:
+            with self._lock:
+                self.in_flight = 0
+                self.queued -= remaining
+                for key, count in unstarted.items():
+                    if count:
+                        self._release_bucket(key, count)
+
+    def state(self)->dict[str, Any]:
+        with self._lock:
+            return {
+                'engine': self.engine,
+                'batch_size': self.batch_size,
+                'queued': self.queued,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'buckets': {f'{voice}:{1 << bucket >> 1}-{(1 << bucket) - 1}': count for (_, voice, bucket), count in self.buckets.items()}
+            }
+
+    def _release_bucket(self, key:tuple, count:int)->None:
+        self.buckets[key] -= count
+        if not self.buckets[key]:
+            del self.buckets[key]
+
+    def _plan(self, window:list)->list:
+        buckets = {}
+        for item in window:
+            _, _, sentence, voice = item
+            buckets.setdefault(self.bucket_key(voice, sentence), []).append(item)
+        with self._lock:
+            for key, bucket in buckets.items():
+                self.buckets[key] = self.buckets.get(key, 0) + len(bucket)
+        batches = []
+        # shortest buckets first, one voice at a time inside a bucket so each batch sets its voice once
+        for key in sorted(buckets, key=lambda k: (k[2], str(k[1]))):
+            bucket = sorted(buckets[key], key=lambda item: self.token_count(item[2]))
+            for b in range(0, len(bucket), self.batch_size):
+                batches.append((key, bucket[b:b + self.batch_size]))
+        return batches
@@ -0,0 +1,164 @@
+import copy, threading
+
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Iterator
+
+@dataclass(slots=True, eq=False)
+class SessionState:
+    ####### Global settings
+    id: str|None = None
+    script_mode: str|None = None
+    tab_id: str|None = None
+    socket_hash: str|None = None
+    session_dir: str|None = None
+    is_gui_process: bool = False
+    free_vram_gb: float = 0
+    status: str|None = None
+    ticker: int = 0
+    cancellation_requested: bool = False
+    ebook_mode: str|None = None
+    blocks_preview: bool = False
+    device: str|None = None
+    tts_engine: str|None = None
+    fine_tuned: str|None = None
+    model_cache: str|None = None
+    model_zs_cache: str|None = None
+    stanza_cache: str|None = None
+    system: str|None = None
+    client: str|None = None
+    language: str|None = None
+    language_iso1: str|None = None
+    translate_enabled: bool = False
+    translate: str|None = None
+    translate_iso1: str|None = None
+    voice: str|None = None
+    voice_dir: str|None = None
+    voice_map: dict = field(default_factory=dict)
+    ebook_selected: str|None = None
+    custom_model: str|None = None
+    custom_model_dir: str|None = None
+    output_dir: str|None = None
+    output_format: str|None = None
+    output_extra_formats: list = field(default_factory=list)
+    output_channel: str|None = None
+    output_split: bool = False
+    output_split_hours: str|int|None = None
+    abs_enabled: bool = False
+    abs_server_url: str|None = None
+    abs_api_token: str|None = None
+    abs_library_id: str|None = None
+    abs_auto_upload: bool = False
+    ####### Xtts settings
+    xtts_temperature: float|None = None
+    xtts_length_penalty: float|None = None
+    xtts_num_beams: int|None = None
+    xtts_repetition_penalty: float|None = None
+    xtts_top_k: int|None = None
+    xtts_top_p: float|None = None
+    xtts_speed: float|None = None
+    xtts_enable_text_splitting: bool = False
+    ####### Bark settings
+    bark_text_temp: float|None = None
+    bark_waveform_temp: float|None = None
+    ####### Audiobook editor
+    audiobook: str|None = None
+    audiobooks_dir: str|None = None
+    ####### Ebook conversion
+    ebook: str|None = None
+    ebook_src: str|None = None
+    ebook_list: list|None = None
+    ebook_loaded: str|None = None
+    ebook_textarea: str|None = None
+    ebook_textarea_src: str|None = None
+    audiobook_overridden: str|None = None
+    process_dir: str|None = None
+    chapters_dir: str|None = None
+    sentences_dir: str|None = None
+    epub_path: str|None = None
+    final_name: str|None = None
+    filename_noext: str|None = None
+    cover: str|None = None
+    blocks_orig: dict = field(default_factory=dict)
+    blocks_saved: dict = field(default_factory=dict)
+    blocks_current: dict = field(default_factory=dict)
+    blocks_orig_json: str|None = None
+    blocks_saved_json: str|None = None
+    blocks_current_db: str|None = None
+    duration: float = 0
+    playback_time: float = 0
+    playback_volume: float = 0
+    metadata: dict = field(default_factory=dict)
+    ####### Internal state, never part of keys() or snapshot()
+    extra: dict = field(default_factory=dict, repr=False)
+    listeners: list = field(default_factory=list, repr=False)
+    lock: Any = field(default_factory=threading.RLock, repr=False)
+
+    @classmethod
+    def from_dict(cls, data:dict)->'SessionState':
+        state = cls()
+        for key, value in data.items():
+            state[key] = value
+        return state
+
+    # dict protocol, the rest of the app keeps reading and writing session['key']
+    def __getitem__(self, key:str)->Any:
+        if key in session_keys:
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __setitem__(self, key:str, value:Any)->None:
+        if key in session_keys:
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+        if self.listeners:
+            self._notify(key, value)
+
+    def __contains__(self, key:object)->bool:
+        return key in session_keys or key in self.extra
+
+    def __iter__(self)->Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self)->int:
+        return len(session_fields) + len(self.extra)
+
+    def get(self, key:str, default:Any=None)->Any:
+        if key in session_keys:
+            return getattr(self, key)
+        return self.extra.get(key, default)
+
+    def keys(self)->list[str]:
+        return [*session_fields, *self.extra]
+
+    def values(self)->list[Any]:
+        return [self[key] for key in self.keys()]
+
+    def items(self)->list[tuple]:
+        return [(key, self[key]) for key in self.keys()]
+
+    def snapshot(self)->dict[str, Any]:
+        # deep plain copy for persistence, later writes to the session never leak into it
+        with self.lock:
+            return copy.deepcopy({key: self[key] for key in self.keys()})
+
+    def subscribe(self, callback:Callable[[str, Any], None])->None:
+        with self.lock:
+            if callback not in self.listeners:
+                self.listeners.append(callback)
+
+    def unsubscribe(self, callback:Callable[[str, Any], None])->None:
+        with self.lock:
+            if callback in self.listeners:
+                self.listeners.remove(callback)
+
+    def _notify(self, key:str, value:Any)->None:
+        for callback in list(self.listeners):
+            try:
+                callback(key, value)
+            except Exception as e:
+                error = f'SessionState listener error on {key}: {e}'
+                print(error)
+
+session_fields = tuple(f.name for f in fields(SessionState) if f.name not in ('extra', 'listeners', 'lock'))
+session_keys = frozenset(session_fields)
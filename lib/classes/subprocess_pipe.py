@@ -4,7 +4,7 @@ from collections.abc import Callable
 
 class SubprocessPipe:
 
-    def __init__(self, cmd:list[str], is_gui_process:bool, total_duration:float, msg:str='Processing', on_progress:Callable[[float], None]|None=None)->None:
+    def __init__(self, cmd:list[str], is_gui_process:bool, total_duration:float, msg:str='Processing', on_progress:Callable[[float], None]|None=None, cancel_event:threading.Event|None=None)->None:
         self.cmd = cmd
         self.is_gui_process = is_gui_process
         self.total_duration = total_duration
@@ -12,6 +12,7 @@ class SubprocessPipe:
         self.process = None
         self._stop_requested = False
         self.on_progress = on_progress
+        self.cancel_event = cancel_event
         self.progress_bar = False
         if self.is_gui_process:
             self.progress_bar = gr.Progress(track_tqdm=False)
@@ -37,8 +38,17 @@ class SubprocessPipe:
         if self.progress_bar:
             self.progress_bar(0.0, desc=error)
 
+    def _watch_cancel(self)->None:
+        # kills the process as soon as the session is cancelled instead of letting it run to the end
+        while self.process.poll() is None:
+            if self.cancel_event.wait(0.1):
+                self.stop()
+                return
+
     def _run_process(self)->bool:
         try:
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                return False
             is_ffmpeg = "ffmpeg" in os.path.basename(self.cmd[0])
             if is_ffmpeg:
                 self.process = subprocess.Popen(
@@ -61,6 +71,8 @@ class SubprocessPipe:
                         stdout=None,
                         stderr=None
                     )
+            if self.cancel_event is not None:
+                threading.Thread(target=self._watch_cancel, daemon=True).start()
             if is_ffmpeg:
                 time_pattern = re.compile(rb'out_time_ms=(\d+)')
                 last_percent = 0.0
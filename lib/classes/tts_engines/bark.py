@@ -182,13 +182,7 @@ class Bark(TTSUtils, TTSRegistry, name='bark'):
                         speaker_argument = {}
                         if (self.engine.speakers is not None and self.speaker not in self.engine.speakers) or self.engine.speakers is None:
                             bark_sr = self.engine.synthesizer.tts_model.config.sample_rate
-                            voice_path = self.params['current_voice']
-                            cache_key = (voice_path, bark_sr)
-                            resampled_wav = self.resampled_wav_cache.get(cache_key)
-                            if resampled_wav is None or not os.path.exists(resampled_wav):
-                                resampled_wav = self._resample_wav(voice_path, bark_sr)
-                                self.resampled_wav_cache[cache_key] = resampled_wav
-                            speaker_argument['speaker_wav'] = resampled_wav
+                            speaker_argument['speaker_wav'] = self._get_resampled_voice(self.params['current_voice'], bark_sr)
                         try:
                             with torch.inference_mode():
                                 #with torch.autocast(self.device, dtype=self.amp_dtype, enabled=(self.amp_dtype != torch.float32)):
@@ -224,7 +218,7 @@ class Bark(TTSUtils, TTSRegistry, name='bark'):
                         error = f'audio_save() error: cannot save {sentence_file}'
                         return False, error
                     self.audio_segments = []
-                    if not os.path.exists(sentence_file):
+                    if not self.audio_file_ready(sentence_file):
                         error = f'Cannot create {sentence_file}'
                         return False, error
                 return True, None
@@ -1,6 +1,6 @@
-import sys, os, shutil, random, subprocess, uuid, wave, regex as re
+import sys, os, shutil, random, subprocess, uuid, wave, hashlib, regex as re
 
-from typing import Any
+from typing import Any, Generator
 from pathlib import Path
 from multiprocessing.managers import DictProxy
 
@@ -1,11 +1,13 @@
-import os, sys, threading, gc, ctypes, tempfile, regex as re
+import os, sys, json, threading, gc, ctypes, tempfile, regex as re
 
-from typing import Any, TYPE_CHECKING
+from typing import Any, Callable, Generator, TYPE_CHECKING
 from cryptography.fernet import Fernet
 from pathlib import Path
 
 from lib.classes.vram_detector import VRAMDetector
-from lib.classes.tts_engines.common.audio import normalize_audio, get_audiolist_duration, is_audio_data_valid
+from lib.classes.audio_writer import audio_subtypes, write_audio_file
+from lib.classes.block_store import BlockStore
+from lib.classes.tts_engines.common.audio import normalize_audio, is_audio_data_valid
 from lib import *
 
 os.environ['HF_TOKEN'] = Fernet(fernet_key.encode('utf-8')).decrypt(fernet_data).decode('utf-8')
@@ -23,68 +25,141 @@ def format_timestamp(seconds:float)->str:
     h, m = divmod(m, 60)
     return f'{int(h):02}:{int(m):02}:{s:06.3f}'
 
+def infer_coqui_batch(synthesizer:Any, texts:list[str], speaker:str|None=None, device:str='cpu', amp_dtype:Any=None)->list|None:
+    # one padded forward pass through a coqui tts_model for every sentence of every text.
+    # rows get the post-processing Synthesizer.tts() gives them in convert(): trim_silence() when the
+    # model config asks for it and the 10000 zero samples it appends after each sentence.
+    # end-to-end models (vits) return the waveform and its frame mask,
+    # spectrogram models (glowtts) return mels whose alignments give each row's frame count.
+    import torch
+    import numpy as np
+    from TTS.tts.utils.synthesis import trim_silence
+    tts_model = getattr(synthesizer, 'tts_model', None)
+    tokenizer = getattr(tts_model, 'tokenizer', None)
+    if tts_model is None or tokenizer is None:
+        return None
+    amp_dtype = amp_dtype or torch.float32
+    model_device = next(tts_model.parameters()).device
+    rows = []
+    owners = []
+    for i, text in enumerate(texts):
+        for sen in synthesizer.split_into_sentences(text):
+            ids = tokenizer.text_to_ids(sen)
+            if ids:
+                rows.append(ids)
+                owners.append(i)
+    if not rows or set(owners) != set(range(len(texts))):
+        return None
+    lengths = torch.tensor([len(x) for x in rows], dtype=torch.long, device=model_device)
+    inputs = torch.zeros((len(rows), int(lengths.max())), dtype=torch.long, device=model_device)
+    for r, x in enumerate(rows):
+        inputs[r, :len(x)] = torch.tensor(x, dtype=torch.long, device=model_device)
+    aux_input = {'x_lengths': lengths, 'speaker_ids': None, 'd_vectors': None, 'language_ids': None}
+    if speaker is not None:
+        speaker_manager = getattr(tts_model, 'speaker_manager', None)
+        if speaker_manager is None or speaker not in speaker_manager.name_to_id:
+            return None
+        aux_input['speaker_ids'] = torch.full((len(rows),), speaker_manager.name_to_id[speaker], dtype=torch.long, device=model_device)
+    wavs = []
+    with torch.inference_mode():
+        with torch.autocast(device, dtype=amp_dtype, enabled=(amp_dtype != torch.float32)):
+            outputs = tts_model.inference(inputs, aux_input=aux_input)
+        model_outputs = outputs['model_outputs']
+        if outputs.get('y_mask') is not None and model_outputs.dim() == 3 and model_outputs.size(1) == 1:
+            hop_length = tts_model.config.audio.hop_length
+            frames = outputs['y_mask'].sum(dim=(1, 2)).long().tolist()
+            wavs = [model_outputs[r, 0, :frames[r] * hop_length].float().cpu().numpy() for r in range(len(rows))]
+        else:
+            vocoder = getattr(synthesizer, 'vocoder_model', None)
+            alignments = outputs.get('alignments')
+            if vocoder is None or alignments is None:
+                return None
+            if synthesizer.vocoder_config['audio']['sample_rate'] != tts_model.ap.sample_rate:
+                return None
+            frames = alignments.sum(dim=(1, 2)).round().long().tolist()
+            for r in range(len(rows)):
+                mel = model_outputs[r, :frames[r]].float().cpu().numpy()
+                mel = tts_model.ap.denormalize(mel.T).T
+                vocoder_input = torch.tensor(synthesizer.vocoder_ap.normalize(mel.T)).unsqueeze(0).to(model_device)
+                wavs.append(vocoder.inference(vocoder_input).squeeze().float().cpu().numpy())
+    audio_config = synthesizer.tts_config.audio
+    do_trim_silence = 'do_trim_silence' in audio_config and audio_config['do_trim_silence']
+    per_text = [[] for _ in texts]
+    for owner, wav in zip(owners, wavs):
+        if do_trim_silence:
+            wav = trim_silence(wav, tts_model.ap)
+        per_text[owner] += [wav, np.zeros(10000, dtype=np.float32)]
+    return [torch.from_numpy(np.concatenate(chunks).astype(np.float32, copy=False)) for chunks in per_text]
+
+def chapter_cues_file(session:dict, block_id:str)->str:
+    return os.path.join(session['chapters_dir'], f'{block_id}.cues.json')
+
+def write_chapter_cues(session:dict, block:dict, written:dict)->tuple:
+    # cue times are relative to the chapter start, the final vtt only offsets and concatenates them.
+    # written is the sentence manifest of the block: idx -> (samples, samplerate, checksum)
+    try:
+        cues = []
+        offset = 0.0
+        for j, sentence in enumerate(block.get('sentences', [])):
+            entry = written.get(j)
+            if not any(c.isalnum() for c in str(sentence)):
+                if entry is not None:
+                    offset += entry[0] / entry[1]
+                continue
+            if entry is None:
+                error = f"Missing audio file for block {block['id']}, sentence {j}"
+                return None, error
+            duration = entry[0] / entry[1]
+            text = re.sub(r'\s+', ' ', SML_TAG_PATTERN.sub('', str(sentence))).strip()
+            cues.append([offset, offset + duration, text])
+            offset += duration
+        data = {'duration': offset, 'cues': cues}
+        cues_file = chapter_cues_file(session, block['id'])
+        with open(f'{cues_file}.part', 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(f'{cues_file}.part', cues_file)
+        return data, None
+    except Exception as e:
+        error = f'write_chapter_cues(): {e}'
+        return None, error
+
+def load_chapter_cues(session:dict, block:dict, block_store:BlockStore)->tuple:
+    cues_file = chapter_cues_file(session, block['id'])
+    if os.path.exists(cues_file):
+        try:
+            with open(cues_file, 'r', encoding='utf-8') as f:
+                return json.load(f), None
+        except (OSError, ValueError):
+            pass
+    # chapters converted before cue files existed get theirs from the manifest once
+    block_dir = os.path.join(session['sentences_dir'], block['id'])
+    written = block_store.sentence_audio(block['id'], block_dir, default_audio_proc_format)
+    if not written:
+        error = f"Missing sentence audio for block {block['id']}: {block_dir}"
+        return None, error
+    return write_chapter_cues(session, block, written)
+
 def build_vtt_file(session:dict, vtt_path:str=None, block_indices:set=None)->tuple:
     try:
-        import gradio as gr
-        from tqdm import tqdm
         msg = 'VTT file creation started…'
         print(msg)
         if vtt_path is None:
             vtt_path = os.path.join(session['process_dir'], Path(session['final_name']).stem + '.vtt')
-        audio_sentences_dir = Path(session['sentences_dir'])
         blocks = session['blocks_current']['blocks']
-        audio_files = []
-        sentences_to_use = []
+        block_store = BlockStore.get(session['blocks_current_db'])
+        vtt_blocks = []
+        offset = 0.0
         for i, block in enumerate(blocks):
             if not (block['keep'] and block['text'].strip()):
                 continue
             if block_indices is not None and i not in block_indices:
                 continue
-            block_dir = audio_sentences_dir / str(block['id'])
-            if not block_dir.is_dir():
-                error = f"Missing audio directory for block {i} (id {block['id']}): {block_dir}"
-                return False, error
-            block_sentences = block.get('sentences', [])
-            for sentence_idx, sentence in enumerate(block_sentences):
-                if not any(c.isalnum() for c in str(sentence)):
-                    continue
-                audio_file = block_dir / f'{sentence_idx}.{default_audio_proc_format}'
-                if not audio_file.is_file():
-                    error = f"Missing audio file for block {i} (id {block['id']}), sentence {sentence_idx}: {audio_file}"
-                    return False, error
-                audio_files.append(audio_file)
-                sentences_to_use.append(sentence)
-        audio_files_length = len(audio_files)
-        sentences_total_time = 0.0
-        vtt_blocks = []
-        if session['is_gui_process']:
-            progress_bar = gr.Progress(track_tqdm=False)
-        msg = 'Get duration of each sentence…'
-        print(msg)
-        durations = get_audiolist_duration([str(p) for p in audio_files])
-        msg = 'Create VTT blocks…'
-        print(msg)
-        with tqdm(total=audio_files_length, unit='files') as t:
-            for idx, file in enumerate(audio_files):
-                start_time = sentences_total_time
-                duration = durations.get(os.path.realpath(file), 0.0)
-                end_time = start_time + duration
-                sentences_total_time = end_time
-                start = format_timestamp(start_time)
-                end = format_timestamp(end_time)
-                text = re.sub(
-                    r'\s+',
-                    ' ',
-                    SML_TAG_PATTERN.sub('', str(sentences_to_use[idx]))
-                ).strip()
-                vtt_blocks.append(f'{start} --> {end}\n{text}\n')
-                if session['is_gui_process']:
-                    total_progress = (t.n + 1) / audio_files_length
-                    progress_bar(
-                        progress=total_progress,
-                        desc=f'Writing vtt idx {idx}'
-                    )
-                t.update(1)
+            chapter, error = load_chapter_cues(session, block, block_store)
+            if chapter is None:
+                return False, f'block {i}: {error}'
+            for start, end, text in chapter['cues']:
+                vtt_blocks.append(f'{format_timestamp(offset + start)} --> {format_timestamp(offset + end)}\n{text}\n')
+            offset += chapter['duration']
         msg = 'Write VTT blocks into file…'
         print(msg)
         with open(vtt_path, 'w', encoding='utf-8') as f:
@@ -95,8 +170,13 @@ def build_vtt_file(session:dict, vtt_path:str=None, block_indices:set=None)->tup
         error = f'build_vtt_file(): {e}'
         return False, error
 
+# builtin speaker regeneration moves the shared xtts model between devices, one voice at a time
+builtin_voice_lock = threading.Lock()
+
 class TTSUtils:
 
+    audio_writer = None
+
     def cleanup_memory(self)->None:
         import torch
         gc.collect()
@@ -546,7 +626,7 @@ class TTSUtils:
                                 os.makedirs(os.path.dirname(new_current_voice), exist_ok=True)
                                 proc_current_voice = new_current_voice.replace('.wav', '_temp.wav')
                                 #torchaudio.save(proc_current_voice, audio_tensor, default_engine_settings[xtts]['samplerate'])
-                                if not self.audio_save(proc_current_voice, audio_tensor, default_engine_settings[xtts]['samplerate']):
+                                if not self.audio_save(proc_current_voice, audio_tensor, default_engine_settings[xtts]['samplerate'], wait=True):
                                     error = f'audio_save() error: cannot save {proc_current_voice}'
                                     print(error)
                                     Path(proc_current_voice).unlink(missing_ok=True)
@@ -647,6 +727,9 @@ class TTSUtils:
         return waveform.squeeze(0).cpu().numpy()
 
     def _set_voice(self, voice:str|None)->tuple:
+        resolved_voices = self.params.setdefault('resolved_voices', {})
+        if voice in resolved_voices:
+            return resolved_voices[voice], None
         current_voice = (voice if voice is not None else self.models[self.session['fine_tuned']]['voice'])
         if current_voice is None:
             if self.session['custom_model'] is not None:
@@ -658,11 +741,54 @@ class TTSUtils:
                 (speaker not in {k for engine in default_engine_settings.values() for k in engine['voices']}) and 
                 (self.session['custom_model_dir'] not in current_voice)
               ):
-                current_voice = self._check_xtts_builtin_speakers(current_voice, speaker)
+                with builtin_voice_lock:
+                    current_voice = self._check_xtts_builtin_speakers(current_voice, speaker)
                 if not current_voice:
                     error = f"_set_voice() error: Could not create the builtin speaker selected voice in {self.language}"
                     return None, error
+        resolved_voices[voice] = current_voice
         return current_voice, None
+
+    def preload_voices(self, block_voices:list, inline_voices:list)->tuple:
+        # resolves and conditions every voice of the book up front so synthesis never stops on voice setup
+        from concurrent.futures import ThreadPoolExecutor
+        voices = [(voice, False) for voice in block_voices] + [(voice, True) for voice in inline_voices]
+        if not voices:
+            return True, None
+        with ThreadPoolExecutor(max_workers=min(len(voices), os.cpu_count() or 1)) as pool:
+            results = list(pool.map(lambda item: self._prepare_voice(*item), voices))
+        for prepared, error in results:
+            if not prepared:
+                return False, error
+        return True, None
+
+    def _prepare_voice(self, voice:str|None, is_inline:bool)->tuple:
+        try:
+            if is_inline:
+                # voice tags use their file as is, a missing one is reported by _convert_sml()
+                current_voice = voice if os.path.exists(voice) else None
+            else:
+                current_voice, error = self._set_voice(voice)
+                if current_voice is None and error is not None:
+                    return False, error
+            if current_voice is not None:
+                self._prepare_voice_conditioning(current_voice)
+            return True, None
+        except Exception as e:
+            return False, self.log_exception(f'{self.__class__.__name__}._prepare_voice()', e)
+
+    def _prepare_voice_conditioning(self, current_voice:str)->None:
+        # engines converting their builtin voice with a zero-shot model need the target voice at its samplerate
+        if getattr(self, 'engine_zs', None) and os.path.exists(current_voice):
+            self._get_resampled_voice(current_voice, TTS_VOICE_CONVERSION[self.tts_zs_key]['samplerate'])
+
+    def _get_resampled_voice(self, voice_path:str, samplerate:int)->str:
+        cache_key = (voice_path, samplerate)
+        resampled_wav = self.resampled_wav_cache.get(cache_key)
+        if resampled_wav is None or not os.path.exists(resampled_wav):
+            resampled_wav = self._resample_wav(voice_path, samplerate)
+            self.resampled_wav_cache[cache_key] = resampled_wav
+        return resampled_wav
         
     def _split_sentence_on_sml(self, sentence:str)->list[str]:
         parts:list[str] = []
@@ -727,26 +853,116 @@ class TTSUtils:
             error = 'This SML is not recognized'
             return False, error
             
-    def audio_save(self, sentence_file, segment_tensor:any, samplerate:int)->bool:
+    def _convert_batch(self, items:list, infer_batch:Callable[[list[str]], list|None], trim_audio_buffer:float|None=None)->list:
+        # items: [(sentence_file, sentence, block_voice), ...]. plain text sentences sharing a voice
+        # go through infer_batch() in one call, anything carrying SML tags keeps the convert() path.
+        # infer_batch() returns one waveform per text, or None when it cannot batch the current voice.
+        results = [None] * len(items)
+        groups = {}
+        for i, (sentence_file, sentence, block_voice) in enumerate(items):
+            part = sentence.strip()
+            if self.params.get('inline_voice') or SML_TAG_PATTERN.search(part) or not any(c.isalnum() for c in part):
+                results[i] = self.convert(sentence_file, sentence, block_voice=block_voice)
+                continue
+            if part.endswith("'"):
+                part = part[:-1]
+            groups.setdefault(block_voice, []).append((i, part))
+        for block_voice, entries in groups.items():
+            self.params['block_voice'] = block_voice
+            self.params['current_voice'], error = self._set_voice(block_voice)
+            if self.params['current_voice'] is None and error is not None:
+                for i, _ in entries:
+                    results[i] = (False, error)
+                continue
+            try:
+                audio_parts = infer_batch([part for _, part in entries])
+            except Exception as e:
+                self.log_exception(f'{self.__class__.__name__}._convert_batch() infer_batch', e)
+                self.cleanup_memory()
+                audio_parts = None
+            if audio_parts is None or len(audio_parts) != len(entries):
+                for i, _ in entries:
+                    sentence_file, sentence, _ = items[i]
+                    results[i] = self.convert(sentence_file, sentence, block_voice=block_voice)
+                continue
+            for (i, part), audio_part in zip(entries, audio_parts):
+                results[i] = self._save_batch_part(items[i][0], part, audio_part, trim_audio_buffer)
+        return results
+
+    def _save_batch_part(self, sentence_file:str, part:str, audio_part:Any, trim_audio_buffer:float|None)->tuple:
+        try:
+            import torch
+            from lib.classes.tts_engines.common.audio import trim_audio
+            if audio_part is None or len(audio_part) == 0:
+                error = 'audio_part not valid'
+                return False, error
+            if torch.is_tensor(audio_part):
+                audio_part = audio_part.detach().cpu()
+            if not is_audio_data_valid(audio_part):
+                error = 'audio_part not valid'
+                return False, error
+            part_tensor = self._tensor_type(audio_part).float().unsqueeze(0)
+            if trim_audio_buffer is not None and (part[-1].isalnum() or part[-1] == '—'):
+                part_tensor = trim_audio(part_tensor.squeeze(0), self.params['samplerate'], 0.001, trim_audio_buffer).unsqueeze(0)
+            if part_tensor.numel() == 0:
+                error = 'part_tensor not valid'
+                return False, error
+            if not self.audio_save(sentence_file, part_tensor, self.params['samplerate']):
+                error = f'audio_save() error: cannot save {sentence_file}'
+                return False, error
+            if not self.audio_file_ready(sentence_file):
+                error = f'Cannot create {sentence_file}'
+                return False, error
+            return True, None
+        except Exception as e:
+            return False, self.log_exception(f'{self.__class__.__name__}._save_batch_part()', e)
+
+    def _infer_batch_coqui(self, texts:list[str], speaker:str|None=None)->list|None:
+        synthesizer = getattr(self.engine, 'synthesizer', None)
+        return infer_coqui_batch(synthesizer, texts, speaker, self.device, self.amp_dtype)
+
+    def convert_stream(self, sentence:str, **kwargs)->Generator[Any, None, None]:
+        # engines without chunked decoding stream the finished sentence as a single chunk
         import soundfile as sf
-        formats = {"wav": "FLOAT", "flac": "PCM_24", "ogg": "VORBIS"}
+        stream_tmp = os.path.join(self.session['process_dir'], 'tmp')
+        os.makedirs(stream_tmp, exist_ok=True)
+        data = None
+        # the directory takes whatever convert() leaves next to the sentence file, and it is gone
+        # before the chunk is handed out, a consumer that never resumes the generator leaks nothing
+        with tempfile.TemporaryDirectory(dir=stream_tmp) as tmp_dir:
+            tmp_path = os.path.join(tmp_dir, f'sentence.{default_audio_proc_format}')
+            success, error = self.convert(tmp_path, sentence, **kwargs)
+            if self.audio_writer is not None:
+                written, write_error = self.audio_writer.drain()
+                if not written:
+                    success, error = False, write_error
+            if not success:
+                raise RuntimeError(error)
+            if os.path.exists(tmp_path):
+                data, _ = sf.read(tmp_path, dtype='float32')
+        if data is not None:
+            yield data
+
+    def audio_save(self, sentence_file, segment_tensor:any, samplerate:int, wait:bool=False)->bool:
         path = os.fspath(sentence_file)
         fmt = os.path.splitext(path)[1].lstrip('.').lower()
-        if fmt not in formats:
-            raise ValueError(f'audio_save: format {fmt!r} not in {tuple(formats)}')
+        if fmt not in audio_subtypes:
+            raise ValueError(f'audio_save: format {fmt!r} not in {tuple(audio_subtypes)}')
         audio_np = segment_tensor.detach().cpu().numpy().squeeze(0)
+        if self.audio_writer is not None and not wait:
+            # encoding and disk write happen on the writer thread, inference goes on with the next sentence
+            return self.audio_writer.submit(path, audio_np, samplerate)
         try:
-            sf.write(path, audio_np, samplerate, subtype=formats[fmt])
+            write_audio_file(path, audio_np, samplerate)
         except Exception as e:
-            # remove any partial file from a failed write
-            if os.path.exists(path):
-                try:
-                    os.remove(path)
-                except OSError:
-                    pass
             raise RuntimeError(f'audio_save({path}): {e}') from e
         return True
 
+    def audio_file_ready(self, sentence_file:str)->bool:
+        if self.audio_writer is not None and self.audio_writer.is_pending(sentence_file):
+            return True
+        return os.path.exists(sentence_file)
+
     def log_exception(self,where:str, e:Exception)->str:
         import traceback
         traceback.print_exc()
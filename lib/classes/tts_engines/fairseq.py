@@ -179,7 +179,7 @@ class Fairseq(TTSUtils, TTSRegistry, name='fairseq'):
                                     tmp_out_wav = tmp_in_wav
                                 samplerate = TTS_VOICE_CONVERSION[self.tts_zs_key]['samplerate']
                                 source_wav = self._resample_wav(tmp_out_wav, samplerate)
-                                target_wav = self._resample_wav(self.params['current_voice'], samplerate)
+                                target_wav = self._get_resampled_voice(self.params['current_voice'], samplerate)
                                 speaker_argument = {}
                                 if (self.engine_zs.speakers is not None and self.speaker not in self.engine_zs.speakers) or self.engine_zs.speakers is None:
                                     speaker_argument['target_wav'] = target_wav
@@ -226,7 +226,7 @@ class Fairseq(TTSUtils, TTSRegistry, name='fairseq'):
                         error = f'audio_save() error: cannot save {sentence_file}'
                         return False, error
                     self.audio_segments = []
-                    if not os.path.exists(sentence_file):
+                    if not self.audio_file_ready(sentence_file):
                         error = f'Cannot create {sentence_file}'
                         return False, error
                 return True, None
@@ -5,6 +5,8 @@ from lib.classes.tts_engines.common.preset_loader import load_engine_presets
 
 class GlowTTS(TTSUtils, TTSRegistry, name='glowtts'):
 
+    supports_batch = True
+
     def __init__(self, session:DictProxy):
         try:
             self.session = session
@@ -181,7 +183,7 @@ class GlowTTS(TTSUtils, TTSRegistry, name='glowtts'):
                                     tmp_out_wav = tmp_in_wav
                                 samplerate = TTS_VOICE_CONVERSION[self.tts_zs_key]['samplerate']
                                 source_wav = self._resample_wav(tmp_out_wav, samplerate)
-                                target_wav = self._resample_wav(self.params['current_voice'], samplerate)
+                                target_wav = self._get_resampled_voice(self.params['current_voice'], samplerate)
                                 speaker_argument = {}
                                 if (self.engine_zs.speakers is not None and self.speaker not in self.engine_zs.speakers) or self.engine_zs.speakers is None:
                                     speaker_argument['target_wav'] = target_wav
@@ -228,7 +230,7 @@ class GlowTTS(TTSUtils, TTSRegistry, name='glowtts'):
                         error = f'audio_save() error: cannot save {sentence_file}'
                         return False, error
                     self.audio_segments = []
-                    if not os.path.exists(sentence_file):
+                    if not self.audio_file_ready(sentence_file):
                         error = f'Cannot create {sentence_file}'
                         return False, error
                 return True, None
@@ -240,6 +242,29 @@ class GlowTTS(TTSUtils, TTSRegistry, name='glowtts'):
             self.audio_segments = []
             return False, self.log_exception(f'{self.__class__.__name__}.convert()',e)
 
+    def convert_batch(self, items:list)->list:
+        if not self.engine:
+            error = f"TTS engine {self.session['tts_engine']} failed to load!"
+            return [(False, error)] * len(items)
+        return self._convert_batch(items, self._infer_batch)
+
+    def _infer_batch(self, texts:list[str])->list|None:
+        if self.params['current_voice'] is not None:
+            # zero-shot voice conversion runs sentence by sentence
+            return None
+        if self.language == 'bel':
+            from phonemizer import phonemize
+            texts = [
+                phonemize(
+                    text,
+                    backend='espeak',
+                    language='be',
+                    with_stress=True
+                )
+                for text in texts
+            ]
+        return self._infer_batch_coqui(texts)
+
     def create_vtt(self, all_sentences:list)->bool:
         if self._build_vtt_file(all_sentences):
             return True
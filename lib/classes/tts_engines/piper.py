@@ -3,8 +3,65 @@ from lib.classes.tts_engines.common.preset_loader import load_engine_presets
 
 #sys.stderr = StdoutFilter(sys.stdout)
 
+def infer_piper_batch(voice:Any, syn_config:Any, texts:list[str])->list|None:
+    # every phonemized sentence becomes one row of a single padded onnx run. the onnx output is
+    # [B, 1, 1, T], each row is cut to the samples its phoneme durations account for, then gets
+    # the normalize/volume/clip PiperVoice.synthesize() applies per chunk and is joined back per text.
+    # models exported without the duration output cannot tell padding from speech, they return None.
+    import numpy as np
+    session = getattr(voice, 'session', None)
+    config = getattr(voice, 'config', None)
+    if session is None or config is None:
+        return None
+    rows = []
+    owners = []
+    for i, text in enumerate(texts):
+        for phonemes in voice.phonemize(text):
+            ids = voice.phonemes_to_ids(phonemes)
+            if ids:
+                rows.append(ids)
+                owners.append(i)
+    if not rows or set(owners) != set(range(len(texts))):
+        return None
+    lengths = np.array([len(ids) for ids in rows], dtype=np.int64)
+    inputs = np.zeros((len(rows), int(lengths.max())), dtype=np.int64)
+    for r, ids in enumerate(rows):
+        inputs[r, :len(ids)] = ids
+    noise_scale = syn_config.noise_scale if syn_config.noise_scale is not None else config.noise_scale
+    length_scale = syn_config.length_scale if syn_config.length_scale is not None else config.length_scale
+    noise_w_scale = syn_config.noise_w_scale if syn_config.noise_w_scale is not None else config.noise_w_scale
+    args = {
+        'input': inputs,
+        'input_lengths': lengths,
+        'scales': np.array([noise_scale, length_scale, noise_w_scale], dtype=np.float32)
+    }
+    if config.num_speakers > 1:
+        speaker_id = syn_config.speaker_id if syn_config.speaker_id is not None else 0
+        args['sid'] = np.full((len(rows),), speaker_id, dtype=np.int64)
+    outputs = session.run(None, args)
+    if len(outputs) < 2:
+        return None
+    audio = np.asarray(outputs[0], dtype=np.float32).reshape(len(rows), -1)
+    durations = np.asarray(outputs[1]).reshape(len(rows), -1)
+    hop_length = getattr(config, 'hop_length', 256)
+    per_text = [[] for _ in texts]
+    for r, owner in enumerate(owners):
+        samples = min(int(round(float(durations[r, :lengths[r]].sum()) * hop_length)), audio.shape[1])
+        if samples <= 0:
+            return None
+        row = audio[r, :samples]
+        if syn_config.normalize_audio:
+            peak = np.abs(row).max()
+            row = row / peak if peak > 1e-8 else np.zeros_like(row)
+        if syn_config.volume != 1.0:
+            row = row * syn_config.volume
+        per_text[owner].append(np.clip(row, -1.0, 1.0).astype(np.float32, copy=False))
+    return [np.concatenate(chunks) for chunks in per_text]
+
 class Piper(TTSUtils, TTSRegistry, name='piper'):
 
+    supports_batch = True
+
     def __init__(self, session: DictProxy):
         try:
             from piper import SynthesisConfig
@@ -188,7 +245,7 @@ class Piper(TTSUtils, TTSRegistry, name='piper'):
                                     tmp_out_wav = tmp_in_wav
                                 samplerate = TTS_VOICE_CONVERSION[self.tts_zs_key]['samplerate']
                                 source_wav = self._resample_wav(tmp_out_wav, samplerate)
-                                target_wav = self._resample_wav(self.params['current_voice'], samplerate)
+                                target_wav = self._get_resampled_voice(self.params['current_voice'], samplerate)
                                 speaker_argument = {}
                                 if (self.engine_zs.speakers is not None and self.speaker not in self.engine_zs.speakers) or self.engine_zs.speakers is None:
                                     speaker_argument['target_wav'] = target_wav
@@ -239,7 +296,7 @@ class Piper(TTSUtils, TTSRegistry, name='piper'):
                         error = f'audio_save() error: cannot save {sentence_file}'
                         return False, error
                     self.audio_segments = []
-                    if not os.path.exists(sentence_file):
+                    if not self.audio_file_ready(sentence_file):
                         error = f'Cannot create {sentence_file}'
                         return False, error
                 return True, None
@@ -251,6 +308,21 @@ class Piper(TTSUtils, TTSRegistry, name='piper'):
             self.audio_segments = []
             return False, self.log_exception(f'{self.__class__.__name__}.convert()',e)
 
+    def convert_batch(self, items:list)->list:
+        if not self.engine:
+            error = f"TTS engine {self.tts_engine} failed to load!"
+            return [(False, error)] * len(items)
+        return self._convert_batch(items, self._infer_batch)
+
+    def _infer_batch(self, texts:list[str])->list|None:
+        custom_model_name = os.path.basename(self.session['custom_model']) if self.session['custom_model'] is not None else None
+        self.speaker = Path(self.params['current_voice']).stem if self.params['current_voice'] is not None else None
+        if self.speaker is not None and self.speaker != custom_model_name:
+            if self.speaker not in default_engine_settings[self.tts_engine]['voices'] or custom_model_name is not None:
+                # zero-shot voice conversion runs sentence by sentence
+                return None
+        return infer_piper_batch(self.engine, self.syn_config, texts)
+
     def create_vtt(self, all_sentences:list)->bool:
         if self._build_vtt_file(all_sentences):
             return True
@@ -5,6 +5,8 @@ from lib.classes.tts_engines.common.preset_loader import load_engine_presets
 
 class Vits(TTSUtils, TTSRegistry, name='vits'):
 
+    supports_batch = True
+
     def __init__(self, session:DictProxy):
         try:
             self.session = session
@@ -201,7 +203,7 @@ class Vits(TTSUtils, TTSRegistry, name='vits'):
                                     tmp_out_wav = tmp_in_wav
                                 samplerate = TTS_VOICE_CONVERSION[self.tts_zs_key]['samplerate']
                                 source_wav = self._resample_wav(tmp_out_wav, samplerate)
-                                target_wav = self._resample_wav(self.params['current_voice'], samplerate)
+                                target_wav = self._get_resampled_voice(self.params['current_voice'], samplerate)
                                 speaker_argument = {}
                                 if (self.engine_zs.speakers is not None and self.speaker not in self.engine_zs.speakers) or self.engine_zs.speakers is None:
                                     speaker_argument['target_wav'] = target_wav
@@ -251,7 +253,7 @@ class Vits(TTSUtils, TTSRegistry, name='vits'):
                         error = f'audio_save() error: cannot save {sentence_file}'
                         return False, error
                     self.audio_segments = []
-                    if not os.path.exists(sentence_file):
+                    if not self.audio_file_ready(sentence_file):
                         error = f'Cannot create {sentence_file}'
                         return False, error
                 return True, None
@@ -263,6 +265,29 @@ class Vits(TTSUtils, TTSRegistry, name='vits'):
             self.audio_segments = []
             return False, self.log_exception(f'{self.__class__.__name__}.convert()',e)
 
+    def convert_batch(self, items:list)->list:
+        if not self.engine:
+            error = f"TTS engine {self.tts_engine} failed to load!"
+            return [(False, error)] * len(items)
+        return self._convert_batch(items, self._infer_batch, trim_audio_buffer=0.004)
+
+    def _infer_batch(self, texts:list[str])->list|None:
+        custom_model_name = os.path.basename(self.session['custom_model']) if self.session['custom_model'] is not None else None
+        self.speaker = Path(self.params['current_voice']).stem if self.params['current_voice'] is not None else None
+        if self.speaker is not None and self.speaker != custom_model_name:
+            if self.speaker not in default_engine_settings[self.tts_engine]['voices'] or custom_model_name is not None:
+                # zero-shot voice conversion runs sentence by sentence
+                return None
+        speaker = None
+        if not self.session.get('custom_model'):
+            if self.language == 'eng' and 'vctk/vits' in self.models['internal']['sub']:
+                if self.language in self.models['internal']['sub']['vctk/vits'] or self.language_iso1 in self.models['internal']['sub']['vctk/vits']:
+                    speaker = 'p262'
+            elif self.language == 'cat' and 'custom/vits' in self.models['internal']['sub']:
+                if self.language in self.models['internal']['sub']['custom/vits'] or self.language_iso1 in self.models['internal']['sub']['custom/vits']:
+                    speaker = '09901'
+        return self._infer_batch_coqui(texts, speaker)
+
     def create_vtt(self, all_sentences:list)->bool:
         if self._build_vtt_file(all_sentences):
             return True
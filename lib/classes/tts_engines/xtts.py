@@ -1,5 +1,6 @@
 from lib.classes.tts_engines.common.headers import *
 from lib.classes.tts_engines.common.preset_loader import load_engine_presets
+from lib.conf import xtts_latents_dir
 
 #sys.stderr = StdoutFilter(sys.stdout)
 
@@ -143,16 +144,7 @@ class XTTS(TTSUtils, TTSRegistry, name='xtts'):
                         if part.endswith("'"):
                             part = part[:-1]
                         part = part.replace('.', ' ;\n')
-                        if self.params['current_voice'] is not None and self.params['current_voice'] in self.params['latent_embedding'].keys():
-                            self.params['gpt_cond_latent'], self.params['speaker_embedding'] = self.params['latent_embedding'][self.params['current_voice']]
-                        else:
-                            msg = 'Computing speaker latents…'
-                            print(msg)
-                            if self.speaker in default_engine_settings[TTS_ENGINES['XTTS']]['voices'].keys():
-                                self.params['gpt_cond_latent'], self.params['speaker_embedding'] = self.xtts_speakers[default_engine_settings[TTS_ENGINES['XTTS']]['voices'][self.speaker]].values()
-                            else:
-                                self.params['gpt_cond_latent'], self.params['speaker_embedding'] = self.engine.get_conditioning_latents(audio_path=[self.params['current_voice']], load_sr=24000, sound_norm_refs=True)
-                            self.params['latent_embedding'][self.params['current_voice']] = self.params['gpt_cond_latent'], self.params['speaker_embedding']
+                        self.params['gpt_cond_latent'], self.params['speaker_embedding'] = self._get_latents(self.params['current_voice'])
                         result = False
                         try:
                             with torch.inference_mode():
@@ -199,7 +191,7 @@ class XTTS(TTSUtils, TTSRegistry, name='xtts'):
                         error = f'audio_save() error: cannot save {sentence_file}'
                         return False, error
                     self.audio_segments = []
-                    if not os.path.exists(sentence_file):
+                    if not self.audio_file_ready(sentence_file):
                         error = f'Cannot create {sentence_file}'
                         return False, error
                 return True, None
@@ -211,6 +203,108 @@ class XTTS(TTSUtils, TTSRegistry, name='xtts'):
             self.audio_segments = []
             return False, self.log_exception(f'{self.__class__.__name__}.convert()',e)
 
+    def convert_stream(self, sentence:str, **kwargs)->Generator[Any, None, None]:
+        # yields float32 chunks at params['samplerate'] while the gpt decoder is still running,
+        # playback can start after the first stream_chunk_size tokens instead of the whole sentence.
+        import torch
+        import numpy as np
+        if not self.engine:
+            error = f"TTS engine {self.session['tts_engine']} failed to load!"
+            raise RuntimeError(error)
+        stream_chunk_size = kwargs.get('stream_chunk_size', 20)
+        self.params['block_voice'] = kwargs.get('block_voice', self.session['voice'])
+        if self.params.get('inline_voice'):
+            self.params['current_voice'] = self.params['inline_voice']
+        else:
+            self.params['current_voice'], error = self._set_voice(self.params['block_voice'])
+            if self.params['current_voice'] is None and error is not None:
+                raise RuntimeError(error)
+        # beam search needs the whole sequence, streaming always samples
+        stream_params = {k: v for k, v in self.fine_tuned_params.items() if k != 'num_beams'}
+        for part in self._split_sentence_on_sml(sentence):
+            part = part.strip()
+            if not part:
+                continue
+            if SML_TAG_PATTERN.fullmatch(part):
+                self.audio_segments = []
+                success, error = self._convert_sml(part)
+                if not success:
+                    raise RuntimeError(error)
+                for segment in self.audio_segments:
+                    yield segment.squeeze(0).numpy()
+                self.audio_segments = []
+                continue
+            if not any(c.isalnum() for c in part):
+                continue
+            if part.endswith("'"):
+                part = part[:-1]
+            gpt_cond_latent, speaker_embedding = self._get_latents(self.params['current_voice'])
+            with torch.inference_mode():
+                for chunk in self.engine.inference_stream(
+                    part.replace('.', ' ;\n'),
+                    self.language_iso1,
+                    gpt_cond_latent,
+                    speaker_embedding,
+                    stream_chunk_size=stream_chunk_size,
+                    **stream_params
+                ):
+                    yield chunk.detach().cpu().float().numpy()
+            if not re.search(r'\w$', part, flags=re.UNICODE) and part[-1] != '—':
+                silence_time = int(np.random.uniform(0.3, 0.6) * 100) / 100
+                yield np.zeros(int(self.params['samplerate'] * silence_time), dtype=np.float32)
+
+    def _prepare_voice_conditioning(self, current_voice:str)->None:
+        self._get_latents(current_voice)
+
+    def _get_latents(self, current_voice:str|None)->tuple:
+        import torch
+        if current_voice is not None and current_voice in self.params['latent_embedding'].keys():
+            return self.params['latent_embedding'][current_voice]
+        if self.speaker in default_engine_settings[TTS_ENGINES['XTTS']]['voices'].keys():
+            latents = tuple(self.xtts_speakers[default_engine_settings[TTS_ENGINES['XTTS']]['voices'][self.speaker]].values())
+        else:
+            latents_file = self._latents_file(current_voice)
+            latents = None
+            if latents_file is not None and os.path.exists(latents_file):
+                try:
+                    data = torch.load(latents_file, map_location=self.device, weights_only=True)
+                    latents = data['gpt_cond_latent'], data['speaker_embedding']
+                except Exception as e:
+                    error = f'_get_latents(): cannot read {latents_file}: {e}'
+                    print(error)
+            if latents is None:
+                msg = 'Computing speaker latents…'
+                print(msg)
+                latents = self.engine.get_conditioning_latents(audio_path=[current_voice], load_sr=24000, sound_norm_refs=True)
+                if latents_file is not None:
+                    try:
+                        os.makedirs(os.path.dirname(latents_file), exist_ok=True)
+                        tmp_file = f'{latents_file}.part'
+                        torch.save({'gpt_cond_latent': latents[0].detach().cpu(), 'speaker_embedding': latents[1].detach().cpu()}, tmp_file)
+                        os.replace(tmp_file, latents_file)
+                    except Exception as e:
+                        error = f'_get_latents(): cannot write {latents_file}: {e}'
+                        print(error)
+        self.params['latent_embedding'][current_voice] = latents
+        return latents
+
+    def _latents_file(self, current_voice:str|None)->str|None:
+        # keyed on the voice file content and the checkpoint, a changed file or model never reuses stale latents
+        if current_voice is None or not os.path.isfile(current_voice):
+            return None
+        h = hashlib.sha256()
+        with open(current_voice, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        checkpoint = f"{self.tts_key}-{self.session['fine_tuned']}"
+        if self.session['custom_model'] is not None:
+            checkpoint_path = os.path.join(self.session['custom_model'], default_engine_settings[TTS_ENGINES['XTTS']]['files'][1])
+            if os.path.exists(checkpoint_path):
+                stat = os.stat(checkpoint_path)
+                checkpoint = f'{checkpoint}-{stat.st_size}-{stat.st_mtime_ns}'
+        h.update(checkpoint.encode('utf-8'))
+        return os.path.join(xtts_latents_dir, f'{h.hexdigest()}.pth')
+
     def create_vtt(self, all_sentences:list)->bool:
         if self._build_vtt_file(all_sentences):
             return True
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Generator
 from lib.classes.tts_registry import TTSRegistry
 
 class TTSManager:
@@ -17,8 +17,29 @@ class TTSManager:
             )
         self.engine = engine_cls(session)
     
+    def set_audio_writer(self, audio_writer:Any)->None:
+        self.engine.audio_writer = audio_writer
+
     def set_voice(self, block_voice:str|None)->tuple:
         return self.engine._set_voice(block_voice)
 
+    def preload_voices(self, block_voices:list, inline_voices:list)->tuple:
+        return self.engine.preload_voices(block_voices, inline_voices)
+
     def convert_sentence2audio(self, sentence_file:str, sentence:str, **kwargs)->tuple:
-        return self.engine.convert(sentence_file, sentence, **kwargs)
\ No newline at end of file
+        return self.engine.convert(sentence_file, sentence, **kwargs)
+
+    @property
+    def supports_batch(self)->bool:
+        return self.engine.supports_batch
+
+    def convert_sentences2audio(self, items:list)->list:
+        return self.engine.convert_batch(items)
+
+    def stream_sentence2audio(self, sentence:str, **kwargs)->Generator[Any, None, None]:
+        # float32 mono chunks at self.samplerate, played as they come by the headless --stream pipe
+        yield from self.engine.convert_stream(sentence, **kwargs)
+
+    @property
+    def samplerate(self)->int:
+        return self.engine.params['samplerate']
\ No newline at end of file
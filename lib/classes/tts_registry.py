@@ -1,6 +1,8 @@
 class TTSRegistry:
 
     ENGINES = {}
+    # engines with a padded batched forward pass set this, the others are fed one sentence at a time
+    supports_batch = False
 
     def __init_subclass__(cls, *, name, **kwargs):
         super().__init_subclass__(**kwargs)
@@ -14,4 +16,14 @@ class TTSRegistry:
         self.session = session
 
     def convert(self, sentence_number, sentence):
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def convert_batch(self, items:list)->list:
+        # items: [(sentence_file, sentence, block_voice), ...]
+        # returns one (success, error) tuple per item, in the same order.
+        # engines without a batched forward pass fall back to one convert() per item.
+        return [self.convert(sentence_file, sentence, block_voice=block_voice) for sentence_file, sentence, block_voice in items]
+
+    def preload_voices(self, block_voices:list, inline_voices:list)->tuple:
+        # engines with expensive per-voice state (speaker latents) prepare it here before the first sentence
+        return True, None
@@ -30,7 +30,7 @@ cli_options = [
     '--waveform_temp', '--output_dir', '--version', 
     '--docker_device', '--workflow', '--help',
     '--abs_enabled', '--abs_server_url', '--abs_api_token', '--abs_library_id',
-    '--abs_auto_upload'
+    '--abs_auto_upload', '--stream'
 ]
 
 workflow_id = 'ba800d22-ee51-11ef-ac34-d4ae52cfd9ce'
@@ -130,6 +130,9 @@ ebooks_dir = os.path.abspath('ebooks')
 voices_dir = os.path.abspath('voices')
 voices_url = 'https://huggingface.co/datasets/ebook2audiobook/E2A-Voices/resolve/main/voices.zip?download=true'
 tts_dir = os.path.join(models_dir, 'tts')
+cache_dir = os.path.abspath('cache')
+sentence_cache_dir = os.path.join(cache_dir, 'sentences')
+xtts_latents_dir = os.path.join(cache_dir, 'xtts_latents')
 components_dir = os.path.abspath('components')
 tempfile.tempdir = run_dir
 
@@ -189,6 +192,14 @@ if DEVICE_SYSTEM == systems['WINDOWS']:
 max_upload_size = '6GB' # MB or GB
 tmp_expire = 60 # days
 max_ebook_textarea_length = 1024 # chars
+default_tts_batch_size = 8 # sentences per engine call, 1 to disable batching
+default_tts_cpu_workers = 0 # forked synthesis workers on cpu-only linux nodes sharing the loaded model, 0 = one per 4 cores, 1 to disable
+default_sentence_cache_size = 0 # GB of sentence audio shared across sessions, 0 to disable
+default_session_backend = 'local' # 'local': in-process session objects, 'manager': multiprocessing.Manager proxies
+default_chapter_stream = False # append each sentence to its chapter as it is synthesized, sentence files are kept only for the block editor
+default_export_workers = 0 # split parts encoded concurrently, 0 = bounded by cores and free disk, 1 to export serially
+default_chapter_loudnorm = False # measure EBU R128 loudness per chapter, write denoised copies with one book gain to chapters/normalized, the final export skips its filter pass
+default_chapter_loudness_target = -18 # LUFS the whole book is brought to when default_chapter_loudnorm is on
 
 # ---------------------------------------------------------------------
 # Interface configuration
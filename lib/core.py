@@ -11,12 +11,13 @@ import traceback, socket, unicodedata, urllib.request, uuid, zipfile, fitz, mult
 import ebooklib, psutil, requests, stanza, importlib, queue, pykakasi
 import regex as re, gradio as gr
 
-from typing import Any, Generator, Dict
+from typing import Any, Callable, Generator, Dict
 from PIL import Image, ImageSequence
 from tqdm import tqdm
 from bs4 import BeautifulSoup, NavigableString, Tag
 from collections import Counter
 from collections.abc import Mapping, MutableMapping
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from ebooklib import epub
 from ebooklib.epub import EpubBook
@@ -31,7 +32,6 @@ from stanza.pipeline.core import Pipeline, DownloadMethod
 from num2words2 import num2words
 from pathlib import Path
 from PIL import Image
-from pydub import AudioSegment
 from pydub.utils import mediainfo
 from queue import Queue, Empty
 from types import MappingProxyType
@@ -47,8 +47,16 @@ from lib.classes.non_text_filter import NonTextFilter
 #from lib.classes.redirect_console import RedirectConsole
 from lib.classes.argos_translator import ArgosTranslator
 from lib.classes.tts_manager import TTSManager
+from lib.classes.audio_writer import AudioWriter, link_audio_file, audio_file_info, concat_audio_files, audio_codecs
+from lib.classes.sentence_cache import SentenceCache, path_stamp
+from lib.classes.sentence_scheduler import SentenceScheduler
+from lib.classes.perf_recorder import PerfRecorder, perf_stage
+from lib.classes.block_store import BlockStore
+from lib.classes.chapter_stream import ChapterStream
+from lib.classes.chapter_finalizer import ChapterFinalizer
+from lib.classes.session_state import SessionState
 from lib.classes.tts_engines.common.audio import get_audiolist_duration, get_audio_duration
-from lib.classes.tts_engines.common.utils import build_vtt_file
+from lib.classes.tts_engines.common.utils import build_vtt_file, chapter_cues_file, write_chapter_cues
 
 from lib import *
 
@@ -128,13 +136,38 @@ class SessionTracker:
         active_sessions.discard(socket_hash)
         with self.lock:
             context.sessions.pop(session_id, None)
+            context.cancellation_events.pop(session_id, None)
 
 class SessionContext:
-    def __init__(self):
-        self.manager:Manager = Manager()
-        self.sessions:DictProxy[str, DictProxy[str, Any]] = self.manager.dict()
+    def __init__(self, backend:str=default_session_backend):
+        # 'local' keeps sessions as in-process SessionState objects, a read is an attribute lookup.
+        # 'manager' keeps the multiprocessing.Manager proxies, every read is a round-trip to the manager process.
+        self.backend = backend
+        if self.backend == 'manager':
+            self.manager:SyncManager|None = Manager()
+            self.sessions:DictProxy[str, DictProxy[str, Any]] = self.manager.dict()
+        else:
+            self.manager = None
+            self.sessions = {}
         self.cancellation_events = {}
 
+    def cancel_event(self, session_id:str)->threading.Event:
+        # local cancellation token of a session, loops and subprocesses check it without touching the session
+        event = self.cancellation_events.get(session_id)
+        if event is None:
+            event = self.cancellation_events.setdefault(session_id, threading.Event())
+        return event
+
+    def set_cancellation(self, session_id:str, requested:bool)->None:
+        session = self.get_session(session_id)
+        if session:
+            session['cancellation_requested'] = requested
+        event = self.cancel_event(session_id)
+        if requested:
+            event.set()
+        else:
+            event.clear()
+
     def _recursive_proxy(self, data:Any, manager:SyncManager|None)->Any:
         if manager is None:
             manager = self.manager
@@ -156,7 +189,7 @@ class SessionContext:
             return None
 
     def set_session(self, session_id:str)->Any:
-        self.sessions[session_id] = self._recursive_proxy({
+        data = {
             ####### Global settings
             "id": session_id,
             "script_mode": NATIVE,
@@ -191,6 +224,7 @@ class SessionContext:
             "custom_model_dir": None,
             "output_dir": None,
             "output_format": default_output_format,
+            "output_extra_formats": [],
             "output_channel": default_output_channel,
             "output_split": default_output_split,
             "output_split_hours": default_output_split_hours,
@@ -260,7 +294,11 @@ class SessionContext:
                 "Source": None,
                 "Modified": None,
             }
-        }, manager=self.manager)
+        }
+        if self.manager is None:
+            self.sessions[session_id] = SessionState.from_dict(data)
+        else:
+            self.sessions[session_id] = self._recursive_proxy(data, manager=self.manager)
         return self.sessions[session_id]
 
     def get_session(self, session_id:str)->Any:
@@ -276,7 +314,9 @@ class SessionContext:
         
 class JSONDictProxyEncoder(json.JSONEncoder):
     def default(self, o:Any)->Any:
-        if isinstance(o, DictProxy):
+        if isinstance(o, SessionState):
+            return o.snapshot()
+        elif isinstance(o, DictProxy):
             return dict(o)
         elif isinstance(o, ListProxy):
             return list(o)
@@ -607,87 +647,18 @@ def ocr2xhtml(img: Image.Image, lang:str)->tuple[str|bool, str|None]:
         error = f'ocr2xhtml error: {e}'
         return False, error
 
-def create_db_blocks(db_path:str)->None:
-    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
-    with sqlite3.connect(db_path) as conn:
-        conn.execute('PRAGMA journal_mode=WAL')
-        conn.execute('PRAGMA synchronous=NORMAL')
-        conn.execute('PRAGMA foreign_keys=ON')
-        conn.executescript('''
-            CREATE TABLE IF NOT EXISTS stamp (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                page INTEGER,
-                block_resume INTEGER,
-                sentence_resume INTEGER,
-                voice TEXT,
-                tts_engine TEXT,
-                fine_tuned TEXT
-            );
-            CREATE TABLE IF NOT EXISTS blocks (
-                id TEXT PRIMARY KEY,
-                idx INTEGER NOT NULL,
-                expand INTEGER NOT NULL,
-                keep INTEGER NOT NULL,
-                text TEXT NOT NULL,
-                voice TEXT,
-                tts_engine TEXT,
-                fine_tuned TEXT
-            );
-            CREATE TABLE IF NOT EXISTS sentences (
-                block_id TEXT NOT NULL,
-                idx INTEGER NOT NULL,
-                text TEXT NOT NULL,
-                PRIMARY KEY (block_id, idx),
-                FOREIGN KEY (block_id) REFERENCES blocks(id) ON DELETE CASCADE
-            );
-            CREATE INDEX IF NOT EXISTS idx_blocks_idx ON blocks(idx);
-            INSERT OR IGNORE INTO stamp (id, page, block_resume, sentence_resume, voice, tts_engine, fine_tuned)
-            VALUES (1, 0, 0, 0, NULL, NULL, NULL);
-        ''')
-
 def load_db_blocks(db_path:str)->dict:
     try:
         if not os.path.exists(db_path):
             return {}
-        with sqlite3.connect(db_path) as conn:
-            conn.execute('PRAGMA foreign_keys=ON')
-            stamp_row = conn.execute(
-                'SELECT page, block_resume, sentence_resume, voice, tts_engine, fine_tuned FROM stamp WHERE id=1'
-            ).fetchone()
-            if stamp_row is None:
-                return {}
-            page, block_resume, sentence_resume, voice, tts_engine, fine_tuned = stamp_row
-            sentences_by_block = {}
-            for block_id, text in conn.execute('SELECT block_id, text FROM sentences ORDER BY block_id, idx'):
-                sentences_by_block.setdefault(block_id, []).append(text)
-            blocks = []
-            for row in conn.execute('SELECT id, expand, keep, text, voice, tts_engine, fine_tuned FROM blocks ORDER BY idx'):
-                bid, expand, keep, text, b_voice, b_tts_engine, b_fine_tuned = row
-                blocks.append({
-                    'id': bid,
-                    'expand': bool(expand),
-                    'keep': bool(keep),
-                    'text': text,
-                    'voice': b_voice,
-                    'tts_engine': b_tts_engine,
-                    'fine_tuned': b_fine_tuned,
-                    'sentences': sentences_by_block.get(bid, []),
-                })
-            return {
-                'page': page,
-                'block_resume': block_resume,
-                'sentence_resume': sentence_resume,
-                'voice': voice,
-                'tts_engine': tts_engine,
-                'fine_tuned': fine_tuned,
-                'blocks': blocks,
-            }
+        return BlockStore.get(db_path).load()
     except Exception as e:
         error = f'load_db_blocks() error: {e}'
         print(error)
         return {}
 
-def save_db_stamp(session_id:str)->None:
+def save_db_stamp(session_id:str, flush:bool=False)->None:
+    # stamps are coalesced by the block store, flush=True writes through (chapter boundaries, end of run)
     try:
         session = context.get_session(session_id)
         if not (session and session.get('id', False)):
@@ -695,21 +666,7 @@ def save_db_stamp(session_id:str)->None:
         data = session['blocks_current']
         if not data:
             return
-        db_path = session['blocks_current_db']
-        create_db_blocks(db_path)
-        with sqlite3.connect(db_path) as conn:
-            conn.execute(
-                'UPDATE stamp SET page=?, block_resume=?, sentence_resume=?, voice=?, tts_engine=?, fine_tuned=? WHERE id=1',
-                (
-                    data.get('page'),
-                    data.get('block_resume'),
-                    data.get('sentence_resume'),
-                    data.get('voice'),
-                    data.get('tts_engine'),
-                    data.get('fine_tuned'),
-                )
-            )
-            conn.commit()
+        BlockStore.get(session['blocks_current_db']).save_stamp(data, flush=flush)
     except Exception as e:
         error = f'save_db_stamp() error: {e}'
         print(error)
@@ -722,54 +679,7 @@ def save_db_blocks(session_id:str)->None:
         data = session['blocks_current']
         if not data:
             return
-        db_path = session['blocks_current_db']
-        create_db_blocks(db_path)
-        with sqlite3.connect(db_path) as conn:
-            conn.execute('PRAGMA foreign_keys=ON')
-            conn.execute(
-                'UPDATE stamp SET page=?, block_resume=?, sentence_resume=?, voice=?, tts_engine=?, fine_tuned=? WHERE id=1',
-                (
-                    data.get('page'),
-                    data.get('block_resume'),
-                    data.get('sentence_resume'),
-                    data.get('voice'),
-                    data.get('tts_engine'),
-                    data.get('fine_tuned'),
-                )
-            )
-            new_blocks = data.get('blocks', [])
-            new_ids = {b['id'] for b in new_blocks}
-            existing_ids = {row[0] for row in conn.execute('SELECT id FROM blocks')}
-            removed = existing_ids - new_ids
-            if removed:
-                conn.executemany('DELETE FROM blocks WHERE id=?', [(rid,) for rid in removed])
-            for idx, block in enumerate(new_blocks):
-                block_id = block['id']
-                conn.execute(
-                    'INSERT INTO blocks (id, idx, expand, keep, text, voice, tts_engine, fine_tuned) '
-                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
-                    'ON CONFLICT(id) DO UPDATE SET '
-                    'idx=excluded.idx, expand=excluded.expand, keep=excluded.keep, text=excluded.text, '
-                    'voice=excluded.voice, tts_engine=excluded.tts_engine, fine_tuned=excluded.fine_tuned',
-                    (
-                        block_id,
-                        idx,
-                        1 if block.get('expand') else 0,
-                        1 if block.get('keep') else 0,
-                        block.get('text', ''),
-                        block.get('voice'),
-                        block.get('tts_engine'),
-                        block.get('fine_tuned'),
-                    )
-                )
-                conn.execute('DELETE FROM sentences WHERE block_id=?', (block_id,))
-                sentences = block.get('sentences', [])
-                if sentences:
-                    conn.executemany(
-                        'INSERT INTO sentences (block_id, idx, text) VALUES (?, ?, ?)',
-                        [(block_id, i, s) for i, s in enumerate(sentences)]
-                    )
-            conn.commit()
+        BlockStore.get(session['blocks_current_db']).save_blocks(data)
     except Exception as e:
         error = f'save_db_blocks() error: {e}'
         print(error)
@@ -881,10 +791,11 @@ def normalize_epub_zip(session_id:str, file_input:str)->str|None:
         exception_alert(session_id, error)
     return None
 
+@perf_stage('convert2epub')
 def convert2epub(session_id:str)->bool:
     session = context.get_session(session_id)
     if session and session.get('id', False):
-        if session['cancellation_requested']:
+        if context.cancel_event(session_id).is_set():
             return False
         try:
             title = False
@@ -1182,7 +1093,7 @@ def get_cover(epubBook:EpubBook, session_id:str)->bool|str:
     try:
         session = context.get_session(session_id)
         if session and session.get('id', False):
-            if session['cancellation_requested']:
+            if context.cancel_event(session_id).is_set():
                 return False
             cover_image = None
             cover_path = os.path.join(session['process_dir'], session['filename_noext'] + '.jpg')
@@ -1207,6 +1118,7 @@ def get_cover(epubBook:EpubBook, session_id:str)->bool|str:
         DependencyError(e)
         return False
 
+@perf_stage('get_blocks')
 def get_blocks(session_id:str, epubBook:EpubBook)->list:
     try:
         msg = r'''
@@ -1223,7 +1135,7 @@ INTO A NEW TRAINING MODEL. YOU CAN IMPROVE IT OR ASK TO A TRAINING MODEL EXPERT.
         print(msg)
         session = context.get_session(session_id)
         if session and session.get('id', False):
-            if session['cancellation_requested']:
+            if context.cancel_event(session_id).is_set():
                 return []
             # Step 1: Extract TOC (Table of Contents)
             try:
@@ -1325,6 +1237,7 @@ INTO A NEW TRAINING MODEL. YOU CAN IMPROVE IT OR ASK TO A TRAINING MODEL EXPERT.
         DependencyError(error)
         return []
 
+@perf_stage('filter_blocks')
 def filter_blocks(session_id:str, idx:int, doc:EpubHtml, stanza_nlp:Pipeline, is_num2words_compat:bool, non_text_filter:NonTextFilter, zf:zipfile.ZipFile=None, zip_names:set=None, zip_basenames:dict=None)->str|None:
 
     def _tuple_row(node:Any, last_text_char:str|None=None, in_heading:bool=False)->Generator[tuple[str, Any], None, None]|None:
@@ -1636,6 +1549,7 @@ def filter_blocks(session_id:str, idx:int, doc:EpubHtml, stanza_nlp:Pipeline, is
         DependencyError(error)
         return None
 
+@perf_stage('get_sentences')
 def get_sentences(session_id:str, text:str)->list|None:
 
     def _split_inclusive(text:str, pattern:re.Pattern[str])->list[str]:
@@ -2523,10 +2437,12 @@ def text_hash(text:str)->str:
 
 def purge_block_audio(session:dict, block_id:str)->None:
     try:
-        ch_file = os.path.join(session['chapters_dir'], f'{block_id}.{default_audio_proc_format}')
-        if os.path.exists(ch_file):
-            os.unlink(ch_file)
+        for ch_file in (os.path.join(session['chapters_dir'], f'{block_id}.{default_audio_proc_format}'), chapter_cues_file(session, block_id)):
+            if os.path.exists(ch_file):
+                os.unlink(ch_file)
+        ChapterStream(session['chapters_dir'], block_id).reset()
         block_dir = os.path.join(session['sentences_dir'], block_id)
+        BlockStore.get(session['blocks_current_db']).drop_sentence_audio(block_id)
         if os.path.isdir(block_dir):
             shutil.rmtree(block_dir)
     except Exception as e:
@@ -2658,40 +2574,234 @@ def realign_blocks(session_id:str, blocks_orig_old:dict)->bool:
         exception_alert(session_id, f'realign_blocks() error: {e}')
         return False
 
-def convert_chapters2audio(session_id:str)->bool:
+pool_tts_manager = None
+
+def fork_sentence_pool(tts_manager:TTSManager, workers:int)->Any:
+    # forked right after the engine is loaded: fork passes initargs without pickling, so every worker
+    # gets the parent's manager and weights copy-on-write instead of loading a model of its own
+    return multiprocessing.get_context('fork').Pool(workers, initializer=init_sentence_worker, initargs=(tts_manager,))
+
+def init_sentence_worker(tts_manager:TTSManager)->None:
+    global pool_tts_manager
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(1)
+    pool_tts_manager = tts_manager
+    # sentence files are written in place, the parent stamps them once they exist.
+    # a worker the pool replaces later is forked with the parent's writer set, its thread does not exist here.
+    pool_tts_manager.set_audio_writer(None)
+
+def convert_sentence_worker(item:tuple)->tuple:
+    sentence_file, sentence, block_voice = item
+    try:
+        return pool_tts_manager.convert_sentence2audio(sentence_file, sentence, block_voice=block_voice)
+    except Exception as e:
+        error = f'convert_sentence_worker() error: {e}'
+        return False, error
+
+def plan_duplicate_sentences(session_id:str)->dict:
+    # maps (block_id, j) of every repeated (text, voice) pair to its first occurrence in book order.
+    # blocks with voice tags are left out, the voice of their sentences depends on the tags before them.
+    session = context.get_session(session_id)
+    first_seen = {}
+    duplicates = {}
+    for block in BlockStore.get(session['blocks_current_db']).iter_blocks():
+        if not (block['keep'] and block['text'].strip()):
+            continue
+        sentences = block['sentences']
+        if any(m.group('tag') == 'voice' for s in sentences for m in SML_TAG_PATTERN.finditer(s)):
+            continue
+        voice = block.get('voice') or session.get('voice')
+        for j, sentence in enumerate(sentences):
+            text = sentence.strip()
+            if not any(c.isalnum() for c in text) or SML_TAG_PATTERN.search(text):
+                continue
+            key = (re.sub(r'\s+', ' ', text), voice)
+            if key in first_seen:
+                duplicates[(block['id'], j)] = first_seen[key]
+            else:
+                first_seen[key] = (block['id'], j)
+    return duplicates
+
+@perf_stage('tts')
+def convert_chapters2audio(session_id:str, duplicates:dict|None=None)->bool:
 
     def _reset_chapter_file(block_id:str)->None:
-        ch_file = os.path.join(session['chapters_dir'], f'{block_id}.{default_audio_proc_format}')
-        if os.path.exists(ch_file):
-            os.unlink(ch_file)
+        for ch_file in (os.path.join(session['chapters_dir'], f'{block_id}.{default_audio_proc_format}'), chapter_cues_file(session, block_id)):
+            if os.path.exists(ch_file):
+                os.unlink(ch_file)
+        ChapterStream(session['chapters_dir'], block_id).reset()
         block_dir = os.path.join(session['sentences_dir'], block_id)
+        block_store.drop_sentence_audio(block_id)
         if os.path.isdir(block_dir):
             shutil.rmtree(block_dir)
 
     def _check_block_sentences(block_id:str, sentences:list)->set:
+        # the sentence manifest answers for the files, no stat per sentence
         block_dir = os.path.join(session['sentences_dir'], block_id)
+        written = block_store.sentence_audio(block_id, block_dir, default_audio_proc_format)
         missing = set()
         for j in valid_idx:
             is_sml = bool(SML_TAG_PATTERN.fullmatch(sentences[j]))
             if (not is_sml) or (j == last_idx):
-                sentence_file = os.path.join(block_dir, f'{j}.{default_audio_proc_format}')
-                if not os.path.exists(sentence_file):
+                if j not in written:
                     missing.add(j)
         return missing
 
+    def _can_reassemble(block_id:str, sentences:list, stream:ChapterStream)->bool:
+        # a chapter still queued on the finalizer when the run stopped is rebuilt from its stream or its sentence files
+        if _check_block_sentences(block_id, sentences):
+            return False
+        written = block_store.sentence_audio(block_id)
+        if stream.frames:
+            return stream.resume(len(sentences)) == set(written)
+        block_dir = os.path.join(session['sentences_dir'], block_id)
+        return all(os.path.exists(os.path.join(block_dir, f'{j}.{default_audio_proc_format}')) for j in written)
+
+    def _finalize_chapter(block:dict, block_dir:str, chapter_audio_file:str, stream:ChapterStream|None)->tuple:
+        # runs on the chapter finalizer thread while the engine synthesizes the next block
+        block_id = block['id']
+        if stream is not None and stream.frames:
+            stream.finalize(chapter_audio_file)
+            if not (session['blocks_preview'] or block_id in duplicate_sources):
+                # the chapter file and the manifest carry everything else, sentence files are only for the block editor
+                shutil.rmtree(block_dir, ignore_errors=True)
+        elif not combine_audio_sentences(session_id, chapter_audio_file, block_id, len(block['sentences'])):
+            return False, f'combine_audio_sentences() failed for block {block_id}!'
+        # subtitles of a finished chapter are available right away, the final vtt only concatenates them
+        _, error = write_chapter_cues(session, block, block_store.sentence_audio(block_id))
+        if error is not None:
+            return False, error
+        msg = f'Chapter file of block {block_id} ready'
+        print(msg)
+        return True, None
+
     def _count_sentences(sentences:list)->int:
         return sum(1 for s in sentences if any(c.isalnum() for c in s.strip()))
 
+    def _synthesize_sentences(block_id:str, block_dir:str, block_voice:str|None, sentences:list, pending:list)->Generator[tuple, None, None]:
+        # yields (j, run, error) in sentence order, sentences found in the cache are linked instead of synthesized.
+        # voice tags change the voice of the following sentences, such blocks bypass the cache.
+        # repeats of an earlier sentence are linked from it once that file is durable, see _stamp_durable_sentences().
+        linked = set()
+        if duplicates:
+            pending_set = set(pending)
+            for j in pending:
+                src = duplicates.get((block_id, j))
+                if src is None:
+                    continue
+                src_file = os.path.join(sentences_dir, src[0], f'{src[1]}.{default_audio_proc_format}')
+                # a source gone from disk (edited block, removed block dir) is synthesized again instead
+                if (src[0] == block_id and src[1] in pending_set) or os.path.exists(src_file):
+                    fanout[os.path.join(block_dir, f'{j}.{default_audio_proc_format}')] = src_file
+                    linked.add(j)
+            if linked:
+                perf.count('dedup_linked', len(linked))
+        cached = set()
+        has_voice_tag = any(m.group('tag') == 'voice' for j in pending for m in SML_TAG_PATTERN.finditer(sentences[j]))
+        if sentence_cache is not None and not has_voice_tag:
+            for j in pending:
+                if j in linked or SML_TAG_PATTERN.search(sentences[j]):
+                    continue
+                sentence_file = os.path.join(block_dir, f'{j}.{default_audio_proc_format}')
+                key = sentence_cache.make_key(sentences[j], block_voice, cache_params)
+                if sentence_cache.fetch(key, sentence_file):
+                    cached.add(j)
+                else:
+                    cache_keys[sentence_file] = key
+            if cached:
+                msg = f'{len(cached)} sentences found in the sentence cache'
+                print(msg)
+        cached |= linked
+        reused.update(cached)
+        synth = _synthesize_pending(block_dir, block_voice, sentences, [j for j in pending if j not in cached])
+        for j in pending:
+            if j in cached:
+                yield j, True, None
+                continue
+            result = next(synth, None)
+            if result is None:
+                return
+            yield result
+
+    def _synthesize_pending(block_dir:str, block_voice:str|None, sentences:list, pending:list)->Generator[tuple, None, None]:
+        # pending sentences go through the scheduler, which batches them by length bucket.
+        # voice tags carry state from one sentence to the next, such blocks stay sentence by sentence.
+        has_voice_tag = any(m.group('tag') == 'voice' for j in pending for m in SML_TAG_PATTERN.finditer(sentences[j]))
+        if sentence_pool is not None and not has_voice_tag:
+            items = [(os.path.join(block_dir, f'{j}.{default_audio_proc_format}'), sentences[j].strip(), block_voice) for j in pending]
+            for j, (run, error) in zip(pending, sentence_pool.imap(convert_sentence_worker, items)):
+                yield j, run, error
+                if cancel_event.is_set():
+                    return
+            return
+        if scheduler.batch_size <= 1 or has_voice_tag:
+            for j in pending:
+                sentence_file = os.path.join(block_dir, f'{j}.{default_audio_proc_format}')
+                run, error = tts_manager.convert_sentence2audio(sentence_file, sentences[j].strip(), block_voice=block_voice)
+                yield j, run, error
+            return
+        items = [(j, os.path.join(block_dir, f'{j}.{default_audio_proc_format}'), sentences[j].strip(), block_voice) for j in pending]
+        yield from scheduler.run(items, cancelled=cancel_event.is_set)
+
+    def _stamp_durable_sentences()->None:
+        # sentence_resume only moves past sentences whose files the writer has already renamed in place
+        while unsaved and not audio_writer.is_pending(os.path.join(block_dir, f'{unsaved[0]}.{default_audio_proc_format}')):
+            sentence_file = os.path.join(block_dir, f'{unsaved[0]}.{default_audio_proc_format}')
+            src = fanout.pop(sentence_file, None)
+            if src is not None:
+                # the first occurrence comes earlier in book order, so it is already durable here
+                link_audio_file(src, sentence_file)
+            key = cache_keys.pop(sentence_file, None)
+            if key is not None:
+                sentence_cache.store(key, sentence_file)
+            # linked, cached and forked-worker files were not written by this writer, their entry is read back
+            info = audio_writer.pop_written(sentence_file)
+            if info is None and os.path.exists(sentence_file):
+                info = audio_file_info(sentence_file)
+            if info is not None:
+                block_store.record_sentence_audio(block_id, unsaved[0], *info)
+                if chapter_stream is not None:
+                    chapter_stream.append_file(unsaved[0], sentence_file)
+            blocks_current['sentence_resume'] = unsaved.pop(0)
+
     session = context.get_session(session_id)
+    cancel_event = context.cancel_event(session_id)
     if not (session and session.get('id', False)):
         return False
+    audio_writer = None
+    sentence_pool = None
+    sentence_cache = None
+    cache_keys = {}
+    fanout = {}
+    block_store = None
+    chapter_stream = None
+    chapter_finalizer = None
+    scheduler = None
+    synth = None
+    # blocks whose sentence files later repeats are linked from, their block dir is kept in stream mode
+    duplicate_sources = {src[0] for src in (duplicates or {}).values()}
     try:
-        if session['cancellation_requested']:
+        if cancel_event.is_set():
             return False
         print(f'*********** Session: {session_id} **************\n{session_info}')
         tts_manager = TTSManager(session)
-        blocks_current = session['blocks_current']
-        blocks = blocks_current['blocks']
+        cpu_workers = int(default_tts_cpu_workers) or max(1, cpu_count() // 4)
+        if cpu_workers > 1 and sys.platform == systems['LINUX'] and session['device'] == devices['CPU']['proc']:
+            # before the writer, finalizer, block store timer and voice preload threads start, none of their locks
+            # is held in the children. voices are conditioned by each worker on first use.
+            sentence_pool = fork_sentence_pool(tts_manager, cpu_workers)
+            msg = f'Synthesizing on {cpu_workers} CPU workers'
+            print(msg)
+        audio_writer = AudioWriter()
+        tts_manager.set_audio_writer(audio_writer)
+        chapter_finalizer = ChapterFinalizer(cancel_event)
+        scheduler = SentenceScheduler(tts_manager.convert_sentences2audio, default_tts_batch_size if tts_manager.supports_batch else 1, session['tts_engine'])
+        perf = PerfRecorder.get(session_id)
+        # blocks are paged in from the block store, the session proxy only carries the resume stamp while converting
+        block_store = BlockStore.get(session['blocks_current_db'])
+        blocks_current = block_store.load_stamp()
+        block_ids = block_store.block_ids()
         block_resume = blocks_current['block_resume']
         sentence_resume = blocks_current['sentence_resume']
         blocks_saved = session['blocks_saved']
@@ -2701,10 +2811,21 @@ def convert_chapters2audio(session_id:str)->bool:
         _lang = session['language']
         if session.get('translate_enabled') and session.get('translate'):
             _lang = session['translate']
+        if default_sentence_cache_size > 0:
+            sentence_cache = SentenceCache(sentence_cache_dir, default_sentence_cache_size)
+            # everything besides the sentence text and the voice file that changes the synthesized audio
+            cache_params = {
+                'tts_engine': session['tts_engine'],
+                'fine_tuned': session['fine_tuned'],
+                'custom_model': path_stamp(session['custom_model']),
+                'language': _lang,
+                'format': default_audio_proc_format,
+                **{k: session[k] for k in session.keys() if k.startswith(f"{session['tts_engine']}_")}
+            }
         if _lang != 'eng' and _lang in xtts_languages:
-            is_voice_changed = False
+            changed_blocks = []
             voice_cache = {}
-            for block in blocks:
+            for block in block_store.iter_blocks():
                 old_voice = block.get('voice')
                 if old_voice in voice_cache:
                     new_voice = voice_cache[old_voice]
@@ -2718,35 +2839,51 @@ def convert_chapters2audio(session_id:str)->bool:
                             return False
                     voice_cache[old_voice] = new_voice
                 if new_voice != old_voice:
-                    is_voice_changed = True
+                    changed_blocks.append(block)
                     block['voice'] = new_voice
                     if blocks_saved:
                         if block['id'] in prev_blocks:
                             prev_blocks[block['id']]['voice'] = new_voice
-            if is_voice_changed:
+            if changed_blocks:
                 if blocks_saved:
                     blocks_saved['blocks'] = list(prev_blocks.values())
                     session['blocks_saved'] = blocks_saved
                     save_json_blocks(session_id, 'blocks_saved')
-                blocks_current['blocks'] = blocks
-                session['blocks_current'] = blocks_current
-                save_db_blocks(session_id)
-        total_chapters = sum(1 for b in blocks if b['keep'] and b['text'].strip())
+                block_store.update_blocks(changed_blocks)
+        total_chapters = 0
+        total_sentences = 0
+        block_voices = []
+        inline_voices = []
+        for b in block_store.iter_blocks():
+            if not (b['keep'] and b['text'].strip()):
+                continue
+            total_chapters += 1
+            total_sentences += _count_sentences(b['sentences'])
+            voice = b.get('voice') or session.get('voice')
+            if voice not in block_voices:
+                block_voices.append(voice)
+            for m in SML_TAG_PATTERN.finditer(' '.join(b['sentences'])):
+                if m.group('tag') == 'voice' and not m.group('close') and m.group('value'):
+                    inline_voice = os.path.abspath(m.group('value'))
+                    if inline_voice not in inline_voices:
+                        inline_voices.append(inline_voice)
         if total_chapters == 0:
             show_alert(session_id, {'type': 'warning', 'msg': 'No chapters found!'})
             return False
-        total_sentences = sum(_count_sentences(b['sentences']) for b in blocks if b['keep'] and b['text'].strip())
         if total_sentences == 0:
             show_alert(session_id, {'type': 'warning', 'msg': 'No sentences found!'})
             return False
         if not session['ebook']:
             return False
+        preloaded, error = tts_manager.preload_voices(block_voices, inline_voices)
+        if not preloaded:
+            show_alert(session_id, {'type': 'warning', 'msg': error})
+            return False
         ebook_name = Path(session['ebook']).name
         chapters_dir = session['chapters_dir']
         sentences_dir = session['sentences_dir']
         global_sent = 0
         ch_num = 0
-        last_save_time = time.monotonic()
         baseline_initialized = False
         msg = (f'---------<br/>'
                f"{session['filename_noext']}<br/>"
@@ -2755,13 +2892,16 @@ def convert_chapters2audio(session_id:str)->bool:
                f'<br/>---------')
         show_alert(session_id, {'type': 'info', 'msg': msg})
         with tqdm(total=total_sentences, desc='0.00%', bar_format='{desc}: {n_fmt}/{total_fmt} ', unit='step', initial=0) as t:
-            for x, block in enumerate(blocks):
-                if not (block['keep'] and block['text'].strip()):
+            for x, block_id in enumerate(block_ids):
+                block = block_store.get_block(block_id)
+                if block is None or not (block['keep'] and block['text'].strip()):
                     continue
-                if session['cancellation_requested']:
+                if cancel_event.is_set():
+                    return False
+                if chapter_finalizer.error is not None:
+                    show_alert(session_id, {'type': 'warning', 'msg': chapter_finalizer.error})
                     return False
                 ch_num += 1
-                block_id = block['id']
                 sentences = block['sentences']
                 block_len = len(sentences)
                 valid_idx = {i for i,s in enumerate(sentences) if any(c.isalnum() for c in s.strip())}
@@ -2777,6 +2917,14 @@ def convert_chapters2audio(session_id:str)->bool:
                 block_dir = os.path.join(sentences_dir, block_id)
                 if x < block_resume and not block_changed:
                     if not os.path.exists(chapter_audio_file):
+                        stream = ChapterStream(chapters_dir, block_id)
+                        if _can_reassemble(block_id, sentences, stream):
+                            show_alert(session_id, {'type': 'info', 'msg': f'Block {x} chapter audio missing, assembling it from its sentences…'})
+                            chapter_finalizer.submit(block_id, _finalize_chapter, block, block_dir, chapter_audio_file, stream)
+                            cnt = len(valid_idx)
+                            global_sent += cnt
+                            t.update(cnt)
+                            continue
                         show_alert(session_id, {'type': 'warning', 'msg': f'Block {x} chapter audio missing, reconverting entire block…'})
                         _reset_chapter_file(block_id)
                     else:
@@ -2794,18 +2942,31 @@ def convert_chapters2audio(session_id:str)->bool:
                     _reset_chapter_file(block_id)
                 elif x == block_resume and not block_changed:
                     if sentence_resume == 0 and os.path.isdir(block_dir):
+                        block_store.drop_sentence_audio(block_id)
                         shutil.rmtree(block_dir)
                     start_sentence = sentence_resume
                 show_alert(session_id, {'type': 'info', 'msg': f'Chapter {ch_num} (block {x}) containing {block_len} sentences…'})
                 os.makedirs(block_dir, exist_ok=True)
+                if default_chapter_stream:
+                    chapter_stream = ChapterStream(chapters_dir, block_id)
+                    streamed = chapter_stream.resume(start_sentence)
+                    durable = sorted(j for j in block_store.sentence_audio(block_id) if j < start_sentence)
+                    if sorted(streamed) != durable:
+                        # stream and manifest disagree (crash between the two, mode switched mid-book), rebuild the prefix
+                        chapter_stream.reset()
+                        for j in durable:
+                            chapter_stream.append_file(j, os.path.join(block_dir, f'{j}.{default_audio_proc_format}'))
                 blocks_current['block_resume'] = x
                 blocks_current['sentence_resume'] = start_sentence
-                session['blocks_current'] = blocks_current
-                save_db_stamp(session_id)
+                block_store.save_stamp(blocks_current, flush=True)
                 converted = False
+                unsaved = []
+                reused = set()
                 block_voice = block.get('voice') or session.get('voice')
+                pending = [j for j in range(block_len) if j in valid_idx and (j >= start_sentence or j in missing_sentences)]
+                synth = _synthesize_sentences(block_id, block_dir, block_voice, sentences, pending)
                 for j in range(block_len):
-                    if session['cancellation_requested']:
+                    if cancel_event.is_set():
                         msg = 'Conversion Cancelled'
                         return False
                     sentence = sentences[j].strip()
@@ -2813,23 +2974,28 @@ def convert_chapters2audio(session_id:str)->bool:
                         if j >= start_sentence or j in missing_sentences:
                             if j == start_sentence and start_sentence > 0:
                                 show_alert(session_id, {'type': 'info', 'msg': f'*** Resuming from sentence {global_sent} ***'})
-                            sentence_file = os.path.join(block_dir, f'{j}.{default_audio_proc_format}')
-                            run, error = tts_manager.convert_sentence2audio(sentence_file, sentence, block_voice=block_voice)
-                            if not run:
-                                show_alert(session_id, {'type': 'warning', 'msg': error})
+                            # batched sentences: the first one of a batch carries the wait for the whole batch
+                            with perf.sample() as sample:
+                                result = next(synth, None)
+                            if result is None:
+                                msg = 'Conversion Cancelled'
+                                return False
+                            _, run, error = result
+                            if scheduler.batch_size > 1:
+                                scheduler_state = scheduler.state()
+                                t.set_postfix(queued=scheduler_state['queued'], done=scheduler_state['completed'], refresh=False)
+                            perf.sentence(block_id, j, len(sentence), sample, j in reused)
+                            if not run or audio_writer.error is not None:
+                                show_alert(session_id, {'type': 'warning', 'msg': error or audio_writer.error})
                                 return False
                             converted = True
-                            blocks_current['sentence_resume'] = j
-                            now = time.monotonic()
+                            unsaved.append(j)
+                            _stamp_durable_sentences()
+                            block_store.save_stamp(blocks_current)
                             if not baseline_initialized:
-                                session['blocks_current'] = blocks_current
-                                session['blocks_saved'] = copy.deepcopy(blocks_current)
+                                session['blocks_saved'] = block_store.load()
                                 save_json_blocks(session_id, 'blocks_saved')
                                 baseline_initialized = True
-                            elif now - last_save_time >= 5:
-                                session['blocks_current'] = blocks_current
-                                save_db_stamp(session_id)
-                                last_save_time = now
                         global_sent += 1
                         total_progress = (t.n + 1) / total_sentences
                         if session['is_gui_process']:
@@ -2840,28 +3006,67 @@ def convert_chapters2audio(session_id:str)->bool:
                 sent_end = global_sent - 1
                 show_alert(session_id, {'type': 'info', 'msg': f'End of Chapter {ch_num} (block {x})'})
                 if converted or block_changed or missing_sentences:
+                    written, error = audio_writer.drain()
+                    if not written:
+                        show_alert(session_id, {'type': 'warning', 'msg': error})
+                        return False
+                    _stamp_durable_sentences()
+                    block_store.save_stamp(blocks_current, flush=True)
+                    # the chapter is assembled in the background while the engine moves on to the next block
                     show_alert(session_id, {'type': 'info', 'msg': f'Combining chapter {ch_num} (block {x}) to audio, sentence {sent_start} to {sent_end}'})
-                    session['blocks_current'] = blocks_current
-                    save_db_stamp(session_id)
-                    last_save_time = time.monotonic()
-                    if not combine_audio_sentences(session_id, chapter_audio_file, block_id, block_len):
-                        show_alert(session_id, {'type': 'warning', 'msg': 'combine_audio_sentences() failed!'})
+                    if not chapter_finalizer.submit(block_id, _finalize_chapter, block, block_dir, chapter_audio_file, chapter_stream):
+                        show_alert(session_id, {'type': 'warning', 'msg': chapter_finalizer.error})
                         return False
+            remaining = chapter_finalizer.wait(0)
+            while remaining:
+                if session['is_gui_process']:
+                    progress_bar(progress=1.0, desc=f'{ebook_name} - assembling chapters, {remaining} left')
+                remaining = chapter_finalizer.wait(1.0)
+            finalized, error = chapter_finalizer.drain()
+            if not finalized:
+                show_alert(session_id, {'type': 'warning', 'msg': error})
+                return False
+            dedup_linked = perf.counters.get('dedup_linked', 0)
+            if dedup_linked:
+                show_alert(session_id, {'type': 'info', 'msg': f'Sentence deduplication: {dedup_linked} engine calls saved by reusing earlier audio'})
             #blocks_current['block_resume'] = 0
             #blocks_current['sentence_resume'] = 0
-            session['blocks_current'] = blocks_current
-            save_db_stamp(session_id)
-            session['blocks_saved'] = copy.deepcopy(blocks_current)
+            block_store.save_stamp(blocks_current, flush=True)
+            session['blocks_saved'] = block_store.load()
             save_json_blocks(session_id, 'blocks_saved')
             return True
     except Exception as e:
         DependencyError(e)
         exception_alert(session_id, f'convert_chapters2audio() error: {e}')
         return False
-
+    finally:
+        if synth is not None:
+            # an early return leaves the sentence generator suspended, closing it settles the scheduler counters
+            synth.close()
+        if scheduler is not None:
+            PerfRecorder.get(session_id).state('scheduler', scheduler.state())
+        if block_store is not None:
+            try:
+                # one full read per run hands the session back the book with its final resume stamp
+                session['blocks_current'] = block_store.load()
+            except Exception as e:
+                error = f'convert_chapters2audio() cannot sync blocks_current: {e}'
+                print(error)
+        if sentence_cache is not None:
+            sentence_cache.close()
+        if sentence_pool is not None:
+            sentence_pool.terminate()
+            sentence_pool.join()
+        if audio_writer is not None:
+            audio_writer.close()
+        if chapter_finalizer is not None:
+            chapter_finalizer.close()
+
+@perf_stage('combine_audio_sentences')
 def combine_audio_sentences(session_id:str, file:str, block_id:str, sentence_count:int)->bool:
     try:
         session = context.get_session(session_id)
+        cancel_event = context.cancel_event(session_id)
         if not session or not session.get('id', False):
             error = 'Session expired!'
             print(error)
@@ -2872,26 +3077,40 @@ def combine_audio_sentences(session_id:str, file:str, block_id:str, sentence_cou
             return False
         block_dir = Path(session['sentences_dir']) / block_id
         ext = default_audio_proc_format
+        written = BlockStore.get(session['blocks_current_db']).sentence_audio(block_id, str(block_dir), ext)
         selected_files = []
         missing = []
         for i in range(sentence_count):
-            path = block_dir / f'{i}.{ext}'
-            if path.is_file():
-                selected_files.append(path)
+            if i in written:
+                selected_files.append(block_dir / f'{i}.{ext}')
             else:
                 missing.append(i)
         if missing:
             error = f'Missing sentence files in block {block_id}: {missing}'
             print(error)
             return False
+        # sentences of one chapter come from one engine, they are joined in process when they share a samplerate
+        if len({written[i][1] for i in range(sentence_count)}) == 1:
+            try:
+                if concat_audio_files(selected_files, file, cancel_event):
+                    msg = f'********* Combined block audio file saved in {file}'
+                    print(msg)
+                    return True
+            except Exception as e:
+                error = f'combine_audio_sentences() native concat failed, falling back to ffmpeg: {e}'
+                print(error)
+            if cancel_event.is_set():
+                return False
         concat_dir = session['process_dir']
         concat_list = os.path.join(concat_dir, 'concat_list_sentences.txt')
         with open(concat_list, 'w') as f:
             for path in selected_files:
-                if session['cancellation_requested']:
+                if cancel_event.is_set():
                     return False
                 f.write(f"file '{path.as_posix()}'\n")
-        result = assemble_audio_chunks(concat_list, file, session['is_gui_process'])
+        total_duration = sum(written[i][0] / written[i][1] for i in range(sentence_count))
+        # runs on the chapter finalizer thread, the gradio progress bar is only driven from the conversion loop
+        result = assemble_audio_chunks(concat_list, file, False, cancel_event, total_duration)
         if not result:
             error = 'combine_audio_sentences() FFmpeg concat failed.'
             print(error)
@@ -2903,15 +3122,16 @@ def combine_audio_sentences(session_id:str, file:str, block_id:str, sentence_cou
         DependencyError(e)
         return False
 
+@perf_stage('combine_audio_chapters')
 def combine_audio_chapters(session_id:str)->list[str]|None:
     
     def _on_progress(p:float, desc:str)->None:
         if is_gui_process:
             progress_bar(p / 100.0, desc=desc)
 
-    def _generate_ffmpeg_metadata(part_chapters:list[tuple[str,str]], output_metadata_path:str, default_audio_proc_format:str, part_num:int=None)->str|bool:
+    def _generate_ffmpeg_metadata(part_chapters:list[tuple[str,str,float]], output_metadata_path:str, default_audio_proc_format:str, part_num:int=None, out_fmt:str|None=None)->str|bool:
         try:
-            out_fmt = session['output_format']
+            out_fmt = out_fmt or session['output_format']
             is_mp4_like = out_fmt in ['mp4', 'm4a', 'm4b', 'mov']
             is_vorbis = out_fmt in ['ogg', 'webm']
             is_mp3 = out_fmt == 'mp3'
@@ -2954,13 +3174,12 @@ def combine_audio_chapters(session_id:str)->list[str]|None:
             total = len(part_chapters)
             progress_desc = f'Metadata Part {part_num}' if part_num is not None else 'Metadata'
             bar = None if is_gui_process else tqdm(total=total, desc=progress_desc, unit='ch', file=sys.stdout, dynamic_ncols=True, leave=True)
-            for i, (filename, chapter_title) in enumerate(part_chapters):
-                if session['cancellation_requested']:
+            for i, (filename, chapter_title, duration) in enumerate(part_chapters):
+                if cancel_event.is_set():
                     if bar:
                         bar.close()
                     return False
-                filepath = os.path.join(session['chapters_dir'], filename)
-                duration_ms = len(AudioSegment.from_file(filepath, format=default_audio_proc_format))
+                duration_ms = round(duration * 1000)
                 clean_title = re.sub(r'(^#)|[=\\]|(-$)', lambda m: '\\' + (m.group(1) or m.group(0)), sanitize_meta_chapter_title(chapter_title))
                 ffmpeg_metadata += '[CHAPTER]\nTIMEBASE=1/1000\n'
                 ffmpeg_metadata += f'START={start_time}\nEND={start_time + duration_ms}\n'
@@ -2980,110 +3199,78 @@ def combine_audio_chapters(session_id:str)->list[str]|None:
             print(error)
             return False
 
-    def _export_audio(combined_audio:str, metadata_file:str, final_file:str, block_indices:set=None, part_num:int=None)->bool:
+    def _metadata_files(part_chapters:list[tuple[str,str,float]], metadata_file:str, part_num:int=None)->dict|None:
+        # vorbis, mp4 and id3 want different tags, each output format gets its own ffmetadata file
+        files = {}
+        for fmt in export_formats:
+            if not export_format_args(fmt)[3]:
+                continue
+            path = str(metadata_file) if fmt == session['output_format'] else f'{os.path.splitext(str(metadata_file))[0]}_{fmt}.txt'
+            if not _generate_ffmpeg_metadata(part_chapters, path, default_audio_proc_format, part_num, out_fmt=fmt):
+                return None
+            files[fmt] = path
+        return files
+
+    def _add_cover(final_file:str, fmt:str)->None:
+        cover_path = session['cover']
+        msg = f'Adding cover {cover_path} into {Path(final_file).name}…'
+        print(msg)
+        audio = None
+        if fmt == 'mp3':
+            from mutagen.mp3 import MP3
+            from mutagen.id3 import ID3, APIC, error as id3_error
+            audio = MP3(final_file, ID3=ID3)
+            try:
+                audio.add_tags()
+            except id3_error:
+                pass
+            with open(cover_path, 'rb') as img:
+                audio.tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='Cover', data=img.read()))
+        elif fmt in ['mp4', 'm4a', 'm4b']:
+            from mutagen.mp4 import MP4, MP4Cover
+            audio = MP4(final_file)
+            with open(cover_path, 'rb') as f:
+                cover_data = f.read()
+            audio['covr'] = [MP4Cover(cover_data, imageformat=MP4Cover.FORMAT_JPEG)]
+        if audio is not None:
+            audio.save()
+
+    def _export_audio(concat_list:str, metadata_files:dict, final_file:str, block_indices:set=None, part_num:int=None, duration:float|None=None, on_progress:Callable[[float], None]|None=None)->bool:
         try:
-            if session['cancellation_requested']:
+            if cancel_event.is_set():
                 return False
             ffprobe_cmd = [
-                shutil.which('ffprobe'), '-v', 'error', '-threads', '0', '-select_streams', 'a:0',
+                shutil.which('ffprobe'), '-v', 'error', '-threads', '0', '-safe', '0', '-f', 'concat', '-select_streams', 'a:0',
                 '-show_entries', 'stream=codec_name,sample_rate,sample_fmt',
-                '-of', 'default=nokey=1:noprint_wrappers=1', combined_audio
+                '-of', 'default=nokey=1:noprint_wrappers=1', concat_list
             ]
             probe = subprocess.run(ffprobe_cmd, capture_output=True, text=True)
             if probe.returncode != 0:
-                error = f'ffprobe failed for {combined_audio}: {probe.stderr.strip()}'
+                error = f'ffprobe failed for {concat_list}: {probe.stderr.strip()}'
                 print(error)
                 return False
             codec_info = probe.stdout.strip().splitlines()
             input_codec = codec_info[0] if len(codec_info) > 0 else None
             input_rate = codec_info[1] if len(codec_info) > 1 else None
-            cmd = [shutil.which('ffmpeg'), '-hide_banner', '-nostats', '-hwaccel', 'auto', '-thread_queue_size', '1024', '-i', combined_audio]
-            target_codec, target_rate = None, None
-            if session['output_format'] == 'wav':
-                target_codec = 'pcm_s16le'
-                target_rate = '44100'
-                cmd += ['-map', '0:a', '-ar', target_rate, '-sample_fmt', 's16']
-            elif session['output_format'] == 'aac':
-                target_codec = 'aac'
-                target_rate = '44100'
-                cmd += ['-c:a', 'aac', '-b:a', '192k', '-ar', target_rate, '-movflags', '+faststart']
-            elif session['output_format'] == 'flac':
-                target_codec = 'flac'
-                target_rate = '44100'
-                cmd += ['-c:a', 'flac', '-compression_level', '5', '-ar', target_rate]
-            else:
-                cmd += ['-f', 'ffmetadata', '-i', metadata_file, '-map', '0:a']
-                if session['output_format'] in ['m4a', 'm4b', 'mp4', 'mov']:
-                    target_codec = 'aac'
-                    target_rate = '44100'
-                    cmd += ['-c:a', 'aac', '-b:a', '192k', '-ar', target_rate, '-movflags', '+faststart+use_metadata_tags']
-                elif session['output_format'] == 'mp3':
-                    target_codec = 'mp3'
-                    target_rate = '44100'
-                    cmd += ['-c:a', 'libmp3lame', '-b:a', '192k', '-ar', target_rate]
-                elif session['output_format'] == 'webm':
-                    target_codec = 'opus'
-                    target_rate = '48000'
-                    cmd += ['-c:a', 'libopus', '-b:a', '192k', '-ar', target_rate]
-                elif session['output_format'] == 'ogg':
-                    target_codec = 'opus'
-                    target_rate = '48000'
-                    cmd += ['-c:a', 'libopus', '-compression_level', '0', '-b:a', '192k', '-ar', target_rate]
-                cmd += ['-map_metadata', '1']
-            if session['output_channel'] == 'stereo':
-                cmd += ['-ac', '2']
-            else:
-                cmd += ['-ac', '1']
-            if input_codec == target_codec and input_rate == target_rate:
-                cmd = [
-                    shutil.which('ffmpeg'), '-hide_banner', '-nostats', '-hwaccel', 'auto', '-thread_queue_size', '1024', '-i', combined_audio,
-                    '-threads', '0', '-f', 'ffmetadata', '-i', metadata_file,
-                    '-map', '0:a', '-map_metadata', '1', '-c', 'copy',
-                    '-progress', 'pipe:2',
-                    '-y', final_file
-                ]
+            final_files = {fmt: final_file if fmt == session['output_format'] else str(Path(final_file).with_suffix(f'.{fmt}')) for fmt in export_formats}
+            cmd = build_export_cmd(concat_list, final_files, metadata_files, input_codec, input_rate, session['output_channel'], default_chapter_loudnorm)
+            if on_progress is None:
+                proc_pipe = SubprocessPipe(cmd, is_gui_process=is_gui_process, total_duration=duration, msg='Export', on_progress=lambda p: _on_progress(p, 'Export'), cancel_event=cancel_event)
             else:
-                cmd += [
-                    '-filter_threads', '0',
-                    '-filter_complex_threads', '0',
-                    '-af', 'dynaudnorm=f=150:g=15,afftdn=nf=-70',
-                    '-threads', '0',
-                    '-progress', 'pipe:2',
-                    '-y', final_file
-                ]
-            progress_desc = f'Export Part {part_num}' if part_num is not None else 'Export'
-            proc_pipe = SubprocessPipe(cmd, is_gui_process=is_gui_process, total_duration=get_audio_duration(combined_audio), msg='Export', on_progress=lambda p: _on_progress(p, progress_desc))
+                # a worker thread, gradio progress is left to the caller which combines all parts
+                proc_pipe = SubprocessPipe(cmd, is_gui_process=False, total_duration=duration, msg=f'Export Part {part_num}', on_progress=on_progress, cancel_event=cancel_event)
             if not proc_pipe.result:
                 error = f'ffmpeg export failed for {final_file}'
                 print(error)
                 return False
-            if not (os.path.exists(final_file) and os.path.getsize(final_file) > 0):
-                error = f'{Path(final_file).name} is corrupted or does not exist'
-                print(error)
-                return False
-            if session['output_format'] in ['mp3', 'm4a', 'm4b', 'mp4'] and session['cover'] is not None:
-                cover_path = session['cover']
-                msg = f'Adding cover {cover_path} into the final audiobook file…'
-                print(msg)
-                audio = None
-                if session['output_format'] == 'mp3':
-                    from mutagen.mp3 import MP3
-                    from mutagen.id3 import ID3, APIC, error as id3_error
-                    audio = MP3(final_file, ID3=ID3)
-                    try:
-                        audio.add_tags()
-                    except id3_error:
-                        pass
-                    with open(cover_path, 'rb') as img:
-                        audio.tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='Cover', data=img.read()))
-                elif session['output_format'] in ['mp4', 'm4a', 'm4b']:
-                    from mutagen.mp4 import MP4, MP4Cover
-                    audio = MP4(final_file)
-                    with open(cover_path, 'rb') as f:
-                        cover_data = f.read()
-                    audio['covr'] = [MP4Cover(cover_data, imageformat=MP4Cover.FORMAT_JPEG)]
-                if audio is not None:
-                    audio.save()
+            for fmt, file in final_files.items():
+                if not (os.path.exists(file) and os.path.getsize(file) > 0):
+                    error = f'{Path(file).name} is corrupted or does not exist'
+                    print(error)
+                    return False
+                if fmt in ['mp3', 'm4a', 'm4b', 'mp4'] and session['cover'] is not None:
+                    _add_cover(file, fmt)
+            # every format shares the stem, so one vtt serves them all
             final_vtt = os.path.join(session['audiobooks_dir'], f'{Path(final_file).stem}.vtt')
             vtt_built, error = build_vtt_file(session, vtt_path=final_vtt, block_indices=block_indices)
             if not vtt_built:
@@ -3096,11 +3283,27 @@ def combine_audio_chapters(session_id:str)->list[str]|None:
             print(error)
             return False
 
+    def _part_progress(part_progress:dict, progress_lock:threading.Lock, part_num:int)->Callable[[float], None]:
+        def _sink(p:float)->None:
+            with progress_lock:
+                part_progress[part_num] = p
+        return _sink
+
+    def _export_part(concat_list:str, metadata_files:dict, final_file:str, block_indices:set|None, part_num:int, duration:float, on_progress:Callable[[float], None])->bool:
+        with PerfRecorder.get(session_id).stage('export_audio'):
+            exported = _export_audio(concat_list, metadata_files, final_file, block_indices=block_indices, part_num=part_num, duration=duration, on_progress=on_progress)
+        msg = f'Part {part_num} {"exported to " + final_file if exported else "export failed"}'
+        print(msg)
+        return exported
+
     try:
         session = context.get_session(session_id)
+        cancel_event = context.cancel_event(session_id)
         if not (session and session.get('id', False)):
             return None
         is_gui_process = session['is_gui_process']
+        # extra formats are encoded by the same ffmpeg process, next to the main one
+        export_formats = [session['output_format'], *(session['output_extra_formats'] or [])]
         chapter_files = []
         chapter_titles = []
         chapter_positions = []
@@ -3124,23 +3327,35 @@ def combine_audio_chapters(session_id:str)->list[str]|None:
         if len(chapter_files) == 0:
             print('No block files exist!')
             return None
-        chunks_size = 892
+        # a chapter is the concat of its sentences, its length is the sum of the sample counts in the manifest
+        block_store = BlockStore.get(session['blocks_current_db'])
+        blocks = session['blocks_current']['blocks']
         total_duration = 0.0
         durations = []
-        for i in range(0, len(chapter_files), chunks_size):
-            filepaths = [
-                os.path.join(session['chapters_dir'], f)
-                for f in chapter_files[i:i + chunks_size]
-            ]
-            durations_dict = get_audiolist_duration(filepaths)
-            for path in filepaths:
-                dur = durations_dict.get(path, 0.0)
-                durations.append(dur)
-                total_duration += dur
+        for x, fname in zip(chapter_positions, chapter_files):
+            block = blocks[x]
+            block_dir = os.path.join(session['sentences_dir'], block['id'])
+            written = block_store.sentence_audio(block['id'], block_dir, default_audio_proc_format)
+            entries = [written[j] for j in range(len(block['sentences'])) if j in written]
+            if entries:
+                dur = sum(samples for samples, _, _ in entries) / entries[0][1]
+            else:
+                dur = get_audio_duration(os.path.join(session['chapters_dir'], fname))
+            durations.append(dur)
+            total_duration += dur
         if len(durations) != len(chapter_files):
             error = f'Duration count mismatch: {len(durations)} durations vs {len(chapter_files)} chapter files'
             print(error)
             return None
+        # the export reads the chapters from here, normalized copies when loudness normalization is on
+        audio_dir = session['chapters_dir']
+        if default_chapter_loudnorm:
+            with PerfRecorder.get(session_id).stage('normalize_chapters'):
+                audio_dir = normalize_chapters(session_id, [os.path.join(session['chapters_dir'], fname) for fname in chapter_files], durations)
+            if audio_dir is None:
+                error = 'normalize_chapters() failed!'
+                print(error)
+                return None
         exported_files = []
         concat_dir = session['process_dir']
         if session.get('output_split'):
@@ -3151,7 +3366,7 @@ def combine_audio_chapters(session_id:str)->list[str]|None:
             cur_duration = 0
             max_part_duration = int(session['output_split_hours']) * 3600
             for idx, (file, dur) in enumerate(zip(chapter_files, durations)):
-                if session['cancellation_requested']:
+                if cancel_event.is_set():
                     return None
                 if cur_part and (cur_duration + dur > max_part_duration):
                     part_files.append(cur_part)
@@ -3167,83 +3382,272 @@ def combine_audio_chapters(session_id:str)->list[str]|None:
                 part_chapter_indices.append(cur_indices)
             pad_width = len(str(len(part_files)))
             is_multi_part = len(part_files) > 1
+            export_jobs = []
             for part_idx, (part_file_list, indices) in enumerate(zip(part_files, part_chapter_indices)):
                 concat_list = os.path.join(concat_dir, f'concat_list_chapters_{part_idx+1:0{pad_width}d}.txt')
                 with open(concat_list, 'w') as f:
                     for file in part_file_list:
-                        if session['cancellation_requested']:
+                        if cancel_event.is_set():
                             return None
-                        path = Path(session['chapters_dir']) / file
+                        path = Path(audio_dir) / file
                         f.write(f"file '{path.as_posix()}'\n")
-                merged_audio = Path(session['process_dir']) / f"{get_sanitized(session['metadata']['title'])}_part{part_idx+1:0{pad_width}d}.{default_audio_proc_format}"
-                result = assemble_audio_chunks(concat_list, merged_audio, is_gui_process)
-                if not result:
-                    error = f'assemble_audio_chunks() Final merge failed for part {part_idx+1}.'
-                    print(error)
-                    return None
+                part_duration = sum(durations[i] for i in indices)
                 metadata_file = Path(session['process_dir']) / f'metadata_part{part_idx+1:0{pad_width}d}.txt'
-                part_chapters = [(chapter_files[i], chapter_titles[i]) for i in indices]
-                _generate_ffmpeg_metadata(part_chapters, str(metadata_file), default_audio_proc_format)
+                part_chapters = [(chapter_files[i], chapter_titles[i], durations[i]) for i in indices]
+                metadata_files = _metadata_files(part_chapters, metadata_file, part_idx+1)
+                if metadata_files is None:
+                    return None
                 final_file = os.path.join(
                     session['audiobooks_dir'],
                     f"{Path(session['final_name']).stem}_part{part_idx+1:0{pad_width}d}.{session['output_format']}"
                     if is_multi_part else session['final_name']
                 )
                 block_indices = {chapter_positions[i] for i in indices} if is_multi_part else None
-                if _export_audio(merged_audio, metadata_file, final_file, block_indices=block_indices, part_num=part_idx+1):
-                    exported_files.append(final_file)
+                part_size = sum(os.path.getsize(os.path.join(audio_dir, chapter_files[i])) for i in indices)
+                export_jobs.append((concat_list, metadata_files, final_file, block_indices, part_idx+1, part_duration, part_size))
+            workers = export_worker_count([job[-1] for job in export_jobs], shutil.disk_usage(session['audiobooks_dir']).free, int(default_export_workers) or max(1, cpu_count() // 2))
+            if workers > 1:
+                msg = f'Exporting {len(export_jobs)} parts on {workers} workers'
+                print(msg)
+            part_progress = {}
+            progress_lock = threading.Lock()
+            part_durations = {job[4]: job[5] for job in export_jobs}
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_export_part, *job[:-1], _part_progress(part_progress, progress_lock, job[4])) for job in export_jobs]
+                part_futures = dict(zip(futures, part_durations))
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, timeout=0.5)
+                    with progress_lock:
+                        for future in done:
+                            part_progress[part_futures[future]] = 100.0
+                        percent = export_progress(part_progress, part_durations)
+                    _on_progress(percent, f'Export {len(futures) - len(pending)}/{len(futures)} parts')
+                for job, future in zip(export_jobs, futures):
+                    if future.result():
+                        exported_files.append(job[2])
         else:
             concat_list = os.path.join(concat_dir, 'concat_list_chapters_1.txt')
-            merged_audio = Path(session['process_dir']) / f"{get_sanitized(session['metadata']['title'])}.{default_audio_proc_format}"
             with open(concat_list, 'w') as f:
                 for file in chapter_files:
-                    if session['cancellation_requested']:
+                    if cancel_event.is_set():
                         return None
-                    path = Path(session['chapters_dir']) / file
+                    path = Path(audio_dir) / file
                     f.write(f"file '{path.as_posix()}'\n")
-            result = assemble_audio_chunks(concat_list, merged_audio, is_gui_process)
-            if not result:
-                print(f'assemble_audio_chunks() Final merge failed for {merged_audio}.')
-                return None
             metadata_file = os.path.join(session['process_dir'], 'metadata.txt')
-            chapters_zip = list(zip(chapter_files, chapter_titles))
-            _generate_ffmpeg_metadata(chapters_zip, metadata_file, default_audio_proc_format)
+            chapters_zip = list(zip(chapter_files, chapter_titles, durations))
+            metadata_files = _metadata_files(chapters_zip, metadata_file)
+            if metadata_files is None:
+                return None
             final_file = os.path.join(session['audiobooks_dir'], session['final_name'])
-            if _export_audio(merged_audio, metadata_file, final_file):
+            with PerfRecorder.get(session_id).stage('export_audio'):
+                exported = _export_audio(concat_list, metadata_files, final_file, duration=total_duration)
+            if exported:
                 exported_files.append(final_file)
         return exported_files if exported_files else None
     except Exception as e:
         DependencyError(e)
         return None
 
-def assemble_audio_chunks(txt_file:str, out_file:str, is_gui_process:bool)->bool:
+def export_format_args(fmt:str)->tuple:
+    # (target codec, target rate, encoder args, takes the chapter metadata) of one output format
+    if fmt == 'wav':
+        return 'pcm_s16le', '44100', ['-ar', '44100', '-sample_fmt', 's16'], False
+    elif fmt == 'aac':
+        return 'aac', '44100', ['-c:a', 'aac', '-b:a', '192k', '-ar', '44100', '-movflags', '+faststart'], False
+    elif fmt == 'flac':
+        return 'flac', '44100', ['-c:a', 'flac', '-compression_level', '5', '-ar', '44100'], False
+    elif fmt in ['m4a', 'm4b', 'mp4', 'mov']:
+        return 'aac', '44100', ['-c:a', 'aac', '-b:a', '192k', '-ar', '44100', '-movflags', '+faststart+use_metadata_tags'], True
+    elif fmt == 'mp3':
+        return 'mp3', '44100', ['-c:a', 'libmp3lame', '-b:a', '192k', '-ar', '44100'], True
+    elif fmt == 'webm':
+        return 'opus', '48000', ['-c:a', 'libopus', '-b:a', '192k', '-ar', '48000'], True
+    elif fmt == 'ogg':
+        return 'opus', '48000', ['-c:a', 'libopus', '-compression_level', '0', '-b:a', '192k', '-ar', '48000'], True
+    return None, None, [], True
+
+def build_export_cmd(concat_list:str, final_files:dict, metadata_files:dict, input_codec:str|None, input_rate:str|None, output_channel:str, prenormalized:bool)->list:
+    # one ffmpeg graph for every output format: final_files maps each format to its file, the audiobook format first.
+    # chapter files are read straight through the concat demuxer, no merged intermediate is written.
+    formats = list(final_files)
+    plans = {fmt: export_format_args(fmt) for fmt in formats}
+    cmd = [shutil.which('ffmpeg'), '-hide_banner', '-nostats', '-progress', 'pipe:2', '-hwaccel', 'auto', '-thread_queue_size', '1024', '-safe', '0', '-f', 'concat', '-i', concat_list]
+    # only formats that carry tags and chapters get an ffmetadata input, wav, aac and flac are written without
+    meta_inputs = {}
+    for fmt in formats:
+        if plans[fmt][3] and metadata_files.get(fmt):
+            meta_inputs[fmt] = len(meta_inputs) + 1
+            cmd += ['-f', 'ffmetadata', '-i', metadata_files[fmt]]
+    encoded = [fmt for fmt in formats if plans[fmt][:2] != (input_codec, input_rate)]
+    if encoded and prenormalized:
+        # chapters already carry their gain and denoise, see normalize_chapters(), every encoder reads the decode as is
+        labels = ['0:a'] * len(encoded)
+    elif encoded:
+        # one decode and one filter pass, asplit fans the filtered audio out to every encoder
+        labels = [f'[a{i}]' for i in range(len(encoded))]
+        fan_out = f',asplit={len(encoded)}' if len(encoded) > 1 else ''
+        cmd += [
+            '-filter_threads', '0',
+            '-filter_complex_threads', '0',
+            '-filter_complex', f"[0:a]dynaudnorm=f=150:g=15,afftdn=nf=-70{fan_out}{''.join(labels)}"
+        ]
+    for fmt in formats:
+        args = plans[fmt][2]
+        tags = ['-map_metadata', str(meta_inputs[fmt]), '-map_chapters', str(meta_inputs[fmt])] if fmt in meta_inputs else []
+        if fmt in encoded:
+            cmd += ['-map', labels[encoded.index(fmt)], *args, *tags]
+            cmd += ['-ac', '2' if output_channel == 'stereo' else '1']
+        else:
+            cmd += ['-map', '0:a', *tags, '-c', 'copy']
+        cmd += ['-threads', '0', '-y', final_files[fmt]]
+    return cmd
+
+def export_worker_count(part_sizes:list[int], free:int, workers:int)->int:
+    # parts are independent encodes, each in flight needs about its flac input size of free disk for its output
+    return max(1, min(workers, len(part_sizes), free // max(max(part_sizes, default=1), 1)))
+
+def export_progress(part_progress:dict, part_durations:dict)->float:
+    # one percentage for parts exported side by side, each part weighs its duration
+    total = sum(part_durations.values())
+    if not total:
+        return sum(part_progress.get(part, 0.0) for part in part_durations) / max(len(part_durations), 1)
+    return sum(part_progress.get(part, 0.0) * duration for part, duration in part_durations.items()) / total
+
+def measure_loudness(path:str)->tuple|None:
+    # (integrated loudness LUFS, true peak dBTP) from the loudnorm analysis pass
+    cmd = [shutil.which('ffmpeg'), '-hide_banner', '-nostats', '-i', path, '-af', 'loudnorm=print_format=json', '-f', 'null', '-']
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    match = re.search(r'\{[^{}]*"input_i"[^{}]*\}', proc.stderr)
+    if proc.returncode != 0 or not match:
+        error = f'measure_loudness() failed for {path}: {proc.stderr.strip()[-300:]}'
+        print(error)
+        return None
+    stats = json.loads(match.group(0))
+    return float(stats['input_i']), float(stats['input_tp'])
+
+def book_loudness_gain(stats:list, target:float)->float:
+    # stats: (integrated LUFS, true peak dBTP, duration s) per chapter. one gain for the whole book keeps
+    # the loudness of the chapters relative to each other, the true peak of the loudest chapter stays under -1 dBTP.
+    measured = [(i, tp, d) for i, tp, d in stats if d > 0 and math.isfinite(i) and math.isfinite(tp)]
+    if not measured:
+        return 0.0
+    # duration weighted energy mean of the chapter loudness
+    integrated = 10 * math.log10(sum(d * 10 ** (i / 10) for i, _, d in measured) / sum(d for _, _, d in measured))
+    true_peak = max(tp for _, tp, _ in measured)
+    return round(max(-20.0, min(float(target) - integrated, -1.0 - true_peak, 20.0)), 1)
+
+def apply_chapter_gain(path:str, out_path:str, gain:float)->bool:
+    # volume is sample exact, chapter durations in the manifest and the cues stay valid.
+    # the source chapter is left untouched, the normalized copy goes to out_path
+    tmp_path = f'{out_path}.part'
+    fmt = os.path.splitext(out_path)[1].lstrip('.').lower()
+    cmd = [
+        shutil.which('ffmpeg'), '-hide_banner', '-nostats', '-i', path,
+        '-af', f'volume={gain:.2f}dB,afftdn=nf=-70',
+        '-c:a', audio_codecs[fmt], '-f', fmt,
+        '-y', tmp_path
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0 or not os.path.exists(tmp_path):
+        error = f'apply_chapter_gain() failed for {path}: {proc.stderr.strip()[-300:]}'
+        print(error)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, out_path)
+    return True
+
+def normalize_chapters(session_id:str, chapter_paths:list[str], durations:list[float])->str|None:
+    # writes every chapter with the book gain and denoise into chapters/normalized, returns that folder
+    try:
+        session = context.get_session(session_id)
+        cancel_event = context.cancel_event(session_id)
+        if not session or not session.get('id', False):
+            error = 'Session expired!'
+            print(error)
+            return None
+        out_dir = os.path.join(session['chapters_dir'], 'normalized')
+        os.makedirs(out_dir, exist_ok=True)
+        # measurements are kept per chapter as long as its file is untouched,
+        # a normalized copy is kept as long as it was rendered from that file with the current book gain
+        plan_path = os.path.join(out_dir, 'loudness.json')
+        plan = {}
+        if os.path.exists(plan_path):
+            with open(plan_path, 'r', encoding='utf-8') as f:
+                plan = json.load(f)
+        chapters = plan.get('chapters', {})
+        def _stat(path:str)->list:
+            st = os.stat(path)
+            return [st.st_size, st.st_mtime_ns]
+        stats = {path: _stat(path) for path in chapter_paths}
+        to_measure = [path for path in chapter_paths if chapters.get(os.path.basename(path), {}).get('stat') != stats[path]]
+        workers = max(1, min(len(chapter_paths), cpu_count() // 2))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            if to_measure:
+                msg = f'Measuring loudness of {len(to_measure)} chapters on {workers} workers'
+                print(msg)
+                measured = list(pool.map(lambda path: None if cancel_event.is_set() else measure_loudness(path), to_measure))
+                if cancel_event.is_set():
+                    return None
+                for path, loudness in zip(to_measure, measured):
+                    integrated, true_peak = loudness if loudness is not None else (-math.inf, -math.inf)
+                    # json has no infinity, silence and failed measures are stored as null
+                    chapters[os.path.basename(path)] = {
+                        'stat': stats[path],
+                        'integrated': integrated if math.isfinite(integrated) else None,
+                        'true_peak': true_peak if math.isfinite(true_peak) else None,
+                        'gain': None
+                    }
+            loudness = [chapters[os.path.basename(path)] for path in chapter_paths]
+            gain = book_loudness_gain([(c['integrated'] if c['integrated'] is not None else -math.inf, c['true_peak'] if c['true_peak'] is not None else -math.inf, d) for c, d in zip(loudness, durations)], default_chapter_loudness_target)
+            to_render = [path for path in chapter_paths if chapters[os.path.basename(path)]['gain'] != gain or not os.path.exists(os.path.join(out_dir, os.path.basename(path)))]
+            if to_render:
+                msg = f'Applying {gain:+.1f} dB book gain to {len(to_render)} chapters'
+                print(msg)
+            applied = list(pool.map(lambda path: not cancel_event.is_set() and apply_chapter_gain(path, os.path.join(out_dir, os.path.basename(path)), gain), to_render))
+        for path, ok in zip(to_render, applied):
+            chapters[os.path.basename(path)]['gain'] = gain if ok else None
+        plan = {'target': default_chapter_loudness_target, 'gain': gain, 'chapters': {os.path.basename(path): chapters[os.path.basename(path)] for path in chapter_paths}}
+        tmp_path = f'{plan_path}.part'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, indent=2)
+        os.replace(tmp_path, plan_path)
+        return out_dir if all(applied) else None
+    except Exception as e:
+        error = f'normalize_chapters() error: {e}'
+        print(error)
+        return None
+
+def assemble_audio_chunks(txt_file:str, out_file:str, is_gui_process:bool, cancel_event:threading.Event|None=None, total_duration:float|None=None)->bool:
 
     def _on_progress(p:float)->None:
         if is_gui_process:
             progress_bar(p / 100.0, desc='Assemble')
 
     try:
-        total_duration = 0.0
-        filepaths = []
-        try:
-            with open(txt_file, 'r') as f:
-                for line in f:
-                    if line.strip().startswith('file'):
-                        file_path = (
-                            line.strip()
-                            .split('file ')[1]
-                            .strip()
-                            .strip("'")
-                            .strip('"')
-                        )
-                        if os.path.exists(file_path):
-                            filepaths.append(file_path)
-            durations = get_audiolist_duration(filepaths)
-            total_duration = sum(durations.values())
-        except Exception as e:
-            error = f'assemble_audio_chunks() open file {txt_file} Error: {e}'
-            print(error)
-            return False
+        # callers that know the length from the sentence manifest pass it, probing is the fallback
+        if total_duration is None:
+            filepaths = []
+            try:
+                with open(txt_file, 'r') as f:
+                    for line in f:
+                        if line.strip().startswith('file'):
+                            file_path = (
+                                line.strip()
+                                .split('file ')[1]
+                                .strip()
+                                .strip("'")
+                                .strip('"')
+                            )
+                            if os.path.exists(file_path):
+                                filepaths.append(file_path)
+                durations = get_audiolist_duration(filepaths)
+                total_duration = sum(durations.values())
+            except Exception as e:
+                error = f'assemble_audio_chunks() open file {txt_file} Error: {e}'
+                print(error)
+                return False
         ffmpeg = shutil.which('ffmpeg')
         if not ffmpeg:
             error = 'ffmpeg not found'
@@ -3267,7 +3671,8 @@ def assemble_audio_chunks(txt_file:str, out_file:str, is_gui_process:bool)->bool
             is_gui_process=is_gui_process,
             total_duration=total_duration,
             msg='Assemble',
-            on_progress=_on_progress
+            on_progress=_on_progress,
+            cancel_event=cancel_event
         )
         if proc_pipe.result and os.path.exists(out_file):
             msg = f'Completed → {out_file}'
@@ -3394,6 +3799,7 @@ def get_compatible_tts_engines(language:str)->list[str]:
         if language in cfg.get('languages', {})
     ]
 
+@perf_stage('translate_blocks')
 def translate_blocks(session_id:str, raw_blocks:list)->tuple:
     try:
         session = context.get_session(session_id)
@@ -3434,7 +3840,7 @@ def translate_blocks(session_id:str, raw_blocks:list)->tuple:
         )
         with tqdm(total=total, desc='translate', unit='block') as t:
             for idx, text in enumerate(raw_blocks):
-                if session['cancellation_requested']:
+                if context.cancel_event(session_id).is_set():
                     return raw_blocks, 'Conversion cancelled'
                 if not text or not text.strip():
                     out.append(text)
@@ -3576,7 +3982,10 @@ def convert_ebook(args:dict)->tuple:
             session['xtts_enable_text_splitting'] = bool(args['xtts_enable_text_splitting'])
             session['bark_text_temp'] =  float(args['bark_text_temp'])
             session['bark_waveform_temp'] =  float(args['bark_waveform_temp'])
-            session['output_format'] = str(args['output_format'])
+            # --output_format m4b,mp3,webm: the first one is the audiobook, the others are exported alongside it
+            out_formats = list(dict.fromkeys(f.strip().lower() for f in str(args['output_format']).split(',') if f.strip()))
+            session['output_format'] = out_formats[0] if out_formats else default_output_format
+            session['output_extra_formats'] = [f for f in out_formats[1:] if f in output_formats and f != session['output_format']]
             session['output_channel'] = str(args['output_channel'])
             session['output_split'] = bool(args['output_split'])
             session['output_split_hours'] = args['output_split_hours']if args['output_split_hours'] is not None else default_output_split_hours
@@ -3728,6 +4137,7 @@ def convert_ebook(args:dict)->tuple:
                                         if os.path.exists(session['blocks_saved_json']):
                                             os.unlink(session['blocks_saved_json'])
                                         db = session['blocks_current_db']
+                                        BlockStore.release(db)
                                         for f in (db, db + '-wal', db + '-shm'):
                                             if os.path.exists(f):
                                                 os.unlink(f)
@@ -3866,6 +4276,9 @@ def convert_ebook(args:dict)->tuple:
                                                 print(msg)
                                                 progress_status = os.path.basename(session['ebook'])
                                                 return progress_status, True
+                                            elif args.get('stream_fd') is not None:
+                                                progress_status, passed = stream_audiobook(session_id, args['stream_fd'])
+                                                return progress_status, passed
                                             else:
                                                 progress_status, passed = finalize_audiobook(session_id)
                                                 return progress_status, passed
@@ -3881,12 +4294,16 @@ def convert_ebook(args:dict)->tuple:
                         error = f"Your device has not enough memory ({total_vram_gb}GB) to run {session['tts_engine']} engine ({device_vram_required}GB)"
                 else:
                     error = f"Temporary directory {session['process_dir']} not removed due to failure."
-        if session['cancellation_requested']:
+        if context.cancel_event(session_id).is_set():
             error = 'Conversion Cancelled'
         return error, False
     except Exception as e:
         error = f'convert_ebook() Exception: {e}\n{traceback.format_exc()}'
         return error, False
+    finally:
+        # a chapters preview stops here, its conversion later gets a recorder of its own in finalize_audiobook()
+        if session_id is not None:
+            PerfRecorder.release(session_id)
 
 def finalize_audiobook(session_id:str)->tuple:
     try:
@@ -3912,7 +4329,7 @@ def finalize_audiobook(session_id:str)->tuple:
         blocks_current = session['blocks_current']
         blocks = blocks_current['blocks']
         for idx, block in enumerate(blocks):
-            if session['cancellation_requested']:
+            if context.cancel_event(session_id).is_set():
                 if session['status'] == status_tags['DISCONNECTED']:
                     context_tracker.end_session(session_id, session['socket_hash'])
                     msg = 'Frontend disconnected!'
@@ -3932,12 +4349,15 @@ def finalize_audiobook(session_id:str)->tuple:
             block['sentences'] = sentences_list
         blocks_current['blocks'] = blocks
         session['blocks_current'] = blocks_current
-        conversion = convert_chapters2audio(session_id)
+        # the conversion pages blocks in from the db, it has to hold the sentence split
+        save_db_blocks(session_id)
+        duplicates = plan_duplicate_sentences(session_id)
+        conversion = convert_chapters2audio(session_id, duplicates)
         if not conversion:
             error = 'convert_chapters2audio() failed!'
             session = context.get_session(session_id)
             if session and session.get('id', False):
-                if session['cancellation_requested']:
+                if context.cancel_event(session_id).is_set():
                     error = 'Conversion cancelled'
             return _fail(error)
         show_alert(session_id, {'type': 'info', 'msg': 'Combining sentences and chapters…'})
@@ -3945,6 +4365,8 @@ def finalize_audiobook(session_id:str)->tuple:
         if exported_files is None:
             return _fail('combine_audio_chapters() error: exported_files not created!')
         session['audiobook'] = exported_files[-1]
+        report_path = os.path.join(os.path.dirname(session['audiobook']), f"{Path(session['final_name']).stem}_perf.json")
+        PerfRecorder.get(session_id).write_report(report_path, session, BlockStore.get(session['blocks_current_db']).sentence_audio)
         if not session['is_gui_process'] and session.get('abs_enabled') and session.get('abs_auto_upload'):
             from lib.classes.audiobookshelf import upload_to_abs
             a_url = str(session.get('abs_server_url') or '')
@@ -4002,6 +4424,54 @@ def finalize_audiobook(session_id:str)->tuple:
         error = f'finalize_audiobook(): {e}'
         exception_alert(session_id, error)
         return result(error, False)
+    finally:
+        PerfRecorder.release(session_id)
+
+def stream_audiobook(session_id:str, stream_fd:int)->tuple:
+    # headless --stream: raw float32 mono pcm written to stream_fd while each sentence is synthesized,
+    # no sentence, chapter or audiobook file is kept
+    session = context.get_session(session_id)
+    cancel_event = context.cancel_event(session_id)
+    try:
+        if not session or not session.get('id', False):
+            msg = 'session expired!'
+            return msg, False
+        tts_manager = TTSManager(session)
+        msg = f'Streaming f32le mono at {tts_manager.samplerate} Hz, e.g. | ffplay -f f32le -ar {tts_manager.samplerate} -ch_layout mono -nodisp -autoexit -'
+        print(msg)
+        with open(stream_fd, 'wb', buffering=0, closefd=False) as out:
+            for block in session['blocks_current']['blocks']:
+                if not block['keep'] or not block['text'].strip():
+                    continue
+                sentences = block.get('sentences') or get_sentences(session_id, block['text'])
+                if sentences is None:
+                    error = 'No sentences found!'
+                    return error, False
+                for sentence in sentences:
+                    if cancel_event.is_set():
+                        msg = 'Conversion cancelled'
+                        return msg, False
+                    if not sentence.strip():
+                        continue
+                    for chunk in tts_manager.stream_sentence2audio(sentence.strip(), block_voice=block.get('voice') or session['voice']):
+                        out.write(chunk.astype('float32', copy=False).tobytes())
+        filename = os.path.basename(session['ebook'])
+        return filename, True
+    except BrokenPipeError:
+        # the player was closed, not an error
+        msg = 'Stream closed by the reader'
+        print(msg)
+        return msg, True
+    except Exception as e:
+        DependencyError(e)
+        error = f'stream_audiobook(): {e}'
+        exception_alert(session_id, error)
+        return error, False
+    finally:
+        if session:
+            if session['ebook_mode'] == ebook_modes['TEXT'] and session.get('ebook_textarea_src'):
+                Path(session['ebook_textarea_src']).unlink(missing_ok=True)
+            session['status'] = status_tags['END']
 
 def on_unload(req:gr.Request)->None:
     socket_hash = req.session_hash
@@ -4010,7 +4480,7 @@ def on_unload(req:gr.Request)->None:
         if session_id:
             session = context.get_session(session_id)
             if session['status'] == status_tags['CONVERTING']:
-                session['cancellation_requested'] = True
+                context.set_cancellation(session_id, True)
                 session['status'] = status_tags['DISCONNECTED']
                 session['socket_hash'] = socket_hash
             else:
@@ -1010,7 +1010,7 @@ def build_interface(args:dict)->gr.Blocks:
                     if session and session.get('id', False):
                         if session['status'] in [status_tags['READY'], status_tags['END']]:
                             session['status'] = status_tags['READY']
-                            session['cancellation_requested'] = False
+                            context.set_cancellation(session['id'], False)
                             outputs = list(gr.update(interactive=True) for _ in range(26))
                             outputs[23] = gr.update()  # gr_modal is gr.HTML, no interactive support
                             visible_custom_model_del_btn = True if session['custom_model'] is not None else False
@@ -1484,9 +1484,9 @@ def build_interface(args:dict)->gr.Blocks:
                             if prev_selected and prev_selected in abs_files:
                                 new_row = abs_files.index(prev_selected)
                                 if data is None:
-                                    session['cancellation_requested'] = True
+                                    context.set_cancellation(session['id'], True)
                                 else:
-                                    session['cancellation_requested'] = False
+                                    context.set_cancellation(session['id'], False)
                                 return (
                                     gr.update(),
                                     gr.update(value=_build_voice_highlight_css(new_row)),
@@ -1499,17 +1499,17 @@ def build_interface(args:dict)->gr.Blocks:
                                 session['ebook_selected'] = None
                                 voice_update = gr.update(value=session.get('voice')) if prev_selected else gr.update()
                                 if data is None and session.get('status', None) in [status_tags['EDIT'], status_tags['CONVERTING']]:
-                                    session['cancellation_requested'] = True
+                                    context.set_cancellation(session['id'], True)
                                     msg = 'Cancellation requested, please wait…'
                                     return gr.update(value=_show_gr_modal('wait', msg), visible=True), gr.update(value=''), voice_update, gr.update(visible=False), gr.update(value='', visible=False), gr.update(value='')
-                                session['cancellation_requested'] = False
+                                context.set_cancellation(session['id'], False)
                                 return gr.update(), gr.update(value=''), voice_update, gr.update(visible=False), gr.update(value='', visible=False), gr.update(value='')
                         if data is None:
                             if session.get('status', None) in [status_tags['EDIT'], status_tags['CONVERTING']]:
-                                session['cancellation_requested'] = True
+                                context.set_cancellation(session['id'], True)
                                 msg = 'Cancellation requested, please wait…'
                                 return gr.update(value=_show_gr_modal('wait', msg), visible=True), gr.update(value=''), gr.update(), gr.update(), gr.update(), gr.update(value='')
-                        session['cancellation_requested'] = False
+                        context.set_cancellation(session['id'], False)
                 except Exception as e:
                     error = f'_change_gr_ebook_src(): {e}'
                     exception_alert(session_id, error)
@@ -2738,7 +2738,7 @@ def build_interface(args:dict)->gr.Blocks:
                     else:
                         active_sessions.add(req.session_hash)
                         session[req.session_hash] = req.session_hash
-                        session['cancellation_requested'] = False
+                        context.set_cancellation(session['id'], False)
                     if isinstance(session.get('ebook'), str):
                         if not os.path.exists(session['ebook']):
                             session['ebook'] = session['ebook_src'] = None
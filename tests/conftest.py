@@ -0,0 +1,15 @@
+import os, sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def make_block():
+    # a block as BlockStore.save_blocks() takes it, text and sentences default to each other
+    def _make(block_id:str, text:str|None=None, sentences:list|None=None, voice:str|None=None, keep:bool=True)->dict:
+        if sentences is None:
+            sentences = [text]
+        if text is None:
+            text = ' '.join(sentences)
+        return {'id': block_id, 'expand': False, 'keep': keep, 'text': text, 'voice': voice, 'tts_engine': None, 'fine_tuned': None, 'sentences': sentences}
+    return _make
@@ -0,0 +1,136 @@
+import os, sqlite3
+import pytest
+
+from lib.classes.block_store import BlockStore
+
+def _stamp(db_path:str)->tuple:
+    # read through a separate connection, only what has been committed shows up
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('SELECT page, block_resume, sentence_resume FROM stamp WHERE id=1').fetchone()
+    finally:
+        conn.close()
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'blocks_current.db')
+    yield path
+    BlockStore.release(path)
+
+def test_registry_shares_one_store_per_path(db_path):
+    store = BlockStore.get(db_path)
+    assert BlockStore.get(db_path) is store
+    BlockStore.release(db_path)
+    assert store.closed
+    assert BlockStore.get(db_path) is not store
+
+def test_replaced_database_gets_a_new_connection(db_path):
+    store = BlockStore.get(db_path)
+    store.close()
+    os.remove(db_path)
+    fresh = BlockStore.get(db_path)
+    assert fresh is not store
+    assert fresh.load_stamp()['block_resume'] == 0
+
+def test_stamps_are_coalesced_until_flush(db_path):
+    store = BlockStore(db_path, flush_interval=3600)
+    try:
+        store.save_stamp({'page': 0, 'block_resume': 0, 'sentence_resume': 0}, flush=True)
+        for sentence_resume in range(1, 50):
+            store.save_stamp({'page': 0, 'block_resume': 2, 'sentence_resume': sentence_resume})
+        assert _stamp(db_path) == (0, 0, 0)
+        assert store.load_stamp()['sentence_resume'] == 49
+        assert _stamp(db_path) == (0, 2, 49)
+    finally:
+        store.close()
+
+def test_close_flushes_the_last_stamp(db_path):
+    store = BlockStore(db_path, flush_interval=3600)
+    store.save_stamp({'page': 1, 'block_resume': 3, 'sentence_resume': 7})
+    store.close()
+    assert _stamp(db_path) == (1, 3, 7)
+
+def test_sentence_audio_rides_along_with_the_stamp(db_path):
+    store = BlockStore(db_path, flush_interval=3600)
+    try:
+        store.record_sentence_audio('b1', 0, 22050, 22050, 'abc')
+        store.record_sentence_audio('b1', 1, 11025, 22050, 'def')
+        assert store.sentence_audio('b1') == {0: (22050, 22050, 'abc'), 1: (11025, 22050, 'def')}
+        store.drop_sentence_audio('b1')
+        assert store.sentence_audio('b1') == {}
+    finally:
+        store.close()
+
+def _book(make_block, n:int)->dict:
+    return {'page': 0, 'block_resume': 0, 'sentence_resume': 0, 'blocks': [make_block(f'b{i}', f'Block {i}.', [f'Block {i}.', f'Second {i}.']) for i in range(n)]}
+
+def test_save_and_load_round_trip(db_path, make_block):
+    store = BlockStore.get(db_path)
+    data = _book(make_block, 5)
+    store.save_blocks(data)
+    loaded = store.load()
+    assert loaded['blocks'] == data['blocks']
+
+def test_unchanged_blocks_are_not_rewritten(db_path, make_block):
+    store = BlockStore.get(db_path)
+    data = _book(make_block, 100)
+    store.save_blocks(data)
+    before = store.conn.total_changes
+    store.save_blocks(data)
+    assert store.conn.total_changes - before <= 1
+    data['blocks'][10] = make_block('b10', 'Edited.', ['Edited.'])
+    before = store.conn.total_changes
+    store.save_blocks(data)
+    # the stamp row, the block row, two old sentences out and one new one in
+    assert store.conn.total_changes - before <= 5
+    assert store.get_block('b10')['sentences'] == ['Edited.']
+
+def test_reorder_and_removal(db_path, make_block):
+    store = BlockStore.get(db_path)
+    data = _book(make_block, 4)
+    store.save_blocks(data)
+    data['blocks'] = [data['blocks'][2], data['blocks'][0], data['blocks'][3]]
+    store.save_blocks(data)
+    assert store.block_ids() == ['b2', 'b0', 'b3']
+    assert store.get_block('b1') is None
+    orphans = store.conn.execute("SELECT COUNT(*) FROM sentences WHERE block_id='b1'").fetchone()[0]
+    assert orphans == 0
+
+def test_update_blocks_only_touches_existing_rows(db_path, make_block):
+    store = BlockStore.get(db_path)
+    store.save_blocks(_book(make_block, 3))
+    store.update_blocks([make_block('b1', 'Changed.'), make_block('new', 'Not in the book.')])
+    assert store.block_ids() == ['b0', 'b1', 'b2']
+    assert store.get_block('b1')['text'] == 'Changed.'
+    assert store.get_block('new') is None
+
+def test_pages_follow_book_order(db_path, make_block):
+    store = BlockStore.get(db_path)
+    store.save_blocks(_book(make_block, 25))
+    assert store.count() == 25
+    assert [b['id'] for b in store.get_page(0, 10)] == [f'b{i}' for i in range(10)]
+    assert [b['id'] for b in store.get_page(2, 10)] == [f'b{i}' for i in range(20, 25)]
+    assert store.get_page(3, 10) == []
+    assert [b['id'] for b in store.iter_blocks()] == [f'b{i}' for i in range(25)]
+
+def test_window_stays_bounded(tmp_path, make_block):
+    store = BlockStore(str(tmp_path / 'blocks_current.db'), window_size=8)
+    try:
+        store.save_blocks(_book(make_block, 50))
+        for block in store.iter_blocks():
+            assert len(store.window) <= 8
+        assert list(store.window) == [f'b{i}' for i in range(42, 50)]
+    finally:
+        store.close()
+
+def test_blocks_are_copies_and_saves_refresh_the_window(db_path, make_block):
+    store = BlockStore.get(db_path)
+    data = _book(make_block, 3)
+    store.save_blocks(data)
+    block = store.get_block('b1')
+    block['sentences'].append('Not saved.')
+    block['text'] = 'Not saved.'
+    assert store.get_block('b1')['sentences'] == ['Block 1.', 'Second 1.']
+    data['blocks'][1] = make_block('b1', 'Saved.')
+    store.save_blocks(data)
+    assert store.get_block('b1')['text'] == 'Saved.'
@@ -0,0 +1,45 @@
+import threading
+
+from lib.classes.chapter_finalizer import ChapterFinalizer
+
+def test_jobs_run_in_submission_order_off_the_caller_thread():
+    done = []
+    caller = threading.get_ident()
+    def _job(block_id:str)->tuple:
+        done.append((block_id, threading.get_ident() != caller))
+        return True, None
+    finalizer = ChapterFinalizer()
+    for block_id in ('a', 'b', 'c'):
+        assert finalizer.submit(block_id, _job, block_id)
+    assert finalizer.close() == (True, None)
+    assert done == [('a', True), ('b', True), ('c', True)]
+
+def test_wait_reports_blocks_left_until_the_worker_catches_up():
+    release = threading.Event()
+    def _job()->tuple:
+        release.wait(5)
+        return True, None
+    finalizer = ChapterFinalizer()
+    finalizer.submit('a', _job)
+    finalizer.submit('b', _job)
+    assert finalizer.wait(0) == 2
+    assert finalizer.is_pending('a')
+    release.set()
+    remaining = finalizer.wait(0)
+    while remaining:
+        remaining = finalizer.wait(1.0)
+    assert not finalizer.is_pending('b')
+    assert finalizer.close() == (True, None)
+
+def test_a_failure_skips_the_rest_and_refuses_new_jobs():
+    done = []
+    def _job(block_id:str, ok:bool)->tuple:
+        done.append(block_id)
+        return ok, None if ok else f'{block_id} broke'
+    finalizer = ChapterFinalizer()
+    finalizer.submit('a', _job, 'a', False)
+    finalizer.submit('b', _job, 'b', True)
+    assert finalizer.drain() == (False, 'a broke')
+    assert done == ['a']
+    assert not finalizer.submit('c', _job, 'c', True)
+    finalizer.close()
@@ -0,0 +1,39 @@
+import pytest
+
+core = pytest.importorskip('lib.core')
+from lib.classes.block_store import BlockStore
+
+class FakeContext:
+
+    def __init__(self, session:dict)->None:
+        self.session = session
+
+    def get_session(self, session_id:str)->dict:
+        return self.session
+
+def _plan(tmp_path, monkeypatch, blocks:list)->dict:
+    db_path = str(tmp_path / 'blocks_current.db')
+    store = BlockStore.get(db_path)
+    store.save_blocks({'page': 0, 'block_resume': 0, 'sentence_resume': 0, 'blocks': blocks})
+    monkeypatch.setattr(core, 'context', FakeContext({'blocks_current_db': db_path, 'voice': 'narrator.wav'}))
+    try:
+        return core.plan_duplicate_sentences('session')
+    finally:
+        BlockStore.release(db_path)
+
+def test_repeats_map_to_first_occurrence(tmp_path, monkeypatch, make_block):
+    duplicates = _plan(tmp_path, monkeypatch, [
+        make_block('a', sentences=['Chapter one.', 'He said no.']),
+        make_block('b', sentences=['He  said no.', 'Something else.', 'Chapter one.']),
+    ])
+    assert duplicates == {('b', 0): ('a', 1), ('b', 2): ('a', 0)}
+
+def test_voice_and_tags_keep_sentences_apart(tmp_path, monkeypatch, make_block):
+    duplicates = _plan(tmp_path, monkeypatch, [
+        make_block('a', sentences=['He said no.']),
+        make_block('b', sentences=['He said no.'], voice='other.wav'),
+        make_block('c', sentences=['He said no.'], keep=False),
+        make_block('d', sentences=['[voice:other.wav]', 'He said no.']),
+        make_block('e', sentences=['...', '...']),
+    ])
+    assert duplicates == {}
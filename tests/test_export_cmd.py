@@ -0,0 +1,75 @@
+import pytest
+
+core = pytest.importorskip('lib.core')
+
+def _after(cmd:list, flag:str)->list:
+    return [cmd[i + 1] for i, arg in enumerate(cmd[:-1]) if arg == flag]
+
+def test_chapters_are_read_through_the_concat_demuxer():
+    cmd = core.build_export_cmd('list.txt', {'m4b': 'book.m4b'}, {'m4b': 'meta.txt'}, 'flac', '24000', 'mono', False)
+    assert cmd[cmd.index('-f') + 1] == 'concat'
+    assert _after(cmd, '-i')[0] == 'list.txt'
+    assert cmd[-1] == 'book.m4b'
+
+def test_one_filter_pass_for_a_single_encode():
+    cmd = core.build_export_cmd('list.txt', {'m4b': 'book.m4b'}, {'m4b': 'meta.txt'}, 'flac', '24000', 'stereo', False)
+    graph = _after(cmd, '-filter_complex')
+    assert graph == ['[0:a]dynaudnorm=f=150:g=15,afftdn=nf=-70[a0]']
+    assert _after(cmd, '-map') == ['[a0]']
+    assert _after(cmd, '-c:a') == ['aac']
+    assert _after(cmd, '-ac') == ['2']
+
+def test_prenormalized_chapters_skip_the_filter():
+    cmd = core.build_export_cmd('list.txt', {'mp3': 'book.mp3'}, {'mp3': 'meta.txt'}, 'flac', '24000', 'mono', True)
+    assert '-filter_complex' not in cmd
+    assert _after(cmd, '-map') == ['0:a']
+    assert _after(cmd, '-ac') == ['1']
+
+def test_matching_input_is_stream_copied():
+    cmd = core.build_export_cmd('list.txt', {'ogg': 'book.ogg'}, {'ogg': 'meta.txt'}, 'opus', '48000', 'mono', False)
+    assert '-filter_complex' not in cmd
+    assert _after(cmd, '-c') == ['copy']
+    assert '-ac' not in cmd
+
+def test_export_workers_are_bounded_by_parts_and_disk():
+    gb = 1024 ** 3
+    assert core.export_worker_count([gb] * 6, 100 * gb, 4) == 4
+    assert core.export_worker_count([gb] * 2, 100 * gb, 4) == 2
+    assert core.export_worker_count([gb, 3 * gb, gb], 7 * gb, 8) == 2
+    assert core.export_worker_count([gb] * 3, gb // 2, 8) == 1
+    assert core.export_worker_count([], 0, 8) == 1
+
+def test_extra_formats_share_one_decode_with_their_own_tags():
+    final_files = {'m4b': 'book.m4b', 'mp3': 'book.mp3', 'webm': 'book.webm'}
+    metadata_files = {'m4b': 'meta.txt', 'mp3': 'meta_mp3.txt', 'webm': 'meta_webm.txt'}
+    cmd = core.build_export_cmd('list.txt', final_files, metadata_files, 'flac', '24000', 'mono', False)
+    assert _after(cmd, '-i') == ['list.txt', 'meta.txt', 'meta_mp3.txt', 'meta_webm.txt']
+    assert _after(cmd, '-filter_complex') == ['[0:a]dynaudnorm=f=150:g=15,afftdn=nf=-70,asplit=3[a0][a1][a2]']
+    assert _after(cmd, '-map') == ['[a0]', '[a1]', '[a2]']
+    assert _after(cmd, '-map_metadata') == ['1', '2', '3']
+    assert _after(cmd, '-map_chapters') == ['1', '2', '3']
+    assert [arg for arg in cmd if arg in final_files.values()] == ['book.m4b', 'book.mp3', 'book.webm']
+
+def test_formats_without_tags_get_no_metadata_input():
+    final_files = {'m4b': 'book.m4b', 'wav': 'book.wav', 'flac': 'book.flac', 'mp3': 'book.mp3'}
+    metadata_files = {'m4b': 'meta.txt', 'mp3': 'meta_mp3.txt'}
+    cmd = core.build_export_cmd('list.txt', final_files, metadata_files, 'flac', '24000', 'mono', False)
+    assert _after(cmd, '-i') == ['list.txt', 'meta.txt', 'meta_mp3.txt']
+    # per output: m4b and mp3 take inputs 1 and 2, wav and flac none
+    assert _after(cmd, '-map_metadata') == ['1', '2']
+    assert _after(cmd, '-map_chapters') == ['1', '2']
+    wav = cmd[cmd.index('[a1]'):cmd.index('book.wav')]
+    assert '-map_metadata' not in wav and '-map_chapters' not in wav
+
+def test_copied_output_keeps_its_chapters():
+    cmd = core.build_export_cmd('list.txt', {'ogg': 'book.ogg'}, {'ogg': 'meta.txt'}, 'opus', '48000', 'mono', False)
+    assert _after(cmd, '-map_metadata') == ['1']
+    assert _after(cmd, '-map_chapters') == ['1']
+
+def test_parallel_parts_report_one_progress_weighted_by_duration():
+    durations = {1: 300.0, 2: 100.0}
+    assert core.export_progress({}, durations) == 0.0
+    assert core.export_progress({1: 50.0}, durations) == 37.5
+    assert core.export_progress({1: 50.0, 2: 100.0}, durations) == 62.5
+    assert core.export_progress({1: 100.0, 2: 100.0}, durations) == 100.0
+    assert core.export_progress({1: 40.0}, {1: 0.0, 2: 0.0}) == 20.0
@@ -0,0 +1,24 @@
+import math
+import pytest
+
+core = pytest.importorskip('lib.core')
+
+def test_one_gain_keeps_chapters_relative_loudness():
+    # a quiet and a loud chapter of equal length move together, their 6 LU spread stays
+    gain = core.book_loudness_gain([(-24.0, -12.0, 600.0), (-18.0, -6.0, 600.0)], -18)
+    integrated = 10 * math.log10((10 ** (-2.4) + 10 ** (-1.8)) / 2)
+    assert gain == round(-18 - integrated, 1)
+
+def test_longer_chapters_weigh_more():
+    short_loud = core.book_loudness_gain([(-30.0, -20.0, 3000.0), (-10.0, -20.0, 10.0)], -18)
+    long_loud = core.book_loudness_gain([(-30.0, -20.0, 10.0), (-10.0, -20.0, 3000.0)], -18)
+    assert short_loud > long_loud
+
+def test_gain_is_capped_by_the_loudest_peak():
+    assert core.book_loudness_gain([(-30.0, -3.0, 60.0), (-30.0, -10.0, 60.0)], -18) == 2.0
+    assert core.book_loudness_gain([(-60.0, -50.0, 60.0)], -18) == 20.0
+
+def test_silent_or_unmeasured_chapters_are_left_out():
+    assert core.book_loudness_gain([], -18) == 0.0
+    assert core.book_loudness_gain([(-math.inf, -math.inf, 60.0)], -18) == 0.0
+    assert core.book_loudness_gain([(-math.inf, -math.inf, 60.0), (-20.0, -10.0, 60.0)], -18) == 2.0
@@ -0,0 +1,125 @@
+import json, time, threading
+import pytest
+
+perf_recorder = pytest.importorskip('lib.classes.perf_recorder')
+PerfRecorder = perf_recorder.PerfRecorder
+PerfStage = perf_recorder.PerfStage
+
+SESSION = {'ebook': '/books/book.epub', 'tts_engine': 'vits', 'fine_tuned': 'internal', 'device': 'cpu'}
+
+class FakeAccel:
+
+    def __init__(self)->None:
+        self.allocated = 0
+        self.peak = 0
+
+    def alloc(self, n:int)->None:
+        self.allocated += n
+        self.peak = max(self.peak, self.allocated)
+
+    def free(self, n:int)->None:
+        self.allocated -= n
+
+    def reset_peak_memory_stats(self)->None:
+        self.peak = self.allocated
+
+    def max_memory_allocated(self)->int:
+        return self.peak
+
+class FakeProcess:
+
+    def __init__(self, rss:int)->None:
+        self.rss = rss
+
+    def memory_info(self)->'FakeProcess':
+        return self
+
+def _recorder(monkeypatch, accel:FakeAccel|None=None)->PerfRecorder:
+    monkeypatch.setattr(PerfStage, '_accel_module', lambda self: accel)
+    return PerfRecorder('session')
+
+def test_audio_length_comes_from_the_manifest(tmp_path, monkeypatch):
+    perf = _recorder(monkeypatch)
+    for idx in range(3):
+        with perf.sample() as sample:
+            pass
+        sample.wall_s = 0.5
+        perf.sentence('block', idx, 10, sample, reused=idx == 2)
+    manifest = {'block': {0: (22050, 22050, 'a'), 1: (44100, 22050, 'b'), 2: (22050, 22050, 'c')}}
+    report_path = str(tmp_path / 'perf.json')
+    assert perf.write_report(report_path, SESSION, manifest.get)
+    with open(report_path, encoding='utf-8') as f:
+        report = json.load(f)
+    assert [s['audio_s'] for s in report['sentences']] == [1.0, 2.0, 1.0]
+    assert report['engines']['vits']['sentences'] == 2
+    assert report['engines']['vits']['audio_s'] == 3.0
+    assert report['engines']['vits']['rtf'] == pytest.approx(1.0 / 3.0, abs=1e-3)
+    for key in ('thread_cpu_s', 'rss_mb', 'peak_rss_mb', 'peak_accel_mb'):
+        assert key in report['sentences'][0]
+    for key in ('process_cpu_s', 'process_peak_rss_mb'):
+        assert key in report
+
+def test_sentences_missing_from_the_manifest_have_no_length(tmp_path, monkeypatch):
+    perf = _recorder(monkeypatch)
+    with perf.sample() as sample:
+        pass
+    perf.sentence('gone', 0, 10, sample, reused=False)
+    report_path = str(tmp_path / 'perf.json')
+    assert perf.write_report(report_path, SESSION, lambda block_id: {})
+    with open(report_path, encoding='utf-8') as f:
+        report = json.load(f)
+    assert report['sentences'][0]['audio_s'] is None
+    assert report['engines'] == {}
+
+def test_samples_stay_out_of_stage_totals(monkeypatch):
+    perf = _recorder(monkeypatch)
+    with perf.stage('tts'):
+        with perf.sample():
+            pass
+    assert list(perf.stages) == ['tts']
+    assert perf.stages['tts']['calls'] == 1
+
+def test_nested_stage_keeps_the_outer_accel_peak(monkeypatch):
+    accel = FakeAccel()
+    perf = _recorder(monkeypatch, accel)
+    with perf.stage('tts') as outer:
+        accel.alloc(1000)
+        accel.free(1000)
+        with perf.sample() as inner:
+            accel.alloc(100)
+            accel.free(100)
+    assert inner.peak_accel == 100
+    assert outer.peak_accel == 1000
+
+def test_stage_on_another_thread_keeps_the_accel_peak(monkeypatch):
+    accel = FakeAccel()
+    perf = _recorder(monkeypatch, accel)
+    with perf.stage('tts') as outer:
+        accel.alloc(2048)
+        accel.free(2048)
+        def _finalize()->None:
+            with perf.stage('combine_audio_sentences'):
+                accel.alloc(10)
+                accel.free(10)
+        worker = threading.Thread(target=_finalize)
+        worker.start()
+        worker.join()
+    assert outer.peak_accel == 2048
+    assert perf.stages['combine_audio_sentences']['peak_accel_mb'] == round(10 / 1024 ** 2, 1)
+
+def test_stage_peak_rss_is_sampled_during_the_stage(monkeypatch):
+    perf = _recorder(monkeypatch)
+    perf.process = FakeProcess(100)
+    perf.rss_interval = 0.001
+    with perf.stage('tts') as tts:
+        perf.process.rss = 5000
+        while tts.peak_rss < 5000:
+            time.sleep(0.001)
+        perf.process.rss = 200
+    # a later stage does not inherit the earlier spike, unlike ru_maxrss
+    with perf.stage('combine_audio_chapters') as combine:
+        pass
+    assert tts.peak_rss == 5000
+    assert combine.peak_rss == 200
+    while perf._sampler is not None:
+        time.sleep(0.001)
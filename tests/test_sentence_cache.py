@@ -0,0 +1,72 @@
+import os, time
+import pytest
+
+sentence_cache = pytest.importorskip('lib.classes.sentence_cache')
+SentenceCache = sentence_cache.SentenceCache
+
+def _audio(path:str, size:int)->str:
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    return path
+
+def test_miss_then_hit(tmp_path):
+    cache = SentenceCache(str(tmp_path / 'cache'), 1)
+    key = cache.make_key('Hello  world.', None, {'tts_engine': 'xtts'})
+    dst = str(tmp_path / 'out.flac')
+    assert not cache.fetch(key, dst)
+    src = _audio(str(tmp_path / '0.flac'), 128)
+    assert cache.store(key, src)
+    assert cache.fetch(key, dst)
+    with open(src, 'rb') as a, open(dst, 'rb') as b:
+        assert a.read() == b.read()
+    assert cache.count() == 1
+
+def test_key_normalizes_whitespace_and_tracks_params(tmp_path):
+    cache = SentenceCache(str(tmp_path / 'cache'), 1)
+    assert cache.make_key('Hello  world. ', None, {'a': 1}) == cache.make_key('Hello world.', None, {'a': 1})
+    assert cache.make_key('Hello world.', None, {'a': 1}) != cache.make_key('Hello world.', None, {'a': 2})
+
+def test_key_follows_voice_file_content(tmp_path):
+    cache = SentenceCache(str(tmp_path / 'cache'), 1)
+    voice = _audio(str(tmp_path / 'voice.wav'), 64)
+    first = cache.make_key('Hi.', voice, {})
+    _audio(voice, 65)
+    assert cache.make_key('Hi.', voice, {}) != first
+
+def test_retrained_custom_model_changes_stamp(tmp_path):
+    model = tmp_path / 'my_model'
+    model.mkdir()
+    checkpoint = _audio(str(model / 'model.pth'), 64)
+    first = sentence_cache.path_stamp(str(model))
+    assert sentence_cache.path_stamp(str(model)) == first
+    _audio(checkpoint, 64)
+    os.utime(checkpoint, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    assert sentence_cache.path_stamp(str(model)) != first
+    assert sentence_cache.path_stamp(None) is None
+
+def test_evicts_least_recently_used_from_index(tmp_path):
+    cache = SentenceCache(str(tmp_path / 'cache'), 1)
+    cache.max_size = 1000
+    keys = []
+    for i in range(3):
+        key = cache.make_key(f'sentence {i}', None, {})
+        cache.store(key, _audio(str(tmp_path / f'{i}.flac'), 400))
+        keys.append(key)
+        time.sleep(0.01)
+    # the third store went over the cap, the oldest entry went away
+    assert not cache.fetch(keys[0], str(tmp_path / 'a.flac'))
+    assert cache.fetch(keys[2], str(tmp_path / 'b.flac'))
+    assert cache.size <= 900
+
+def test_index_survives_reopen_and_is_rebuilt_when_missing(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    cache = SentenceCache(cache_dir, 1)
+    key = cache.make_key('Hi.', None, {})
+    cache.store(key, _audio(str(tmp_path / '0.flac'), 100))
+    cache.close()
+    assert SentenceCache(cache_dir, 1).size == 100
+    for f in os.listdir(cache_dir):
+        if f.startswith('index.db'):
+            os.remove(os.path.join(cache_dir, f))
+    rebuilt = SentenceCache(cache_dir, 1)
+    assert rebuilt.size == 100 and rebuilt.count() == 1
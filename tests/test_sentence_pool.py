@@ -0,0 +1,36 @@
+import os, sys
+import pytest
+
+core = pytest.importorskip('lib.core')
+
+class FakeManager:
+
+    def __init__(self)->None:
+        # stands in for the engine weights, loaded once in the parent
+        self.weights = bytearray(1024)
+        self.loads = 1
+        self.audio_writer = object()
+
+    def set_audio_writer(self, audio_writer:object)->None:
+        self.audio_writer = audio_writer
+
+    def convert_sentence2audio(self, sentence_file:str, sentence:str, block_voice:str|None=None)->tuple:
+        return True, (os.getpid(), id(self.weights), self.loads, self.audio_writer)
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='the sentence pool is forked on linux only')
+def test_forked_workers_reuse_the_parent_model():
+    manager = FakeManager()
+    pool = core.fork_sentence_pool(manager, 2)
+    try:
+        results = pool.map(core.convert_sentence_worker, [(f'{i}.flac', 'Hello.', None) for i in range(8)])
+    finally:
+        pool.terminate()
+        pool.join()
+    assert all(ok for ok, _ in results)
+    assert os.getpid() not in {info[0] for _, info in results}
+    # same object at the same address, inherited rather than rebuilt or unpickled
+    assert {info[1] for _, info in results} == {id(manager.weights)}
+    assert {info[2] for _, info in results} == {1}
+    assert {info[3] for _, info in results} == {None}
+    # the parent keeps its writer
+    assert manager.audio_writer is not None
@@ -0,0 +1,83 @@
+import pytest
+
+sentence_scheduler = pytest.importorskip('lib.classes.sentence_scheduler')
+SentenceScheduler = sentence_scheduler.SentenceScheduler
+
+def _items(sentences:list, voice:str|None=None)->list:
+    return [(j, f'{j}.flac', sentence, voice) for j, sentence in enumerate(sentences)]
+
+class RecordingBatch:
+
+    def __init__(self, fail_on:str|None=None)->None:
+        self.batches = []
+        self.fail_on = fail_on
+
+    def __call__(self, batch:list)->list:
+        self.batches.append([sentence for _, sentence, _ in batch])
+        if self.fail_on is not None and any(sentence == self.fail_on for _, sentence, _ in batch):
+            raise RuntimeError('engine failure')
+        return [(True, None) for _ in batch]
+
+SENTENCES = [
+    'A fairly long sentence that has quite a few words in it.',
+    'Short one.',
+    'Tiny.',
+    'Another fairly long sentence with plenty of words in it too.',
+    'Also short.',
+]
+
+def test_results_come_back_in_document_order():
+    run_batch = RecordingBatch()
+    scheduler = SentenceScheduler(run_batch, 2, 'vits')
+    results = list(scheduler.run(_items(SENTENCES)))
+    assert [j for j, _, _ in results] == list(range(len(SENTENCES)))
+    assert all(run for _, run, _ in results)
+    assert sorted(s for batch in run_batch.batches for s in batch) == sorted(SENTENCES)
+    assert all(len(batch) <= 2 for batch in run_batch.batches)
+
+def test_batches_group_similar_lengths():
+    run_batch = RecordingBatch()
+    scheduler = SentenceScheduler(run_batch, 4, 'vits')
+    list(scheduler.run(_items(SENTENCES)))
+    for batch in run_batch.batches:
+        counts = [sentence_scheduler.count_tokens(s) for s in batch]
+        assert max(counts) < 2 * min(counts)
+
+def test_voices_never_share_a_batch():
+    run_batch = RecordingBatch()
+    scheduler = SentenceScheduler(run_batch, 4, 'vits')
+    items = _items(['One two.', 'Three four.']) + [(2, '2.flac', 'Five six.', 'other.wav')]
+    list(scheduler.run(items))
+    assert ['Five six.'] in run_batch.batches
+
+def test_state_settles_after_a_full_run():
+    scheduler = SentenceScheduler(RecordingBatch(), 2, 'vits')
+    list(scheduler.run(_items(SENTENCES)))
+    state = scheduler.state()
+    assert state['queued'] == 0
+    assert state['in_flight'] == 0
+    assert state['completed'] == len(SENTENCES)
+    assert state['buckets'] == {}
+
+def test_early_close_releases_counters():
+    scheduler = SentenceScheduler(RecordingBatch(), 1, 'vits', window_size=2)
+    gen = scheduler.run(_items(SENTENCES))
+    next(gen)
+    gen.close()
+    state = scheduler.state()
+    assert state['queued'] == 0
+    assert state['in_flight'] == 0
+    assert state['buckets'] == {}
+    assert state['completed'] == 2
+
+def test_cancel_and_engine_failure_release_counters():
+    scheduler = SentenceScheduler(RecordingBatch(), 2, 'vits', window_size=2)
+    assert list(scheduler.run(_items(SENTENCES), cancelled=lambda: True)) == []
+    assert scheduler.state()['queued'] == 0
+    scheduler = SentenceScheduler(RecordingBatch(fail_on='Tiny.'), 2, 'vits', window_size=5)
+    with pytest.raises(RuntimeError):
+        list(scheduler.run(_items(SENTENCES)))
+    state = scheduler.state()
+    assert state['queued'] == 0
+    assert state['in_flight'] == 0
+    assert state['buckets'] == {}
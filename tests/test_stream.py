@@ -0,0 +1,29 @@
+import os
+import pytest
+
+class FakeEngine:
+
+    def __init__(self, process_dir:str)->None:
+        self.session = {'process_dir': process_dir}
+        self.audio_writer = None
+
+    def convert(self, sentence_file:str, sentence:str, **kwargs)->tuple:
+        import numpy as np
+        import soundfile as sf
+        sf.write(sentence_file, np.full(2400, 0.25, dtype=np.float32), 24000)
+        # engines may leave intermediates next to the sentence file
+        with open(os.path.join(os.path.dirname(sentence_file), 'segment_0.wav'), 'wb') as f:
+            f.write(b'RIFF')
+        return True, None
+
+def test_whole_sentence_fallback_leaves_no_file_behind(tmp_path):
+    pytest.importorskip('soundfile')
+    utils = pytest.importorskip('lib.classes.tts_engines.common.utils')
+    engine = FakeEngine(str(tmp_path))
+    stream = utils.TTSUtils.convert_stream(engine, 'Hello.')
+    chunk = next(stream)
+    assert len(chunk) == 2400
+    assert chunk.dtype.name == 'float32'
+    # the generator is still suspended, a reader that stops here must not leak the sentence file
+    assert os.listdir(tmp_path / 'tmp') == []
+    stream.close()
@@ -0,0 +1,108 @@
+import os
+import pytest
+
+# equivalence checks against real models only run when one is pointed at:
+#   E2A_TEST_PIPER_MODEL=/path/to/voice.onnx (exported with the phoneme duration output)
+#   E2A_TEST_COQUI_MODEL=tts_models/en/ljspeech/glow-tts
+
+def test_only_padded_batch_engines_take_batches():
+    xtts = pytest.importorskip('lib.classes.tts_engines.xtts')
+    tacotron = pytest.importorskip('lib.classes.tts_engines.tacotron')
+    vits = pytest.importorskip('lib.classes.tts_engines.vits')
+    glowtts = pytest.importorskip('lib.classes.tts_engines.glowtts')
+    piper = pytest.importorskip('lib.classes.tts_engines.piper')
+    assert not xtts.XTTS.supports_batch
+    assert not tacotron.Tacotron2.supports_batch
+    assert vits.Vits.supports_batch
+    assert glowtts.GlowTTS.supports_batch
+    assert piper.Piper.supports_batch
+
+class FakeOnnxSession:
+
+    def __init__(self, frames:dict, hop_length:int, with_durations:bool=True)->None:
+        self.frames = frames
+        self.hop_length = hop_length
+        self.with_durations = with_durations
+
+    def run(self, _, args:dict)->list:
+        import numpy as np
+        inputs = args['input']
+        batch, width = inputs.shape
+        total = max(int(sum(self.frames[int(inputs[r, 0])][:args['input_lengths'][r]])) for r in range(batch)) * self.hop_length
+        audio = np.full((batch, 1, 1, total), 0.5, dtype=np.float32)
+        durations = np.zeros((batch, 1, width), dtype=np.float32)
+        for r in range(batch):
+            d = self.frames[int(inputs[r, 0])][:args['input_lengths'][r]]
+            durations[r, 0, :len(d)] = d
+            audio[r, 0, 0, int(sum(d)) * self.hop_length:] = 1e-3 # padding noise past the row's own length
+        return [audio, durations] if self.with_durations else [audio]
+
+class FakePiperVoice:
+
+    def __init__(self, session:FakeOnnxSession)->None:
+        from types import SimpleNamespace
+        self.session = session
+        self.config = SimpleNamespace(noise_scale=0.667, length_scale=1.0, noise_w_scale=0.8, num_speakers=1, hop_length=session.hop_length)
+
+    def phonemize(self, text:str)->list:
+        return [list(s) for s in text.split('|')]
+
+    def phonemes_to_ids(self, phonemes:list)->list:
+        return [ord(p) for p in phonemes]
+
+def _syn_config():
+    from types import SimpleNamespace
+    return SimpleNamespace(noise_scale=None, length_scale=None, noise_w_scale=None, speaker_id=None, normalize_audio=False, volume=1.0)
+
+def test_piper_batch_rows_cut_to_their_durations():
+    pytest.importorskip('numpy')
+    piper = pytest.importorskip('lib.classes.tts_engines.piper')
+    frames = {ord('a'): [2, 3, 1], ord('b'): [4], ord('c'): [1, 1]}
+    voice = FakePiperVoice(FakeOnnxSession(frames, hop_length=4))
+    audio = piper.infer_piper_batch(voice, _syn_config(), ['aaa', 'b|cc'])
+    assert [len(a) for a in audio] == [6 * 4, (4 + 2) * 4]
+    assert all(float(a.min()) == 0.5 for a in audio)
+
+def test_piper_batch_without_duration_output_falls_back():
+    pytest.importorskip('numpy')
+    piper = pytest.importorskip('lib.classes.tts_engines.piper')
+    voice = FakePiperVoice(FakeOnnxSession({ord('a'): [1]}, hop_length=4, with_durations=False))
+    assert piper.infer_piper_batch(voice, _syn_config(), ['a']) is None
+
+@pytest.mark.skipif(not os.environ.get('E2A_TEST_PIPER_MODEL'), reason='E2A_TEST_PIPER_MODEL not set')
+def test_piper_batch_matches_single_sentence_path():
+    np = pytest.importorskip('numpy')
+    piper_tts = pytest.importorskip('piper')
+    piper = pytest.importorskip('lib.classes.tts_engines.piper')
+    voice = piper_tts.PiperVoice.load(os.environ['E2A_TEST_PIPER_MODEL'])
+    syn_config = piper_tts.SynthesisConfig(noise_scale=0.0, noise_w_scale=0.0, normalize_audio=True)
+    texts = ['The quick brown fox jumps over the lazy dog.', 'Hello there.']
+    batched = piper.infer_piper_batch(voice, syn_config, texts)
+    if batched is None:
+        pytest.skip('model has no phoneme duration output')
+    for text, audio in zip(texts, batched):
+        single = np.concatenate([chunk.audio_float_array for chunk in voice.synthesize(text, syn_config=syn_config)])
+        assert abs(len(audio) - len(single)) <= voice.config.hop_length
+        n = min(len(audio), len(single))
+        assert np.max(np.abs(audio[:n] - single[:n])) < 1e-2
+
+@pytest.mark.skipif(not os.environ.get('E2A_TEST_COQUI_MODEL'), reason='E2A_TEST_COQUI_MODEL not set')
+def test_coqui_batch_matches_single_sentence_path():
+    np = pytest.importorskip('numpy')
+    tts_api = pytest.importorskip('TTS.api')
+    utils = pytest.importorskip('lib.classes.tts_engines.common.utils')
+    engine = tts_api.TTS(os.environ['E2A_TEST_COQUI_MODEL'])
+    tts_model = engine.synthesizer.tts_model
+    # deterministic sampling so both paths draw the same durations and latents
+    for attr in ('inference_noise_scale', 'inference_noise_scale_dp', 'noise_scale', 'noise_scale_dp'):
+        if hasattr(tts_model, attr):
+            setattr(tts_model, attr, 0.0)
+    texts = ['The quick brown fox jumps over the lazy dog.', 'Hello there.']
+    batched = utils.infer_coqui_batch(engine.synthesizer, texts)
+    assert batched is not None
+    for text, audio in zip(texts, batched):
+        single = np.asarray(engine.tts(text=text), dtype=np.float32)
+        audio = audio.numpy()
+        assert abs(len(audio) - len(single)) <= tts_model.config.audio.hop_length
+        n = min(len(audio), len(single))
+        assert np.max(np.abs(audio[:n] - single[:n])) < 1e-2